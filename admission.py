@@ -0,0 +1,114 @@
+"""Contrôle d'admission des analyses côté API.
+
+Les analyses (extraction PDF, OCR, règles) saturent le CPU : au-delà de
+`max_concurrent` exécutions simultanées, les requêtes attendent dans une file
+bornée ; quand elle est pleine, ou quand l'attente dépasse `queue_timeout`,
+elles sont refusées avec un délai de nouvelle tentative estimé d'après la
+durée moyenne des dernières analyses.
+
+Les analyses admises s'exécutent sur un pool de threads dédié, distinct du
+pool par défaut de Starlette : `/health` et les autres routes légères
+restent servies même quand toutes les places sont prises.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import REGISTRY, count
+
+
+class Overloaded(Exception):
+    """La file d'attente est pleine ou l'attente a dépassé le délai autorisé."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Limite les analyses simultanées et borne la file d'attente."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, name: str = "analysis"):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Moyenne glissante de la durée d'une analyse, pour estimer Retry-After
+        self._avg_seconds = 5.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix=f"ao-{self.name}")
+        return self._executor
+
+    def _publish(self) -> None:
+        REGISTRY.set_gauge("admission_active", self.active, lane=self.name)
+        REGISTRY.set_gauge("admission_waiting", self.waiting, lane=self.name)
+
+    def retry_after(self) -> int:
+        """Délai estimé (en s) avant qu'une place se libère pour une nouvelle requête."""
+        rounds = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(rounds * self._avg_seconds))
+
+    @property
+    def full(self) -> bool:
+        return self.active + self.waiting >= self.max_concurrent + self.max_queue
+
+    def status(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "retry_after_s": self.retry_after() if self.full else 0,
+        }
+
+    def _reject(self, reason: str) -> Overloaded:
+        count("admission_rejected", lane=self.name, reason=reason)
+        return Overloaded(self.retry_after(), reason)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Exécute `func(*args)` sur le pool dédié dès qu'une place est libre.
+
+        Lève `Overloaded` si la file est pleine ou si l'attente dépasse
+        `queue_timeout`.
+        """
+        if self.full:
+            raise self._reject("queue_full")
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        self._publish()
+        try:
+            timeout = self.queue_timeout if self.queue_timeout > 0 else None
+            await asyncio.wait_for(semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout") from None
+        finally:
+            self.waiting -= 1
+            self._publish()
+
+        self.active += 1
+        self._publish()
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.perf_counter() - start)
+            self.active -= 1
+            self._publish()
+            semaphore.release()
@@ -0,0 +1,451 @@
+"""Pipeline d'analyse d'un DCE, unique pour l'API, les pages Streamlit et le batch.
+
+Une analyse enchaîne les étapes déclarées dans `STAGES`, chacune mesurée
+sous son nom (`metrics.stage`) :
+
+- ingest : triage des pièces sur un échantillon de leur première page ;
+- extract : texte de chaque pièce, sous le budget de la requête ;
+- normalize : sections, mots-clés et candidats de chaque pièce (`partials`), puis fusion ;
+- sector, rules, metadata : secteur, documents requis, email, acheteur, date limite et adresse ;
+- tables : lignes des bordereaux de prix (BPU, DQE).
+
+Les étapes coûteuses ont un cache partagé par tous les points d'entrée d'un
+même processus : textes extraits (par empreinte du contenu et mode
+d'extraction), résultats partiels (par empreinte du texte, voir `partials`)
+et bordereaux (voir `tables`). Secteur, règles et métadonnées se déduisent
+de la fusion, sans cache propre.
+
+Les analyses par pièce de l'étape normalize s'exécutent selon
+`AO_PIPELINE_EXECUTOR` : "inline" (thread appelant), "threads" ou
+"processes" (`AO_ANALYSIS_WORKERS` au plus). L'extraction reste séquentielle :
+le budget de la requête se répartit entre les pièces dans l'ordre du triage.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import partials
+from budgets import Budget
+from coalesce import BoundedCache
+from config import (
+    ANALYSIS_WORKERS,
+    EXTRACT_CACHE_MAX_MB,
+    PIPELINE_EXECUTOR,
+    TRIAGE_SAMPLE_BYTES,
+    TRIAGE_SAMPLE_PAGES,
+)
+from memory import extraction_slot, low_memory, memory_budget
+from metrics import count, stage
+from partials import PartialAnalysis, analyze_documents, merge_partials
+from tables import PriceTable, price_tables
+from triage import TriageDecision, triage_files
+from utils import load_docx_text, load_pdf_text
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# Profondeur du plan renvoyé par /analyze (1 : parties, 2 : chapitres, 3 : articles, 4+ : 1.2, 1.2.3...)
+OUTLINE_MAX_LEVEL = 4
+
+EXECUTORS = ("inline", "threads", "processes")
+
+Extractor = Callable[[str, bytes, Optional[Budget]], str]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Étape du pipeline : nom (celui des temps par étape) et cache éventuel (`cache_requests`)."""
+
+    name: str
+    description: str
+    cache: Optional[str] = None
+
+
+STAGES = (
+    Stage("ingest", "triage des pièces sur un échantillon de leur première page"),
+    Stage("extract", "texte de chaque pièce sous le budget de la requête", "text"),
+    Stage("normalize", "sections, mots-clés et candidats de chaque pièce, puis fusion", "partial"),
+    Stage("sector", "secteur d'activité"),
+    Stage("rules", "documents requis"),
+    Stage("metadata", "email, acheteur, date limite et adresse"),
+    Stage("tables", "lignes des bordereaux de prix (BPU, DQE)", "tables"),
+)
+
+_texts = BoundedCache(EXTRACT_CACHE_MAX_MB * 1024 * 1024)
+_threads: Optional[ThreadPoolExecutor] = None
+_threads_lock = threading.Lock()
+
+
+def read_file_text(name: str, raw: bytes, budget: Optional[Budget] = None) -> str:
+    """Utilise les mêmes fonctions utilitaires que Streamlit pour extraire le texte."""
+    lower = name.lower()
+    if lower.endswith(".pdf"):
+        return load_pdf_text(raw, budget)
+    if lower.endswith(".docx"):
+        return load_docx_text(raw, budget)
+    if lower.endswith(".txt"):
+        count("bytes_processed", len(raw), kind="txt")
+        text = str(raw, "utf-8", errors="ignore")
+        if budget is not None and budget.check():
+            text = budget.add_text(text)
+        elif budget is not None:
+            text = ""
+        return text
+    return ""
+
+
+def get_executor(kind: str = PIPELINE_EXECUTOR) -> Optional[Executor]:
+    """Exécuteur partagé des analyses par pièce (None : dans le thread appelant)."""
+    if kind not in EXECUTORS:
+        raise ValueError(f"Exécuteur inconnu : {kind} (attendu : {', '.join(EXECUTORS)})")
+    if kind == "inline" or ANALYSIS_WORKERS <= 1:
+        return None
+    if kind == "processes":
+        return partials.get_executor()
+    global _threads
+    with _threads_lock:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="ao-pipeline")
+    return _threads
+
+
+@dataclass
+class ExtractedFile:
+    """Texte extrait d'une pièce, avec son type, son mode d'extraction et sa troncature éventuelle."""
+
+    name: str
+    text: str
+    triage: TriageDecision
+    truncated: Optional[dict] = None
+
+
+@dataclass
+class Analysis:
+    """Résultat des étapes d'une analyse ; `as_result` le met au format de `/analyze`."""
+
+    extracted: List[ExtractedFile]
+    merged: Optional[PartialAnalysis] = None
+    sector: Optional[str] = None
+    required_documents: List[dict] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+    tables: List[PriceTable] = field(default_factory=list)
+
+    def as_result(self) -> dict:
+        documents = [f.triage.as_dict() for f in self.extracted]
+        truncated_files = [f.truncated for f in self.extracted if f.truncated]
+        if self.merged is None:
+            return {
+                "success": False,
+                "message": "Aucun texte n'a pu être extrait des documents.",
+                "documents": documents,
+                "truncated_files": truncated_files,
+            }
+        deadline = self.metadata["deadline"]
+        return {
+            "success": True,
+            "sector": self.sector,
+            "required_documents": self.required_documents,
+            "email_to": self.metadata["email_to"],
+            "postal_address": self.metadata["postal_address"],
+            "buyer": self.metadata["buyer"],
+            "deadline": deadline.isoformat() if deadline else None,
+            "documents": documents,
+            "truncated_files": truncated_files,
+            "outline": self.merged.outline(max_level=OUTLINE_MAX_LEVEL),
+            "price_tables": [table.as_dict() for table in self.tables],
+        }
+
+
+def _sample_first_page(name: str, raw: bytes) -> str:
+    """Échantillon bon marché de la première page, pour le triage."""
+    return read_file_text(name, raw, Budget(max_pages=1, max_bytes=4096))
+
+
+def _fits(used: Tuple[str, int, int, Optional[str]], budget: Budget) -> bool:
+    """Un texte en cache n'est réutilisé que s'il tient dans le budget du document."""
+    _, pages, size, _ = used
+    return (budget.max_pages is None or pages <= budget.max_pages) and (
+        budget.max_bytes is None or size <= budget.max_bytes
+    )
+
+
+def _reusable(decision: TriageDecision, budget: Budget) -> bool:
+    """Extraction complète, ou échantillon arrêté aux seules limites du triage."""
+    if not budget.truncated:
+        return True
+    return (
+        decision.mode == "sample"
+        and budget.reason in ("pages", "bytes")
+        and (budget.max_pages, budget.max_bytes) == (TRIAGE_SAMPLE_PAGES, TRIAGE_SAMPLE_BYTES)
+    )
+
+
+class Pipeline:
+    """Étapes de l'analyse, avec leur extracteur et leur exécuteur.
+
+    `run` renvoie le résultat de `/analyze`, `events` le même résultat en flux ;
+    les étapes s'appellent aussi une à une (page Streamlit).
+    """
+
+    def __init__(self, executor: str = PIPELINE_EXECUTOR, extractor: Extractor = read_file_text):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Exécuteur inconnu : {executor} (attendu : {', '.join(EXECUTORS)})")
+        self.executor = executor
+        self.extractor = extractor
+
+    def ingest(self, files_data: Sequence[Tuple[str, bytes]]) -> List[TriageDecision]:
+        with stage("ingest"):
+            return triage_files(files_data, _sample_first_page)
+
+    def extract(
+        self,
+        files_data: Sequence[Tuple[str, bytes]],
+        decisions: Sequence[TriageDecision],
+        budget: Optional[Budget] = None,
+        digests: Optional[Sequence[Optional[bytes]]] = None,
+    ) -> List[ExtractedFile]:
+        """Texte des pièces sous le budget de la requête.
+
+        Les pièces échantillonnées par le triage ne sont lues que sur leurs
+        premières pages ; elles ne sont signalées comme tronquées que si le
+        budget de temps les a interrompues.
+        """
+        budget = budget or Budget.for_request()
+        digests = digests or [None] * len(files_data)
+        with stage("extract"):
+            return [
+                self.extract_file(name, raw, decision, budget, digest)
+                for (name, raw), decision, digest in zip(files_data, decisions, digests)
+            ]
+
+    def extract_file(
+        self,
+        name: str,
+        raw: bytes,
+        decision: TriageDecision,
+        budget: Budget,
+        digest: Optional[bytes] = None,
+    ) -> ExtractedFile:
+        """Texte d'une pièce, depuis le cache si son contenu a déjà été extrait dans ce mode.
+
+        `digest` remplace l'empreinte du contenu (identité d'un fichier serveur).
+        """
+        doc_budget = budget.for_document()
+        if decision.mode == "sample":
+            doc_budget.tighten(TRIAGE_SAMPLE_PAGES, TRIAGE_SAMPLE_BYTES)
+        count("triage_files", type=decision.doc_type, extraction=decision.mode)
+        key = (digest or hashlib.sha256(raw).digest(), Path(name).suffix.lower(), decision.mode)
+        cached = _texts.get(key)
+        if cached is not None and _fits(cached, doc_budget):
+            count("cache_requests", cache="text", result="hit")
+            text, doc_budget.pages, doc_budget.bytes, reason = cached
+            if reason:
+                doc_budget.exhaust(reason)
+        else:
+            count("cache_requests", cache="text", result="miss")
+            with extraction_slot():
+                text = self.extractor(name, raw, doc_budget)
+            if _reusable(decision, doc_budget):
+                _texts.put(key, (text, doc_budget.pages, doc_budget.bytes, doc_budget.reason), sys.getsizeof(text))
+        budget.consume(doc_budget)
+        expected = decision.mode == "sample" and doc_budget.reason in ("pages", "bytes")
+        truncated = {"name": name, **doc_budget.as_dict()} if doc_budget.truncated and not expected else None
+        return ExtractedFile(name, text, decision, truncated)
+
+    def normalize(self, extracted: Sequence[ExtractedFile]) -> Optional[PartialAnalysis]:
+        """Fusion des résultats partiels des pièces lues (None si aucun texte)."""
+        documents = [(f.name, f.text) for f in extracted if f.text]
+        if not documents:
+            return None
+        with stage("normalize"):
+            return analyze_documents(documents, None if low_memory() else get_executor(self.executor))
+
+    def sector(self, merged: PartialAnalysis) -> Optional[str]:
+        with stage("sector"):
+            return merged.sector
+
+    def rules(self, merged: PartialAnalysis) -> List[dict]:
+        with stage("rules"):
+            return merged.required_documents()
+
+    def metadata(self, merged: PartialAnalysis) -> dict:
+        """Email, adresse, acheteur et date limite (datetime ou None)."""
+        with stage("metadata"):
+            return {
+                "email_to": merged.email(),
+                "postal_address": merged.postal_address,
+                "buyer": merged.buyer(),
+                "deadline": merged.deadline(),
+            }
+
+    def tables(
+        self,
+        files_data: Sequence[Tuple[str, bytes]],
+        extracted: Sequence[ExtractedFile],
+        budget: Optional[Budget] = None,
+    ) -> List[PriceTable]:
+        """Bordereaux des pièces BPU/DQE, dans le temps qui reste au budget de la requête."""
+        with stage("tables"):
+            return price_tables(files_data, [f.triage.doc_type for f in extracted], budget)
+
+    def analyze(
+        self,
+        files_data: Sequence[Tuple[str, bytes]],
+        budget: Optional[Budget] = None,
+        digests: Optional[Sequence[Optional[bytes]]] = None,
+    ) -> Analysis:
+        """Toutes les étapes, dans l'ordre de `STAGES`.
+
+        Au-delà du budget mémoire, l'analyse passe en mode économe (voir `memory`).
+        """
+        budget = budget or Budget.for_request()
+        with memory_budget(sum(len(raw) for _, raw in files_data)):
+            extracted = self.extract(files_data, self.ingest(files_data), budget, digests)
+            return self._conclude(files_data, extracted, budget)
+
+    def _conclude(
+        self, files_data: Sequence[Tuple[str, bytes]], extracted: List[ExtractedFile], budget: Budget
+    ) -> Analysis:
+        merged = self.normalize(extracted)
+        if merged is None:
+            return Analysis(extracted)
+        return Analysis(
+            extracted,
+            merged,
+            self.sector(merged),
+            self.rules(merged),
+            self.metadata(merged),
+            self.tables(files_data, extracted, budget),
+        )
+
+    def run(
+        self,
+        files_data: Sequence[Tuple[str, bytes]],
+        budget: Optional[Budget] = None,
+        digests: Optional[Sequence[Optional[bytes]]] = None,
+    ) -> dict:
+        """Analyse les fichiers (nom, contenu) et renvoie le résultat au format de `/analyze`."""
+        return self.analyze(files_data, budget, digests).as_result()
+
+    def events(
+        self,
+        files_data: Sequence[Tuple[str, bytes]],
+        budget: Optional[Budget] = None,
+        digests: Optional[Sequence[Optional[bytes]]] = None,
+    ) -> Iterator[dict]:
+        """Analyse en flux : événements émis dès qu'une pièce est extraite, puis résultat complet.
+
+        Les pièces sont extraites en commençant par RC, AE et CCAP (les plus
+        courtes d'abord) ; après chacune, les résultats partiels déjà connus sont
+        fusionnés dans l'ordre d'origine et seuls les changements sont émis :
+        secteur, documents requis (ajoutés ou retirés), email, acheteur, date
+        limite, adresse. Le dernier événement, `summary`, porte le même résultat
+        que `run` (à la répartition du budget près, l'ordre d'extraction étant
+        différent).
+        """
+        with memory_budget(sum(len(raw) for _, raw in files_data)):
+            yield from self._events(files_data, budget or Budget.for_request(), digests or [None] * len(files_data))
+
+    def _events(self, files_data, budget: Budget, digests) -> Iterator[dict]:
+        state = _StreamState(time.perf_counter())
+        decisions = self.ingest(files_data)
+        yield state.event("triage", documents=[decision.as_dict() for decision in decisions])
+
+        order = sorted(
+            range(len(files_data)),
+            key=lambda i: (_STREAM_PRIORITY.index(decisions[i].doc_type), len(files_data[i][1])),
+        )
+        extracted: List[Optional[ExtractedFile]] = [None] * len(files_data)
+        found: Dict[int, PartialAnalysis] = {}
+        for i in order:
+            name, raw = files_data[i]
+            with stage("extract"):
+                item = extracted[i] = self.extract_file(name, raw, decisions[i], budget, digests[i])
+            yield state.event(
+                "file", name=name, type=item.triage.doc_type, extraction=item.triage.mode,
+                chars=len(item.text), truncated=item.truncated,
+            )
+            if not item.text:
+                continue
+            # Résultat partiel de la pièce (en cache : le résultat final ne le recalcule pas)
+            with stage("normalize"):
+                found[i] = analyze_documents([(name, item.text)])
+            yield from state.changes(merge_partials([found[j] for j in sorted(found)]))
+
+        result = self._conclude(files_data, extracted, budget).as_result()
+        for table in result.get("price_tables", []):
+            yield state.event("price_table", table=table)
+        yield state.event("summary", result=result)
+
+
+# Ordre d'extraction du flux (tous les types du triage) : pièces porteuses des métadonnées d'abord
+_STREAM_PRIORITY = ("RC", "AE", "CCAP", "AUTRE", "CCTP", "DQE", "BPU")
+_STREAM_FIELDS = ("email_to", "buyer", "deadline", "postal_address")
+
+
+class _StreamState:
+    """Ce qui a déjà été émis, pour n'émettre que les nouveautés après chaque pièce."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.sector: Optional[str] = None
+        self.documents: set = set()
+        self.fields: Dict[str, Optional[str]] = {}
+
+    def event(self, event: str, **fields) -> dict:
+        return {"event": event, "elapsed_s": round(time.perf_counter() - self.start, 3), **fields}
+
+    def changes(self, merged: PartialAnalysis) -> Iterator[dict]:
+        sector = merged.sector
+        if sector != self.sector:
+            self.sector = sector
+            yield self.event("sector", sector=sector)
+        required = merged.required_documents()
+        keys = {doc["key"] for doc in required}
+        for doc in required:
+            if doc["key"] not in self.documents:
+                yield self.event("required_document", document=doc)
+        for key in sorted(self.documents - keys):
+            # Le secteur a changé : ses règles spécifiques ne s'appliquent plus
+            yield self.event("required_document_withdrawn", key=key)
+        self.documents = keys
+        deadline = merged.deadline()
+        values = {
+            "email_to": merged.email(),
+            "buyer": merged.buyer(),
+            "deadline": deadline.isoformat() if deadline else None,
+            "postal_address": merged.postal_address,
+        }
+        for name in _STREAM_FIELDS:
+            if values[name] is not None and values[name] != self.fields.get(name):
+                self.fields[name] = values[name]
+                yield self.event("metadata", field=name, value=values[name])
+
+
+def result_events(result: dict) -> Iterator[dict]:
+    """Événements du flux reconstitués à partir d'un résultat complet (réponse servie depuis le cache)."""
+    state = _StreamState(time.perf_counter())
+    yield state.event("triage", documents=result.get("documents", []))
+    if result.get("success"):
+        if result.get("sector") is not None:
+            yield state.event("sector", sector=result["sector"])
+        for doc in result.get("required_documents", []):
+            yield state.event("required_document", document=doc)
+        for name in _STREAM_FIELDS:
+            if result.get(name) is not None:
+                yield state.event("metadata", field=name, value=result[name])
+        for table in result.get("price_tables", []):
+            yield state.event("price_table", table=table)
+    yield state.event("summary", result=result)
+
+
+def clear_cache() -> None:
+    """Oublie les textes extraits (les autres étapes ont leur propre `clear_cache`)."""
+    _texts.clear()
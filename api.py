@@ -2,23 +2,58 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
-from typing import List, Optional
+import json
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from extract_required_documents import detect_sector, extract_required_documents
-from utils import (
-    extract_email,
-    extract_postal_address,
-    guess_buyer,
-    guess_deadline,
-    load_docx_text,
-    load_pdf_text,
+from admission import AdmissionController, Overloaded
+from analysis import Pipeline, read_file_text, result_events
+from assembly import (
+    assemble_dossier,
+    find_candidates,
+    find_dossier,
+    is_allowed_path,
+    is_safe_filename,
+    iter_zip,
+    select_documents,
 )
+from coalesce import Coalescer, etag_for, files_key
+from config import (
+    COMPANY_ROOTS,
+    MAX_CONCURRENT_ANALYSES,
+    MAX_QUEUED_ANALYSES,
+    QUEUE_TIMEOUT_S,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_S,
+    UPLOAD_CHUNK_MAX_BYTES,
+)
+from metrics import REGISTRY, collect_timings
+from pdf_engines import SELECTOR as PDF_ENGINE_SELECTOR
+from profiling import is_authorized, profiled
+from retention import mark_used, start_janitor
+from server_files import ServerFileError, files_data_of, open_server_files
+from uploads import DeclaredFile, UploadError, UploadStore
+from utils import PDF_ENGINES
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Nettoyage périodique de OUTPUT_ROOT et temp_uploads (voir `retention`)."""
+    start_janitor()
+    yield
 
-app = FastAPI(title="AO Analyzer API", version="1.0.0")
+
+app = FastAPI(title="AO Analyzer API", version="1.0.0", lifespan=_lifespan)
 
 # Autorise le front React en dev (tous les ports locaux courants)
 app.add_middleware(
@@ -32,73 +67,527 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-AO-Cache", "Retry-After"],
 )
 
+_admission = AdmissionController(MAX_CONCURRENT_ANALYSES, MAX_QUEUED_ANALYSES, QUEUE_TIMEOUT_S)
 
-def _read_file_text(name: str, raw: bytes) -> str:
-    """Utilise les mêmes fonctions utilitaires que Streamlit pour extraire le texte."""
-    lower = name.lower()
-    if lower.endswith(".pdf"):
-        return load_pdf_text(raw)
-    if lower.endswith(".docx"):
-        return load_docx_text(raw)
-    if lower.endswith(".txt"):
-        return raw.decode("utf-8", errors="ignore")
-    return ""
 
+# Routes qui passent par le contrôle d'admission (les autres restent sur la voie légère)
+_HEAVY_PATHS = {"/analyze", "/analyze/stream", "/assemble"}
 
-@app.post("/analyze")
-async def analyze_ao(files: List[UploadFile] = File(...)):
-    """Analyse les fichiers d'appel d'offre et renvoie les mêmes infos que la page Streamlit."""
-    texts: List[str] = []
-    files_data: List[tuple[str, bytes]] = []
 
-    for f in files:
-        raw = await f.read()
-        files_data.append((f.filename, raw))
-        text = _read_file_text(f.filename, raw)
-        if text:
-            texts.append(text)
-
-    if not texts:
-        return {
+def _overloaded_response(retry_after: int, reason: str) -> JSONResponse:
+    return JSONResponse(
+        {
             "success": False,
-            "message": "Aucun texte n'a pu être extrait des documents.",
-        }
+            "message": f"Serveur occupé : réessayez dans {retry_after} s.",
+            "reason": reason,
+            "queue": _admission.status(),
+        },
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def _is_heavy(path: str) -> bool:
+    return path in _HEAVY_PATHS or (path.startswith("/uploads/") and path.endswith("/finalize"))
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return _overloaded_response(exc.retry_after, exc.reason)
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Alimente l'histogramme de latence par route pour `/metrics`.
+
+    Refuse aussi d'emblée les analyses quand la file est pleine, avant de
+    recevoir les fichiers.
+    """
+    start = time.perf_counter()
+    if request.method == "POST" and _is_heavy(request.url.path) and _admission.full:
+        response = _overloaded_response(_admission.retry_after(), "queue_full")
+    else:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    REGISTRY.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - start,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
+
+
+def _cacheable(outcome: Tuple[dict, dict]) -> bool:
+    """Un résultat tronqué par le temps dépend de la charge : il n'est pas mis en cache."""
+    result, _ = outcome
+    return not any(item.get("reason") == "time" for item in result.get("truncated_files", []))
+
+
+_analysis_cache = Coalescer(RESULT_CACHE_TTL_S, RESULT_CACHE_MAX_ENTRIES, cacheable=_cacheable)
+
+
+def _analyze_with_timings(
+    files_data: List[Tuple[str, bytes]],
+    extractor=read_file_text,
+    digests: Optional[List[Optional[bytes]]] = None,
+) -> Tuple[dict, dict]:
+    """Exécute l'analyse (dans le pool dédié) et renvoie le résultat et les temps par étape.
+
+    Les pièces d'un DCE sont analysées sur l'exécuteur du pipeline (`AO_PIPELINE_EXECUTOR`).
+    """
+    with collect_timings() as collected:
+        result = Pipeline(extractor=extractor).run(files_data, digests=digests)
+    return result, collected.as_dict()
+
+
+def _analyze_profiled(
+    files_data: List[Tuple[str, bytes]],
+    profile_mode: Optional[str],
+    digests: Optional[List[Optional[bytes]]] = None,
+) -> Tuple[dict, dict, dict]:
+    """Comme `_analyze_with_timings`, sous profileur (pièces analysées dans ce thread)."""
+    with collect_timings() as collected, profiled(files_data, "api", profile_mode) as profile_info:
+        result = Pipeline("inline").run(files_data, digests=digests)
+    return result, collected.as_dict(), profile_info
+
+
+@app.post("/analyze")
+async def analyze_ao(
+    files: List[UploadFile] = File(default=[]),
+    paths: str = Form("[]"),
+    timings: bool = False,
+    profile: Optional[str] = None,
+    profile_mode: Optional[str] = None,
+    x_ao_profile: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Analyse les fichiers d'appel d'offre et renvoie les mêmes infos que la page Streamlit.
+
+    Les fichiers sont envoyés (`files`) ou lus directement sur le serveur :
+    `paths` est une liste JSON de fichiers ou dossiers sous `AO_DCE_ROOTS`
+    (voir `server_files`), ouverts sur place sans copie.
+    Avec `?timings=true`, la réponse contient le détail des temps par étape.
+    Le jeton de profilage (en-tête `X-AO-Profile` ou `?profile=`) exécute
+    l'analyse sous profileur et écrit le profil dans `AO_PROFILE_DIR`.
+    Les requêtes identiques concurrentes partagent la même analyse et les
+    résultats récents sont servis depuis un cache, avec un ETag. Au-delà de
+    `AO_MAX_CONCURRENT_ANALYSES` analyses en cours, les requêtes attendent
+    dans une file bornée ; file pleine : `429` avec `Retry-After`.
+    """
+    profile_token = x_ao_profile or profile
+    if profile_token is not None and not is_authorized(profile_token):
+        raise HTTPException(status_code=403, detail="Profilage non autorisé.")
+    if profile_mode not in (None, "sample", "cprofile"):
+        raise HTTPException(status_code=422, detail="profile_mode doit valoir 'sample' ou 'cprofile'.")
+
+    files_data, digests = await _request_files(files, paths)
+
+    if profile_token is not None:
+        # Un profil doit mesurer une vraie exécution : ni cache ni regroupement
+        result, collected, profile_info = await _admission.run(_analyze_profiled, files_data, profile_mode, digests)
+        result = dict(result)
+        if timings:
+            result["timings"] = {**collected, "source": "profiled"}
+        result["profile"] = {"mode": profile_info["mode"], "path": profile_info["profile"]}
+        etag = etag_for(files_key(files_data, digests))
+        return JSONResponse(result, headers={"ETag": etag, "X-AO-Cache": "profiled"})
+    return await _analysis_response(files_data, timings, if_none_match, digests=digests)
+
+
+async def _request_files(
+    files: List[UploadFile], paths: str
+) -> Tuple[List[Tuple[str, bytes]], List[Optional[bytes]]]:
+    """Fichiers envoyés puis fichiers serveur, et empreintes déjà connues (`coalesce.files_key`).
+
+    Les fichiers serveur sont identifiés par inode, date et taille : leur
+    contenu n'est lu ni pour la clé du cache des résultats, ni pour celle des
+    textes extraits.
+    """
+    files_data = [(f.filename, await f.read()) for f in files]
+    digests: List[Optional[bytes]] = [None] * len(files_data)
+    requested = _json_form(paths, "paths", list)
+    if requested:
+        server_data, server_digests = files_data_of(await run_in_threadpool(open_server_files, requested))
+        files_data += server_data
+        digests += server_digests
+    if not files_data:
+        raise HTTPException(status_code=422, detail="Aucun fichier : envoyez files ou indiquez paths.")
+    return files_data, digests
+
+
+async def _analysis_response(
+    files_data: List[Tuple[str, bytes]],
+    timings: bool,
+    if_none_match: Optional[str],
+    extractor=read_file_text,
+    digests: Optional[List[Optional[bytes]]] = None,
+) -> Response:
+    """Analyse (ou cache, ou calcul en cours partagé) et réponse JSON avec ETag."""
+    key = files_key(files_data, digests)
+    etag = etag_for(key)
+    if if_none_match == etag and _analysis_cache.cached(key) is not None:
+        return Response(status_code=304, headers={"ETag": etag, "X-AO-Cache": "cache"})
+    (result, collected), source = await _analysis_cache.run(
+        key, lambda: _admission.run(_analyze_with_timings, files_data, extractor, digests)
+    )
+
+    # Copie : le résultat en cache est partagé entre les requêtes
+    result = dict(result)
+    if timings:
+        result["timings"] = {**collected, "source": source}
+    return JSONResponse(result, headers={"ETag": etag, "X-AO-Cache": source})
+
+
+NDJSON = "application/x-ndjson"
+_STREAM_DONE = object()
+
+
+@app.post("/analyze/stream")
+async def analyze_ao_stream(
+    files: List[UploadFile] = File(default=[]),
+    paths: str = Form("[]"),
+    timings: bool = False,
+):
+    """Variante en flux de `/analyze` : un objet JSON par ligne (NDJSON), émis dès qu'il est connu.
+
+    Événements (champ `event`) : `triage` (type de chaque pièce), `file` (pièce
+    extraite), `sector`, `required_document` / `required_document_withdrawn`,
+    `metadata` (`field` : email_to, buyer, deadline ou postal_address),
+    `price_table`, puis `summary` dont `result` est la réponse de `/analyze`.
+    En cas d'échec : `error`. Le résultat final alimente le même cache que
+    `/analyze` ; un résultat en cache est rejoué immédiatement. `paths` :
+    fichiers serveur, comme pour `/analyze`.
+    """
+    files_data, digests = await _request_files(files, paths)
+    return _analysis_stream(files_data, timings, digests=digests)
+
+
+def _analysis_stream(
+    files_data: List[Tuple[str, bytes]],
+    timings: bool,
+    extractor=read_file_text,
+    digests: Optional[List[Optional[bytes]]] = None,
+) -> StreamingResponse:
+    """Réponse NDJSON : rejeu d'un résultat en cache, ou analyse en flux."""
+    key = files_key(files_data, digests)
+    headers = {"ETag": etag_for(key), "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    cached = _analysis_cache.cached(key)
+    if cached is not None:
+        events = _replay_events(*cached, timings)
+        return StreamingResponse(_ndjson(events), media_type=NDJSON, headers={**headers, "X-AO-Cache": "cache"})
+    if _admission.full:
+        raise Overloaded(_admission.retry_after(), "queue_full")
+    events = _stream_events(key, files_data, timings, extractor, digests)
+    return StreamingResponse(_ndjson(events), media_type=NDJSON, headers={**headers, "X-AO-Cache": "computed"})
+
 
-    combined_text = "\n\n".join(texts)
+async def _ndjson(events: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for event in events:
+        yield (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
 
-    # Détection du secteur
-    sector: Optional[str] = detect_sector(combined_text)
 
-    # Documents requis
-    required_docs = extract_required_documents(combined_text, files_data)
+async def _replay_events(result: dict, collected: dict, timings: bool) -> AsyncIterator[dict]:
+    for event in result_events(result):
+        if event["event"] == "summary" and timings:
+            event["timings"] = {**collected, "source": "cache"}
+        yield event
 
-    # Informations complémentaires
-    email_to = extract_email(combined_text)
-    postal_address = extract_postal_address(combined_text)
-    buyer = guess_buyer(combined_text)
-    deadline_dt: Optional[dt.datetime] = guess_deadline(combined_text)
-    deadline = deadline_dt.isoformat() if deadline_dt else None
 
-    return {
+async def _stream_events(
+    key: str,
+    files_data: List[Tuple[str, bytes]],
+    timings: bool,
+    extractor=read_file_text,
+    digests: Optional[List[Optional[bytes]]] = None,
+) -> AsyncIterator[dict]:
+    """Exécute l'analyse en flux sur le pool d'admission et relaie ses événements.
+
+    Tout le générateur tourne dans un seul thread du pool (les temps et le
+    budget mémoire de la requête sont portés par des variables de contexte).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def work() -> Tuple[dict, dict]:
+        with collect_timings() as collected:
+            for event in Pipeline(extractor=extractor).events(files_data, digests=digests):
+                if event["event"] == "summary":
+                    summary = event
+                    continue
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        return summary, collected.as_dict()
+
+    def finished(task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is None:
+            summary, collected = task.result()
+            # Même le client parti, le résultat profite aux requêtes suivantes
+            _analysis_cache.store(key, (summary["result"], collected))
+        queue.put_nowait(_STREAM_DONE)
+
+    task = asyncio.ensure_future(_admission.run(work))
+    task.add_done_callback(finished)
+    if _admission.active >= _admission.max_concurrent:
+        yield {"event": "queued", "queue": _admission.status()}
+
+    while (event := await queue.get()) is not _STREAM_DONE:
+        yield event
+    try:
+        summary, collected = task.result()
+    except Overloaded as exc:
+        yield {"event": "error", "reason": exc.reason, "retry_after": exc.retry_after, "queue": _admission.status()}
+        return
+    except Exception:
+        yield {"event": "error", "reason": "analysis_failed", "message": "Erreur lors de l'analyse des documents."}
+        return
+    if timings:
+        summary = {**summary, "timings": {**collected, "source": "computed"}}
+    yield summary
+
+
+_uploads = UploadStore(admission=_admission)
+
+
+class DeclaredFileModel(BaseModel):
+    name: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class UploadInit(BaseModel):
+    files: List[DeclaredFileModel]
+
+
+@app.exception_handler(UploadError)
+@app.exception_handler(ServerFileError)
+async def upload_error_handler(request: Request, exc: UploadError):
+    return JSONResponse({"success": False, "message": exc.message, **exc.details}, status_code=exc.status_code)
+
+
+@app.post("/uploads")
+def create_upload(body: UploadInit):
+    """Ouvre un envoi par morceaux : déclare les fichiers (nom, taille, SHA-256 facultatif)."""
+    session = _uploads.create([DeclaredFile(f.name, f.size, f.sha256) for f in body.files])
+    return session.status()
+
+
+@app.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    """Position reçue pour chaque fichier : le client reprend l'envoi à partir de là."""
+    return _uploads.get(upload_id).status()
+
+
+async def _read_chunk(request: Request) -> bytes:
+    """Corps d'un morceau, lu en flux : refusé (413) dès qu'il dépasse `UPLOAD_CHUNK_MAX_BYTES`."""
+    too_large = UploadError(413, "Morceau trop volumineux.", chunk_max_bytes=UPLOAD_CHUNK_MAX_BYTES)
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > UPLOAD_CHUNK_MAX_BYTES:
+        raise too_large
+    parts = []
+    size = 0
+    async for part in request.stream():
+        size += len(part)
+        if size > UPLOAD_CHUNK_MAX_BYTES:
+            raise too_large
+        parts.append(part)
+    return b"".join(parts)
+
+
+@app.put("/uploads/{upload_id}/files/{index}")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None),
+):
+    """Reçoit un morceau du fichier `index` à la position `offset` (corps brut)."""
+    session = _uploads.get(upload_id)
+    data = await _read_chunk(request)
+    received = await run_in_threadpool(session.write_chunk, index, offset, data, x_chunk_sha256)
+    return {"index": index, "received": received, "complete": session.is_complete(index)}
+
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    timings: bool = False,
+    stream: bool = False,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Analyse les fichiers reçus ; même réponse que `/analyze` (ou `/analyze/stream` avec `?stream=true`)."""
+    session = _uploads.get(upload_id)
+    if not session.complete:
+        raise UploadError(409, "Envoi incomplet.", **session.status())
+    files_data = await run_in_threadpool(session.files_data)
+    if stream:
+        return _analysis_stream(files_data, timings, session.extractor())
+    return await _analysis_response(files_data, timings, if_none_match, session.extractor())
+
+
+@app.delete("/uploads/{upload_id}")
+def delete_upload(upload_id: str):
+    """Abandonne un envoi et supprime les morceaux reçus."""
+    _uploads.delete(upload_id)
+    return {"success": True}
+
+
+def _json_form(value: str, field: str, expected: type):
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=422, detail=f"{field} doit être du JSON valide.") from None
+    if not isinstance(parsed, expected):
+        raise HTTPException(status_code=422, detail=f"{field} : type inattendu.")
+    return parsed
+
+
+def _relative(path, root: Optional[Path]) -> str:
+    """Chemin relatif à `root` : la réponse ne dévoile pas l'arborescence du serveur."""
+    if root is not None:
+        try:
+            return Path(path).resolve().relative_to(root.resolve()).as_posix()
+        except ValueError:
+            pass
+    return str(path)
+
+
+def _assemble(
+    files_data: List[Tuple[str, bytes]],
+    required_docs: List[dict],
+    root: Optional[Path],
+    manual: dict,
+    dry_run: bool,
+    **fields,
+) -> dict:
+    candidates = find_candidates(required_docs, root) if root is not None else {}
+    selections = select_documents(required_docs, candidates, manual)
+    response = {
         "success": True,
-        "sector": sector,
-        "required_documents": required_docs,
-        "email_to": email_to,
-        "postal_address": postal_address,
-        "buyer": buyer,
-        "deadline": deadline,
+        "candidates": {key: [_relative(path, root) for path in paths] for key, paths in candidates.items()},
+        "selections": {
+            selection.key: _relative(selection.doc, root) if selection.doc else None for selection in selections
+        },
     }
+    if not dry_run:
+        response["dossier"] = assemble_dossier(files_data, selections, **fields).as_dict()
+    return response
+
+
+@app.post("/assemble")
+async def assemble(
+    files: List[UploadFile] = File(default=[]),
+    required_documents: str = Form(...),
+    company_root: Optional[str] = Form(None),
+    selections: str = Form("{}"),
+    ao_id: str = Form(""),
+    email_to: Optional[str] = Form(None),
+    buyer: Optional[str] = Form(None),
+    deadline: Optional[str] = Form(None),
+    sector: Optional[str] = Form(None),
+    dry_run: bool = Form(False),
+):
+    """Assemble le dossier de réponse à partir de fichiers présents sur le serveur.
+
+    Les pièces sont cherchées sous `company_root` (qui doit se trouver dans
+    `AO_COMPANY_ROOTS` ; vide par défaut, tout chemin serveur est refusé) ;
+    `selections` (`{clé: chemin}`, chemin relatif à `company_root` comme les
+    candidats renvoyés) force le choix de certaines pièces. `files`
+    sont les documents AO, copiés dans `source/` (noms sans chemin, sinon 422).
+    Avec `dry_run`, renvoie seulement les candidats et la sélection retenue.
+    Le dossier s'exporte ensuite en ZIP via `GET /export/{id}`.
+    """
+    required_docs = _json_form(required_documents, "required_documents", list)
+    manual = _json_form(selections, "selections", dict)
+    root = Path(company_root) if company_root else None
+    if (root is not None or manual) and not COMPANY_ROOTS:
+        raise HTTPException(status_code=403, detail="Lecture de dossiers serveur désactivée (AO_COMPANY_ROOTS).")
+    if root is not None and not (is_allowed_path(root) and root.is_dir()):
+        raise HTTPException(status_code=403, detail="Dossier d'entreprise non autorisé ou introuvable.")
+    for key, path in manual.items():
+        if not isinstance(path, str):
+            raise HTTPException(status_code=403, detail=f"Fichier non autorisé : {path}")
+        # Chemins relatifs à `company_root`, comme les candidats renvoyés
+        if root is not None and not Path(path).is_absolute():
+            path = manual[key] = str(root / path)
+        if not is_allowed_path(Path(path)):
+            raise HTTPException(status_code=403, detail=f"Fichier non autorisé : {path}")
+    deadline_value = None
+    if deadline:
+        try:
+            deadline_value = dt.datetime.fromisoformat(deadline)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="deadline doit être une date ISO 8601.") from None
+
+    for f in files:
+        if not is_safe_filename(f.filename):
+            raise HTTPException(status_code=422, detail=f"Nom de fichier invalide : {f.filename}")
+    files_data = [(f.filename, await f.read()) for f in files]
+    return await _admission.run(
+        lambda: _assemble(
+            files_data,
+            required_docs,
+            root,
+            manual,
+            dry_run,
+            ao_id=ao_id,
+            buyer=buyer,
+            deadline=deadline_value,
+            email_to=email_to,
+            sector=sector,
+        )
+    )
+
+
+@app.get("/export/{dossier_id}")
+def export(dossier_id: str):
+    """Archive ZIP du dossier `submission/` d'un dossier assemblé, envoyée en flux."""
+    folder = find_dossier(dossier_id)
+    if folder is None or not (folder / "submission").is_dir():
+        raise HTTPException(status_code=404, detail="Dossier introuvable.")
+    mark_used(folder)
+    return StreamingResponse(
+        iter_zip(folder / "submission"),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{dossier_id}_submission.zip"'},
+    )
+
+
+# Routes légères : coroutines servies directement par la boucle, sans passer
+# par un pool de threads que des analyses pourraient occuper.
 
 
 @app.get("/health")
-def health():
-    """Endpoint simple de santé pour vérifier que l'API tourne."""
-    return {"status": "ok"}
+async def health():
+    """Endpoint simple de santé, avec l'état de la file d'analyse."""
+    return {"status": "ok", "queue": _admission.status()}
+
+
+@app.get("/queue")
+async def queue():
+    """État de la file d'analyse (en cours, en attente, capacités)."""
+    return _admission.status()
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose les métriques au format Prometheus."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
+@app.get("/pdf-engines")
+async def pdf_engines():
+    """Statistiques des moteurs PDF par producteur et ordre d'essai appris (voir `pdf_engines`)."""
+    return PDF_ENGINE_SELECTOR.inspect([name for name, _ in PDF_ENGINES])
 
 
+@app.delete("/pdf-engines")
+def reset_pdf_engines(producer: Optional[str] = None, x_ao_profile: Optional[str] = Header(None)):
+    """Efface les statistiques des moteurs PDF (toutes, ou `?producer=`) ; jeton de profilage requis."""
+    if not is_authorized(x_ao_profile):
+        raise HTTPException(status_code=403, detail="Jeton de profilage requis.")
+    return {"reset": PDF_ENGINE_SELECTOR.reset(producer)}
@@ -6,6 +6,7 @@ from pathlib import Path
 import streamlit as st
 
 from pages import analyse, assemblage, export
+from retention import start_janitor
 
 
 def _init_session_state() -> None:
@@ -21,6 +22,12 @@ def _init_session_state() -> None:
         st.session_state.setdefault(key, value)
 
 
+@st.cache_resource
+def _start_retention() -> bool:
+    """Nettoyage périodique de OUTPUT_ROOT et temp_uploads, une fois par serveur Streamlit."""
+    return start_janitor()
+
+
 def _render_sidebar() -> None:
     """Affiche la barre latérale avec les informations de contexte."""
     with st.sidebar:
@@ -66,6 +73,7 @@ def main() -> None:
     )
 
     _init_session_state()
+    _start_retention()
     _render_sidebar()
 
     # Création des onglets
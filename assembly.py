@@ -0,0 +1,299 @@
+"""Assemblage du dossier de réponse, partagé par la page Streamlit et l'API.
+
+Recherche des pièces dans le dossier d'entreprise, copie dans `submission/`,
+checklist, lignes des BPU/DQE (`bordereaux.csv`), `meta.json`, brouillon
+d'email, puis archive ZIP produite en flux (bloc par bloc) pour ne jamais
+tenir tout le dossier en mémoire.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import re
+import secrets
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from analysis import Pipeline
+from config import COMPANY_ROOTS, OUTPUT_ROOT
+from tables import write_price_csv
+from utils import (
+    ChecklistRow,
+    FileEntry,
+    copy_if_found,
+    find_all_matching_docs,
+    now_utc,
+    scan_folder,
+    slugify,
+    write_email_draft,
+    write_markdown_table,
+)
+
+try:
+    import pandas as pd  # type: ignore
+except ImportError:
+    pd = None
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+_DOSSIER_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def build_search_patterns(label: str, doc: dict) -> List[str]:
+    """Construit la liste des patterns de recherche à partir du label et des mots-clés."""
+    patterns: List[str] = []
+
+    # Ajoute les mots significatifs du label
+    label_words = [w.lower() for w in label.split() if len(w) > 2]
+    patterns.extend(label_words[:3])  # Prend les 3 premiers mots significatifs
+
+    # Ajoute les mots-clés éventuels du document
+    for kw in doc.get("keywords", []):
+        if isinstance(kw, str) and len(kw) > 2:
+            patterns.append(kw.lower())
+
+    return patterns
+
+
+def doc_key(doc: dict, idx: int) -> str:
+    return doc.get("key", f"doc_{idx}")
+
+
+def doc_label(doc: dict, idx: int) -> str:
+    return doc.get("label", f"Document {idx}")
+
+
+def is_safe_filename(name: object) -> bool:
+    """Nom de fichier simple, sans dossier : il ne peut pas sortir du dossier où il est écrit."""
+    return isinstance(name, str) and name not in ("", ".", "..") and Path(name).name == name and "\\" not in name
+
+
+def is_allowed_path(path: Path) -> bool:
+    """Indique si `path` est sous l'un des dossiers autorisés (`AO_COMPANY_ROOTS`)."""
+    resolved = Path(path).resolve()
+    return any(resolved.is_relative_to(root) for root in COMPANY_ROOTS)
+
+
+def find_candidates(
+    required_docs: Sequence[dict],
+    root: Path,
+    entries: Optional[Sequence[FileEntry]] = None,
+) -> Dict[str, List[Path]]:
+    """Documents candidats pour chaque pièce requise, du plus pertinent au moins pertinent."""
+    if entries is None:
+        entries = scan_folder(root)
+    return {
+        doc_key(doc, idx): find_all_matching_docs(
+            root, build_search_patterns(doc_label(doc, idx), doc), max_age_days=None, entries=entries
+        )
+        for idx, doc in enumerate(required_docs, 1)
+    }
+
+
+@dataclass
+class DocumentSelection:
+    """Document retenu (chemin ou None) pour une pièce requise."""
+
+    key: str
+    label: str
+    item: dict
+    doc: Optional[str]
+
+
+def select_documents(
+    required_docs: Sequence[dict],
+    candidates: Mapping[str, Sequence[Path]],
+    manual: Optional[Mapping[str, str]] = None,
+) -> List[DocumentSelection]:
+    """Sélection manuelle si le fichier existe, sinon le meilleur candidat."""
+    manual = manual or {}
+    selections = []
+    for idx, doc in enumerate(required_docs, 1):
+        key = doc_key(doc, idx)
+        chosen = manual.get(key)
+        if not chosen or not Path(chosen).exists():
+            found = candidates.get(key) or []
+            chosen = str(found[0]) if found else None
+        selections.append(DocumentSelection(key, doc_label(doc, idx), doc, chosen))
+    return selections
+
+
+@dataclass
+class AssembledDossier:
+    """Dossier de réponse écrit sous `OUTPUT_ROOT`."""
+
+    folder: Path
+    rows: List[ChecklistRow]
+    meta: dict
+
+    @property
+    def id(self) -> str:
+        return self.folder.name
+
+    def as_dict(self) -> dict:
+        email_draft = self.folder / "email_draft.txt"
+        return {
+            "id": self.id,
+            "folder": str(self.folder),
+            "checklist": [row.__dict__ for row in self.rows],
+            "meta": self.meta,
+            "email_draft": email_draft.read_text(encoding="utf-8") if email_draft.exists() else None,
+        }
+
+
+def write_checklist(rows: Sequence[ChecklistRow], submission_dir: Path) -> Path:
+    """Écrit la checklist en XLSX (pandas) ou, à défaut, en CSV."""
+    if pd:
+        target = submission_dir / "checklist.xlsx"
+        pd.DataFrame([row.__dict__ for row in rows]).to_excel(target, index=False)
+        return target
+    target = submission_dir / "checklist.csv"
+    target.write_text(
+        "key,label,status,source,submission_path,max_age_days\n" + "\n".join(
+            f"{row.key},{row.label},{row.status},{row.source},{row.submission_path},{row.max_age_days}"
+            for row in rows
+        ), encoding="utf-8"
+    )
+    return target
+
+
+def assemble_dossier(
+    ao_files: Sequence[Tuple[str, bytes]],
+    selections: Sequence[DocumentSelection],
+    ao_id: str = "",
+    *,
+    buyer: Optional[str] = None,
+    deadline: Optional[dt.datetime] = None,
+    email_to: Optional[str] = None,
+    sector: Optional[str] = None,
+    pipeline: Optional[Pipeline] = None,
+    output_root: Path = OUTPUT_ROOT,
+) -> AssembledDossier:
+    """Écrit le dossier de réponse : sources, pièces retenues, checklist, bordereaux, meta.json et email.
+
+    Les documents AO passent par le pipeline d'analyse (`analysis`) : textes,
+    résultats partiels et bordereaux déjà calculés à l'analyse sont repris de
+    ses caches. `buyer` et `deadline` ne servent que si les documents AO ne
+    permettent pas de les retrouver. Un nom de fichier AO contenant un chemin
+    lève `ValueError`.
+    """
+    for filename, _ in ao_files:
+        if not is_safe_filename(filename):
+            raise ValueError(f"Nom de fichier invalide : {filename}")
+    # Suffixe aléatoire : l'identifiant sert à l'export sans authentification,
+    # il ne doit pas se deviner d'après la référence de l'AO et l'heure
+    stamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    ao_folder = output_root / f"{slugify(ao_id or 'ao')}_{stamp}_{secrets.token_hex(16)}"
+    ao_folder.mkdir(parents=True, exist_ok=True)
+
+    # Sauvegarde des fichiers AO source
+    (ao_folder / "source").mkdir(exist_ok=True)
+    for filename, raw in ao_files:
+        (ao_folder / "source" / filename).write_bytes(raw)
+
+    # Extraction des métadonnées
+    analysis = (pipeline or Pipeline()).analyze(ao_files)
+    buyer = analysis.metadata.get("buyer") or buyer
+    deadline = analysis.metadata.get("deadline") or deadline
+
+    # Copie des documents dans le dossier de soumission
+    submission_dir = ao_folder / "submission"
+    submission_dir.mkdir(exist_ok=True)
+    rows: List[ChecklistRow] = []
+
+    for selection in selections:
+        key = selection.item.get("key", selection.key) if isinstance(selection.item, dict) else selection.key
+        found_doc = selection.doc
+        if found_doc and Path(found_doc).exists():
+            submission_path = str(copy_if_found(Path(found_doc), submission_dir))
+            status = "OK"
+        else:
+            submission_path = ""
+            status = "MISSING"
+
+        rows.append(ChecklistRow(
+            key=key,
+            label=selection.label,
+            status=status,
+            source=str(found_doc) if found_doc else "",
+            submission_path=submission_path,
+            max_age_days="",
+        ))
+
+    # Génération des fichiers
+    write_checklist(rows, submission_dir)
+    write_price_csv(analysis.tables, submission_dir)
+    (ao_folder / "README.md").write_text(write_markdown_table(rows), encoding="utf-8")
+    meta = {
+        "ao_id": ao_id,
+        "buyer": buyer,
+        "deadline": deadline.isoformat() if isinstance(deadline, dt.datetime) else None,
+        "created_at": now_utc().isoformat(),
+        "sector": sector,
+    }
+    (ao_folder / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    # Génération du brouillon d'email
+    write_email_draft(ao_folder, buyer, deadline, rows, email_to, ao_id)
+
+    return AssembledDossier(ao_folder, rows, meta)
+
+
+def find_dossier(dossier_id: str, output_root: Path = OUTPUT_ROOT) -> Optional[Path]:
+    """Dossier assemblé correspondant à `dossier_id`, ou None (identifiant invalide ou inconnu)."""
+    if not _DOSSIER_ID.match(dossier_id):
+        return None
+    folder = output_root / dossier_id
+    return folder if (folder / "meta.json").is_file() else None
+
+
+class _ZipSink:
+    """Flux d'écriture sans `seek` : zipfile écrit alors des descripteurs de données
+    après chaque fichier, ce qui permet d'émettre l'archive au fil de l'eau."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(folder: Path, chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    """Archive ZIP du contenu de `folder`, produite bloc par bloc."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file in sorted(folder.rglob("*")):
+            if not file.is_file():
+                continue
+            info = zipfile.ZipInfo.from_file(file, file.relative_to(folder))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with file.open("rb") as src, zf.open(info, "w") as dest:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dest.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
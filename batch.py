@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Analyse headless d'une arborescence de DCE (dossiers et archives ZIP).
+
+Usage :
+    python -m batch analyze <dossier> [--output resultats.jsonl] [--workers N]
+    python -m batch corpus-index <textes> [--index index_corpus] [--labels secteurs.csv]
+    python -m batch corpus-score [--index index_corpus] [--rules regles.py] [--output rapport.json]
+
+Chaque DCE (un dossier contenant des pièces PDF/DOCX/TXT, ou une archive ZIP)
+est analysé par le pipeline de l'API (`analysis`), sur un pool de processus.
+Les résultats sont écrits en JSONL au format de `/analyze` et la progression
+est enregistrée dans un fichier de reprise : une exécution interrompue
+reprend sans réanalyser les DCE terminés. Les DCE en erreur sont retentés,
+et leur ancien enregistrement est retiré du JSONL : il n'y a jamais qu'un
+enregistrement par DCE.
+
+Le mode corpus (`corpus_scoring`) évalue un jeu de règles sur des milliers
+d'AO déjà extraits en texte, sans relancer l'analyse de chaque DCE.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+from analysis import SUPPORTED_EXTENSIONS, Pipeline
+
+
+@dataclass
+class DceUnit:
+    """Un DCE à analyser : un dossier de pièces ou une archive ZIP."""
+
+    id: str
+    path: str
+    kind: str  # "dir", "files" (pièces posées à la racine, sans sous-dossiers) ou "zip"
+
+
+def _is_supported(name: str) -> bool:
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def discover_units(root: Path) -> List[DceUnit]:
+    """Parcourt l'arborescence et liste les DCE.
+
+    Une archive ZIP est toujours un DCE. Un dossier qui contient directement
+    des pièces est un DCE regroupant toutes les pièces de son sous-arbre ;
+    on ne descend alors plus que pour y chercher des archives ZIP. La racine
+    elle-même n'est jamais un tel dossier : ses pièces isolées (un LISEZMOI,
+    par exemple) forment un DCE à part, sans absorber les DCE rangés dans
+    ses sous-dossiers.
+    """
+    units: List[DceUnit] = []
+    claimed: List[Path] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        current = Path(dirpath)
+        inside_unit = any(current == c or c in current.parents for c in claimed)
+        if not inside_unit and any(_is_supported(f) for f in filenames):
+            if current == root:
+                units.append(DceUnit(_unit_id(root, current), str(current), "files"))
+            else:
+                claimed.append(current)
+                units.append(DceUnit(_unit_id(root, current), str(current), "dir"))
+        for name in sorted(filenames):
+            if name.lower().endswith(".zip"):
+                path = current / name
+                units.append(DceUnit(_unit_id(root, path), str(path), "zip"))
+    return units
+
+
+def _unit_id(root: Path, path: Path) -> str:
+    rel = path.relative_to(root).as_posix()
+    return rel if rel != "." else path.name
+
+
+def read_unit(unit: DceUnit) -> List[Tuple[str, bytes]]:
+    """Charge les pièces (nom, contenu) d'un DCE."""
+    files_data: List[Tuple[str, bytes]] = []
+    if unit.kind == "zip":
+        with zipfile.ZipFile(unit.path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not _is_supported(info.filename):
+                    continue
+                files_data.append((Path(info.filename).name, zf.read(info)))
+        return files_data
+
+    base = Path(unit.path)
+    for path in sorted(base.iterdir() if unit.kind == "files" else base.rglob("*")):
+        if path.is_file() and _is_supported(path.name):
+            files_data.append((path.name, path.read_bytes()))
+    return files_data
+
+
+# Le parallélisme est entre DCE : un processus du pool ne peut pas en lancer d'autres
+_PIPELINE = Pipeline("inline")
+
+
+def _analyze_unit(unit: DceUnit) -> dict:
+    """Analyse un DCE dans un processus du pool."""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    record = {"id": unit.id, "path": unit.path}
+    try:
+        files_data = read_unit(unit)
+        record["files"] = [name for name, _ in files_data]
+        record["bytes"] = sum(len(raw) for _, raw in files_data)
+        record.update(_PIPELINE.run(files_data))
+        record["error"] = None
+    except Exception as e:
+        record.update({"success": False, "message": str(e), "error": type(e).__name__})
+    record["elapsed_s"] = round(time.perf_counter() - wall_start, 4)
+    record["cpu_s"] = round(time.process_time() - cpu_start, 4)
+    return record
+
+
+def _checkpoint_path(output: Path) -> Path:
+    return output.with_name(output.name + ".checkpoint")
+
+
+def load_checkpoint(output: Path) -> Set[str]:
+    """Renvoie les identifiants des DCE déjà traités."""
+    path = _checkpoint_path(output)
+    if not path.exists():
+        return set()
+    return {line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()}
+
+
+def _drop_unfinished(output: Path, done: Set[str]) -> None:
+    """Retire de `output` les enregistrements absents de la reprise.
+
+    Ce sont les erreurs, retentées à chaque reprise, et le dernier résultat
+    d'une exécution interrompue avant son point de reprise : sans ce
+    nettoyage, le JSONL aurait plusieurs enregistrements pour un même DCE.
+    """
+    if not output.exists():
+        return
+    kept = []
+    dropped = False
+    with output.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record_id = json.loads(line).get("id")
+            except ValueError:
+                record_id = None  # ligne tronquée par une interruption
+            if record_id in done:
+                kept.append(line if line.endswith("\n") else line + "\n")
+            else:
+                dropped = True
+    if dropped:
+        tmp = output.with_name(output.name + ".tmp")
+        tmp.write_text("".join(kept), encoding="utf-8")
+        os.replace(tmp, output)
+
+
+def _iter_results(units: List[DceUnit], workers: int) -> Iterator[dict]:
+    if workers <= 1:
+        for unit in units:
+            yield _analyze_unit(unit)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(_analyze_unit, units, chunksize=1)
+
+
+def run_analyze(root: Path, output: Path, workers: int, quiet: bool = False) -> dict:
+    """Analyse tous les DCE de `root` et renvoie les statistiques d'exécution."""
+    units = discover_units(root)
+    done = load_checkpoint(output)
+    pending = [u for u in units if u.id not in done]
+
+    if not quiet:
+        print(
+            f"{len(units)} DCE trouvé(s), {len(units) - len(pending)} déjà traité(s), "
+            f"{len(pending)} à analyser sur {workers} processus",
+            file=sys.stderr,
+        )
+
+    stats = {"units": 0, "errors": 0, "files": 0, "bytes": 0, "cpu_s": 0.0}
+    start = time.perf_counter()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    _drop_unfinished(output, done)
+    with output.open("a", encoding="utf-8") as out, _checkpoint_path(output).open("a", encoding="utf-8") as ckpt:
+        for record in _iter_results(pending, workers):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            stats["units"] += 1
+            stats["cpu_s"] += record.get("cpu_s", 0.0)
+            stats["files"] += len(record.get("files", []))
+            stats["bytes"] += record.get("bytes", 0)
+            if record.get("error"):
+                # Les erreurs ne sont pas marquées comme terminées : elles seront retentées
+                stats["errors"] += 1
+            else:
+                os.fsync(out.fileno())
+                ckpt.write(record["id"] + "\n")
+                ckpt.flush()
+            if not quiet:
+                status = "ERREUR" if record.get("error") else "ok"
+                print(f"[{stats['units']}/{len(pending)}] {record['id']} ({record['elapsed_s']:.2f}s, {status})", file=sys.stderr)
+
+    wall_s = time.perf_counter() - start
+    stats["wall_s"] = wall_s
+    stats["workers"] = workers
+    stats["units_per_s"] = stats["units"] / wall_s if wall_s > 0 else 0.0
+    stats["units_per_s_per_core"] = stats["units_per_s"] / max(workers, 1)
+    stats["mb_per_s_per_core"] = stats["bytes"] / 1e6 / wall_s / max(workers, 1) if wall_s > 0 else 0.0
+    stats["units_per_cpu_s"] = stats["units"] / stats["cpu_s"] if stats["cpu_s"] > 0 else 0.0
+    return stats
+
+
+def _print_stats(stats: dict) -> None:
+    print(
+        "\n".join(
+            [
+                f"DCE analysés      : {stats['units']} ({stats['errors']} erreur(s))",
+                f"Fichiers / octets : {stats['files']} / {stats['bytes']}",
+                f"Durée             : {stats['wall_s']:.2f}s sur {stats['workers']} processus",
+                f"Débit             : {stats['units_per_s']:.2f} DCE/s",
+                f"Débit par cœur    : {stats['units_per_s_per_core']:.2f} DCE/s, "
+                f"{stats['mb_per_s_per_core']:.2f} Mo/s",
+                f"Débit par s CPU   : {stats['units_per_cpu_s']:.2f} DCE/s",
+            ]
+        ),
+        file=sys.stderr,
+    )
+
+
+def _print_corpus_report(report: dict) -> None:
+    lines = [
+        f"Documents / termes : {report['documents']} / {report['terms']}",
+        f"Secteurs détectés  : {report['predicted_sectors']}",
+    ]
+    if report["sector_accuracy"] is not None:
+        lines.append(f"Exactitude secteur : {report['sector_accuracy']:.1%} sur {report['labelled']} document(s) étiqueté(s)")
+        sectors = list(report["sector_confusion"])
+        lines.append("Confusion (attendu \\ détecté) : " + " ".join(f"{s[:12]:>12}" for s in sectors))
+        for expected, row in report["sector_confusion"].items():
+            lines.append(f"  {expected[:28]:<28} " + " ".join(f"{row[s]:>12}" for s in sectors))
+    lines.append("Règles :")
+    for rule in sorted(report["rules"], key=lambda r: r["hit_rate"]):
+        scope = rule["sector"] or "générique"
+        lines.append(f"  {rule['hit_rate']:>7.1%}  {rule['label'][:60]:<60} [{scope}]")
+    print("\n".join(lines), file=sys.stderr)
+
+
+def run_corpus_index(texts: Path, index: Path, labels: Optional[Path] = None) -> int:
+    from corpus_scoring import build_index
+    from document_rules import SECTOR_KEYWORDS
+
+    start = time.perf_counter()
+    corpus = build_index(texts, list(SECTOR_KEYWORDS), labels)
+    corpus.save(index)
+    print(
+        f"{corpus.matrix.shape[0]} document(s), {corpus.matrix.shape[1]} terme(s), "
+        f"{corpus.matrix.nnz} entrée(s) en {time.perf_counter() - start:.2f}s -> {index}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def run_corpus_score(index: Path, rules: Optional[Path], output: Optional[Path], verify: bool) -> int:
+    from corpus_scoring import CorpusIndex, load_rules, score_rules
+
+    start = time.perf_counter()
+    report = score_rules(CorpusIndex.load(index), *load_rules(rules), verify=verify)
+    report["elapsed_s"] = round(time.perf_counter() - start, 4)
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    _print_corpus_report(report)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m batch", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    analyze = sub.add_parser("analyze", help="Analyse une arborescence de DCE")
+    analyze.add_argument("root", type=Path, help="Dossier contenant les DCE (dossiers et/ou ZIP)")
+    analyze.add_argument("-o", "--output", type=Path, default=Path("analyses.jsonl"), help="Fichier JSONL de sortie")
+    analyze.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Nombre de processus")
+    analyze.add_argument("-q", "--quiet", action="store_true", help="N'affiche que le bilan final")
+
+    corpus_index = sub.add_parser("corpus-index", help="Construit la matrice termes-documents d'un corpus de textes")
+    corpus_index.add_argument("texts", type=Path, help="Dossier de textes extraits (.txt, un AO par fichier)")
+    corpus_index.add_argument("-i", "--index", type=Path, default=Path("index_corpus"), help="Dossier de l'index")
+    corpus_index.add_argument("--labels", type=Path, help="CSV document,secteur (sinon : nom du dossier parent)")
+
+    corpus_score = sub.add_parser("corpus-score", help="Évalue un jeu de règles sur un corpus indexé")
+    corpus_score.add_argument("-i", "--index", type=Path, default=Path("index_corpus"), help="Dossier de l'index")
+    corpus_score.add_argument("--rules", type=Path, help="Module de règles (par défaut document_rules.py)")
+    corpus_score.add_argument("-o", "--output", type=Path, help="Rapport JSON")
+    corpus_score.add_argument(
+        "--no-verify", action="store_true",
+        help="Ne vérifie pas les expressions de plusieurs mots dans le texte (plus rapide, approché)",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "corpus-index":
+        if not args.texts.is_dir():
+            parser.error(f"{args.texts} n'est pas un dossier")
+        return run_corpus_index(args.texts, args.index, args.labels)
+    if args.command == "corpus-score":
+        if not (args.index / "matrix.npz").is_file():
+            parser.error(f"{args.index} n'est pas un index de corpus (lancer corpus-index)")
+        return run_corpus_score(args.index, args.rules, args.output, verify=not args.no_verify)
+
+    if not args.root.is_dir():
+        parser.error(f"{args.root} n'est pas un dossier")
+
+    stats = run_analyze(args.root, args.output, max(args.workers, 1), quiet=args.quiet)
+    _print_stats(stats)
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
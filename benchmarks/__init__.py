@@ -0,0 +1 @@
+"""Benchmarks et générateur de corpus synthétique."""
@@ -0,0 +1,199 @@
+"""Générateur de corpus DCE synthétique pour les benchmarks.
+
+Usage :
+    python -m benchmarks.corpus <dossier> [--pages 20] [--company-files 500]
+
+Produit des pièces RC, CCAP, CCTP et BPU réalistes aux formats PDF, DOCX et
+TXT avec un nombre de pages contrôlé, ainsi qu'une arborescence de documents
+d'entreprise de N fichiers. Les formats dont la bibliothèque n'est pas
+installée (PyMuPDF pour le PDF, python-docx pour le DOCX) sont ignorés.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DOC_TYPES = ("RC", "CCAP", "CCTP", "BPU")
+FORMATS = ("pdf", "docx", "txt")
+LINES_PER_PAGE = 45
+
+_BUYERS = ["Commune de Montauban", "Département de la Gironde", "Syndicat des Eaux du Lot", "CHU de Rennes"]
+_STREETS = ["rue de la République", "avenue Jean Jaurès", "boulevard Gambetta", "place du Marché"]
+_FILLER = [
+    "Le titulaire est tenu de respecter les prescriptions du présent document",
+    "Les prestations sont exécutées conformément aux normes en vigueur",
+    "Le pouvoir adjudicateur se réserve le droit de négocier avec les candidats",
+    "Les délais sont exprimés en jours calendaires à compter de la notification",
+    "Toute modification fera l'objet d'un avenant signé par les deux parties",
+    "Les pénalités de retard sont calculées selon la formule indiquée ci-après",
+    "Le candidat produit une note méthodologique détaillant son organisation",
+    "Les variantes ne sont pas autorisées pour la présente consultation",
+]
+_SECTORS = {
+    "travaux": ["travaux de voirie", "chantier", "assurance décennale", "PPSPS et sécurité chantier"],
+    "informatique": ["maintenance du logiciel", "réseau informatique", "matrice de conformité", "cybersécurité"],
+    "alimentaire": ["denrées alimentaires", "loi EGALIM", "produits issus de l'agriculture biologique", "HACCP"],
+}
+_COMPANY_DOCS = [
+    "Kbis", "Attestation_URSSAF", "Attestation_fiscale", "DC1_lettre_de_candidature",
+    "DC2_declaration_du_candidat", "Attestation_decennale", "Certificat_ISO_9001",
+    "Declaration_sur_l_honneur", "RIB", "Memoire_technique", "References_clients", "PPSPS",
+]
+
+
+def _header_lines(doc_type: str, rng: random.Random, sector: str) -> List[str]:
+    buyer = rng.choice(_BUYERS)
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    if doc_type == "RC":
+        return [
+            "Règlement de consultation (RC)",
+            f"Acheteur : {buyer}",
+            f"Objet : {_SECTORS[sector][0]}",
+            "Article 1 - Pièces du dossier de consultation",
+            "Le dossier comprend l'acte d'engagement (AE), le CCAP, le CCTP, le BPU et le DQE.",
+            "Les candidats fournissent les formulaires DC1 et DC2 ainsi qu'une déclaration sur l'honneur.",
+            "Article 2 - Conditions d'envoi ou de remise des plis",
+            f"Adresse électronique : marches@{buyer.split()[-1].lower()}.fr",
+            f"Adresse : {rng.randint(1, 200)} {rng.choice(_STREETS)} {rng.randint(10000, 95999)}",
+            f"Date limite de remise : {day:02d}/{month:02d}/2025",
+        ]
+    if doc_type == "CCAP":
+        return ["Cahier des clauses administratives particulières (CCAP)", f"Maître d'ouvrage : {buyer}"]
+    if doc_type == "CCTP":
+        return ["Cahier des clauses techniques particulières (CCTP)", *_SECTORS[sector]]
+    return ["Bordereau des prix unitaires (BPU)", "N° | Désignation | Unité | Quantité | Prix unitaire HT"]
+
+
+def _body_line(doc_type: str, index: int, rng: random.Random) -> str:
+    if doc_type == "BPU":
+        return f"{index // 10 + 1}.{index % 10 + 1} | {rng.choice(_FILLER)[:40]} | u | {rng.randint(1, 500)} |"
+    if index % LINES_PER_PAGE == 0:
+        return f"Article {index // LINES_PER_PAGE + 3} - Dispositions particulières"
+    return rng.choice(_FILLER) + "."
+
+
+def generate_pages(doc_type: str, pages: int, seed: int = 0, sector: str = "travaux") -> List[List[str]]:
+    """Génère le contenu d'une pièce sous forme de pages de lignes."""
+    rng = random.Random(f"{seed}-{doc_type}")
+    lines = _header_lines(doc_type, rng, sector)
+    total = max(pages, 1) * LINES_PER_PAGE
+    lines += [_body_line(doc_type, i, rng) for i in range(total - len(lines))]
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, total, LINES_PER_PAGE)]
+
+
+def write_txt(path: Path, pages: List[List[str]]) -> None:
+    path.write_text("\n\n".join("\n".join(page) for page in pages), encoding="utf-8")
+
+
+# Largeurs des colonnes du bordereau (N°, désignation, unité, quantité, prix)
+_TABLE_WIDTHS = (45, 250, 40, 60, 110)
+_ROW_HEIGHT = 16
+
+
+def _draw_table(page, rows: List[str], top: float) -> None:
+    """Dessine les lignes « a | b | c » en tableau quadrillé (détectable par les extracteurs de tableaux)."""
+    import fitz
+
+    for r, line in enumerate(rows):
+        x, y = 40.0, top + r * _ROW_HEIGHT
+        for width, cell in zip(_TABLE_WIDTHS, [c.strip() for c in line.split("|")] + [""] * len(_TABLE_WIDTHS)):
+            page.draw_rect(fitz.Rect(x, y, x + width, y + _ROW_HEIGHT), color=(0, 0, 0), width=0.5)
+            page.insert_text((x + 2, y + 11), cell[:48], fontsize=7)
+            x += width
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    import fitz
+
+    doc = fitz.open()
+    try:
+        for lines in pages:
+            page = doc.new_page()
+            text = [line for line in lines if "|" not in line]
+            rows = [line for line in lines if "|" in line]
+            if text:
+                page.insert_text((40, 40), "\n".join(text), fontsize=8)
+            if rows:
+                _draw_table(page, rows, 40 + 10 * len(text))
+        doc.save(str(path))
+    finally:
+        doc.close()
+
+
+def write_docx(path: Path, pages: List[List[str]]) -> None:
+    from docx import Document
+
+    doc = Document()
+    for index, lines in enumerate(pages):
+        for line in lines:
+            doc.add_paragraph(line)
+        if index < len(pages) - 1:
+            doc.add_page_break()
+    doc.save(str(path))
+
+
+_WRITERS = {"txt": write_txt, "pdf": write_pdf, "docx": write_docx}
+
+
+def generate_dce(
+    out_dir: Path,
+    pages: int = 20,
+    formats=FORMATS,
+    doc_types=DOC_TYPES,
+    seed: int = 0,
+    sector: str = "travaux",
+) -> Dict[str, List[Path]]:
+    """Écrit un DCE par format dans `out_dir/<format>/` et renvoie les chemins par format."""
+    written: Dict[str, List[Path]] = {}
+    for fmt in formats:
+        fmt_dir = out_dir / fmt
+        fmt_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for doc_type in doc_types:
+            path = fmt_dir / f"{doc_type}.{fmt}"
+            try:
+                _WRITERS[fmt](path, generate_pages(doc_type, pages, seed, sector))
+            except ImportError:
+                break
+            paths.append(path)
+        if paths:
+            written[fmt] = paths
+    return written
+
+
+def generate_company_tree(out_dir: Path, n_files: int, seed: int = 0, depth: int = 3) -> List[Path]:
+    """Crée une arborescence de `n_files` documents d'entreprise (contenu factice)."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        parts = [f"dossier_{rng.randint(1, 8)}" for _ in range(rng.randint(0, depth))]
+        folder = out_dir.joinpath(*parts)
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{rng.choice(_COMPANY_DOCS)}_{2020 + i % 6}_{i:05d}.{rng.choice(['pdf', 'docx', 'jpg'])}"
+        path = folder / name
+        path.write_bytes(rng.randbytes(rng.randint(512, 4096)))
+        paths.append(path)
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus", description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--pages", type=int, default=20, help="Nombre de pages par pièce")
+    parser.add_argument("--company-files", type=int, default=500, help="Nombre de documents d'entreprise")
+    parser.add_argument("--sector", choices=sorted(_SECTORS), default="travaux")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    written = generate_dce(args.out_dir / "dce", args.pages, seed=args.seed, sector=args.sector)
+    company = generate_company_tree(args.out_dir / "company", args.company_files, seed=args.seed)
+    for fmt, paths in written.items():
+        print(f"{fmt}: {len(paths)} pièce(s) de {args.pages} page(s)")
+    print(f"company: {len(company)} fichier(s)")
+
+
+if __name__ == "__main__":
+    main()
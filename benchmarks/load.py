@@ -0,0 +1,648 @@
+"""Test de charge de l'API : envois simultanés de DCE, latences et ressources du serveur.
+
+Usage :
+    python -m benchmarks.load                                   # serveur local, DCE générés
+    python -m benchmarks.load --concurrency 16 --duration 120 --output rapport.json
+    python -m benchmarks.load --rate 2 --mix analyze=3,stream=1 --env AO_MAX_CONCURRENT_ANALYSES=4
+    python -m benchmarks.load --corpus /partage/dce --unique    # vrais DCE, sans le cache des résultats
+    python -m benchmarks.load --url http://serveur:8000 --pid 1234
+    python -m benchmarks.load --compare avant.json apres.json   # compare des rapports enregistrés
+
+Sauf avec `--url`, l'API (`uvicorn api:app`) est lancée sur un port libre,
+avec les variables `--env` : c'est ainsi que se comparent les réglages
+(`AO_MAX_CONCURRENT_ANALYSES`, `AO_ANALYSIS_WORKERS`, `AO_PIPELINE_EXECUTOR`...).
+Les DCE du corpus (dossiers ou ZIP, comme pour `batch`, ou DCE PDF générés)
+sont envoyés à tour de rôle sur `/analyze` et `/analyze/stream` selon `--mix` :
+
+- sans `--rate`, `--concurrency` clients enchaînent les requêtes (boucle fermée) ;
+- avec `--rate`, les arrivées suivent un processus de Poisson (requêtes/s),
+  `--concurrency` au plus en cours ; la latence court depuis l'arrivée prévue,
+  attente côté client comprise.
+
+Les DCE identiques sont servis par le cache des résultats : `--unique` ajoute
+à chaque envoi une pièce texte distincte (les caches par étape restent
+actifs ; `--env AO_EXTRACT_CACHE_MAX_MB=0 --env AO_PARTIAL_CACHE_MAX_MB=0`
+les désactive).
+
+Le rapport JSON donne par endpoint le débit, les latences p50/p95/p99 (et le
+délai du premier événement du flux), les erreurs par code HTTP et la
+provenance des réponses (`X-AO-Cache`), puis le CPU et le RSS du serveur
+(processus et descendants) et l'état de la file d'admission au fil du test.
+Avec `--baseline`, le code de sortie vaut 1 si un p95, le débit ou le taux
+d'erreur régresse au-delà de `--threshold`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from batch import discover_units, read_unit
+from benchmarks.corpus import generate_dce
+
+ROOT = Path(__file__).resolve().parent.parent
+ENDPOINTS = {"analyze": "/analyze", "stream": "/analyze/stream"}
+# En dessous de cet écart absolu de p95, une variation est considérée comme du bruit
+MIN_REGRESSION_S = 0.05
+
+
+@dataclass
+class Upload:
+    """Un DCE à envoyer : nom et pièces (nom, contenu)."""
+
+    name: str
+    files: List[Tuple[str, bytes]]
+
+
+@dataclass
+class Record:
+    """Une requête du test : latence depuis l'arrivée, premier événement du flux, statut, provenance."""
+
+    endpoint: str
+    arrival: float
+    latency_s: float
+    first_event_s: Optional[float]
+    status: str
+    cache: Optional[str]
+
+
+def _multipart(files: Sequence[Tuple[str, bytes]]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, raw in files:
+        header = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{name}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        )
+        parts += [header.encode("utf-8"), raw, b"\r\n"]
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def load_corpus(corpus: Optional[Path], dce: int, pages: int, work_dir: Path) -> List[Upload]:
+    """DCE du dossier `corpus` (dossiers ou ZIP), ou `dce` DCE PDF générés de `pages` pages."""
+    if corpus is not None:
+        uploads = [Upload(unit.id, read_unit(unit)) for unit in discover_units(corpus)]
+        return [upload for upload in uploads if upload.files]
+    uploads = []
+    for seed in range(dce):
+        written = generate_dce(work_dir / f"dce-{seed}", pages, formats=("pdf",), seed=seed)
+        uploads.append(Upload(f"dce-{seed}", [(p.name, p.read_bytes()) for p in written.get("pdf", [])]))
+    return uploads
+
+
+# --- Ressources du serveur (psutil s'il est installé, sinon /proc sous Linux) ---
+
+def _proc_usage(pid: int) -> Optional[Tuple[float, int]]:
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    ticks = os.sysconf("SC_CLK_TCK")
+    stats: Dict[int, Tuple[int, float, int]] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            # Champs après le nom entre parenthèses : état, ppid, ..., utime (11), stime (12)
+            fields = (entry / "stat").read_text().rsplit(")", 1)[1].split()
+            rss = int((entry / "statm").read_text().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        stats[int(entry.name)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks, rss)
+    if pid not in stats:
+        return None
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [child for child, (ppid, _, _) in stats.items() if ppid == parent and child not in tree]
+        tree.update(children)
+        frontier += children
+    return sum(stats[p][1] for p in tree), sum(stats[p][2] for p in tree)
+
+
+def tree_usage(pid: int) -> Optional[Tuple[float, int]]:
+    """Temps CPU (s) et RSS (octets) cumulés du processus et de ses descendants, ou None."""
+    try:
+        import psutil
+    except ImportError:
+        if not Path("/proc/self/stat").exists():
+            return None
+        return _proc_usage(pid)
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    cpu, rss = 0.0, 0
+    for process in processes:
+        try:
+            times = process.cpu_times()
+            cpu += times.user + times.system
+            rss += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return cpu, rss
+
+
+class LoadTest:
+    """Envois concurrents vers l'API et échantillonnage du serveur pendant le test."""
+
+    def __init__(
+        self,
+        url: str,
+        uploads: List[Upload],
+        mix: Dict[str, int],
+        concurrency: int,
+        rate: Optional[float],
+        unique: bool,
+        timeout: float,
+        pid: Optional[int],
+        sample_interval: float,
+        seed: int = 0,
+    ):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname or "127.0.0.1", parts.port or 80
+        self.uploads = uploads
+        self.mix = mix
+        self.concurrency = concurrency
+        self.rate = rate
+        self.unique = unique
+        self.timeout = timeout
+        self.pid = pid
+        self.sample_interval = sample_interval
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.records: List[Record] = []
+        self.timeline: List[dict] = []
+        self._bodies = [_multipart(upload.files) for upload in uploads]
+        self._lock = threading.Lock()
+        self.max_requests: Optional[int] = None
+        self._issued = 0
+        self._in_flight = 0
+        self._stop = threading.Event()
+
+    def _next(self) -> Optional[Tuple[int, str]]:
+        """Prochain envoi (numéro, endpoint), ou None si le test est terminé."""
+        with self._lock:
+            if self._stop.is_set() or (self.max_requests is not None and self._issued >= self.max_requests):
+                return None
+            index = self._issued
+            self._issued += 1
+            endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        return index, endpoint
+
+    def _body(self, index: int) -> Tuple[bytes, str]:
+        position = index % len(self.uploads)
+        if not self.unique:
+            return self._bodies[position]
+        marker = (f"charge-{self.run_id}-{index}.txt", f"Envoi de charge {self.run_id} {index}\n".encode("utf-8"))
+        return _multipart(self.uploads[position].files + [marker])
+
+    def send(self, index: int, endpoint: str, arrival: float) -> Record:
+        body, content_type = self._body(index)
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        first_event, cache = None, None
+        with self._lock:
+            self._in_flight += 1
+        try:
+            conn.request("POST", ENDPOINTS[endpoint], body, {"Content-Type": content_type})
+            response = conn.getresponse()
+            cache = response.getheader("X-AO-Cache")
+            status = str(response.status)
+            if endpoint == "stream" and response.status == 200:
+                last = None
+                for line in response:
+                    if first_event is None:
+                        first_event = time.perf_counter() - arrival
+                    last = line
+                event = json.loads(last) if last else {"event": "error", "reason": "empty"}
+                if event.get("event") == "error":
+                    status = f"error:{event.get('reason')}"
+            else:
+                response.read()
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            status = type(exc).__name__
+        finally:
+            conn.close()
+            with self._lock:
+                self._in_flight -= 1
+        return Record(endpoint, arrival, time.perf_counter() - arrival, first_event, status, cache)
+
+    def _closed_loop(self) -> None:
+        while (item := self._next()) is not None:
+            record = self.send(*item, time.perf_counter())
+            with self._lock:
+                self.records.append(record)
+
+    def _open_loop(self, pool: ThreadPoolExecutor) -> None:
+        arrival = time.perf_counter()
+        while (item := self._next()) is not None:
+            arrival += self.rng.expovariate(self.rate)
+            delay = arrival - time.perf_counter()
+            if delay > 0 and self._stop.wait(delay):
+                return
+            future = pool.submit(self.send, *item, arrival)
+            future.add_done_callback(lambda f: self._collect(f.result()))
+
+    def _collect(self, record: Record) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def _queue_status(self) -> dict:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=min(self.timeout, 2.0))
+        try:
+            conn.request("GET", "/queue")
+            response = conn.getresponse()
+            return json.loads(response.read()) if response.status == 200 else {}
+        except (OSError, http.client.HTTPException, ValueError):
+            return {}
+        finally:
+            conn.close()
+
+    def _sample(self, start: float) -> None:
+        previous = tree_usage(self.pid) if self.pid else None
+        previous_at = time.perf_counter()
+        while not self._stop.wait(self.sample_interval):
+            now = time.perf_counter()
+            usage = tree_usage(self.pid) if self.pid else None
+            queue = self._queue_status()
+            with self._lock:
+                sample = {"t": round(now - start, 2), "in_flight": self._in_flight, "completed": len(self.records)}
+            if usage is not None and previous is not None:
+                sample["cpu_percent"] = round(100 * (usage[0] - previous[0]) / (now - previous_at), 1)
+                sample["rss_mb"] = round(usage[1] / 1e6, 1)
+            sample["active"] = queue.get("active")
+            sample["waiting"] = queue.get("waiting")
+            self.timeline.append(sample)
+            previous, previous_at = usage, now
+
+    def run(self, duration: Optional[float], max_requests: Optional[int]) -> float:
+        """Exécute le test et renvoie sa durée (s) ; les requêtes en cours à l'échéance sont attendues."""
+        self.max_requests = max_requests
+        start = time.perf_counter()
+        sampler = threading.Thread(target=self._sample, args=(start,), name="load-sampler", daemon=True)
+        sampler.start()
+        timer = threading.Timer(duration, self._stop.set) if duration else None
+        if timer is not None:
+            timer.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="load") as pool:
+            if self.rate:
+                self._open_loop(pool)
+            else:
+                for _ in range(self.concurrency):
+                    pool.submit(self._closed_loop)
+        elapsed = time.perf_counter() - start
+        if timer is not None:
+            timer.cancel()
+        self._stop.set()
+        sampler.join()
+        return elapsed
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Percentile `q` (0-100) par interpolation linéaire, ou None sans valeur."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _distribution(values: Sequence[float]) -> dict:
+    return {
+        "p50": _round(_percentile(values, 50)),
+        "p95": _round(_percentile(values, 95)),
+        "p99": _round(_percentile(values, 99)),
+        "mean": _round(statistics.fmean(values)) if values else None,
+        "max": _round(max(values)) if values else None,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def summarize(records: Sequence[Record], elapsed: float) -> dict:
+    """Débit, latences des réponses réussies, erreurs par statut et provenance des réponses."""
+    ok = [r for r in records if r.status == "200"]
+    summary = {
+        "requests": len(records),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(records), 4) if records else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_s": _distribution([r.latency_s for r in ok]),
+        "errors": dict(Counter(r.status for r in records if r.status != "200")),
+        "cache": dict(Counter(r.cache or "none" for r in ok)),
+    }
+    first_events = [r.first_event_s for r in ok if r.first_event_s is not None]
+    if first_events:
+        summary["first_event_s"] = _distribution(first_events)
+    return summary
+
+
+def server_summary(timeline: Sequence[dict]) -> Optional[dict]:
+    cpu = [s["cpu_percent"] for s in timeline if "cpu_percent" in s]
+    rss = [s["rss_mb"] for s in timeline if "rss_mb" in s]
+    if not cpu:
+        return None
+    return {
+        "cpu_percent": {"mean": round(statistics.fmean(cpu), 1), "max": max(cpu)},
+        "rss_mb": {"max": max(rss), "final": rss[-1]},
+        "samples": len(cpu),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(host: str, port: int, process: Optional[subprocess.Popen], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté au démarrage (code {process.returncode}).")
+        conn = http.client.HTTPConnection(host, port, timeout=2)
+        try:
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.2)
+    raise RuntimeError(f"Le serveur ne répond pas sur /health après {timeout:.0f} s.")
+
+
+def start_server(env: Dict[str, str], uvicorn_workers: int, timeout: float) -> Tuple[subprocess.Popen, str]:
+    """Lance `uvicorn api:app` sur un port libre avec les variables `env` ; renvoie le processus et l'URL."""
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    if uvicorn_workers > 1:
+        command += ["--workers", str(uvicorn_workers)]
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env})
+    try:
+        _wait_healthy("127.0.0.1", port, process, timeout)
+    except Exception:
+        stop_server(process)
+        raise
+    return process, f"http://127.0.0.1:{port}"
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# --- Comparaison de rapports enregistrés ---
+
+def _metric(report: dict, path: Sequence[str]):
+    value = report
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _rows(reports: Sequence[dict]) -> List[Tuple[str, Tuple[str, ...]]]:
+    endpoints = sorted({name for report in reports for name in report.get("endpoints", {})})
+    rows = [
+        ("concurrence", ("meta", "concurrency")),
+        ("arrivées (req/s)", ("meta", "rate")),
+        ("débit total (req/s)", ("summary", "throughput_rps")),
+        ("taux d'erreur", ("summary", "error_rate")),
+    ]
+    for name in endpoints:
+        rows += [
+            (f"{name} débit (req/s)", ("endpoints", name, "throughput_rps")),
+            (f"{name} p50 (s)", ("endpoints", name, "latency_s", "p50")),
+            (f"{name} p95 (s)", ("endpoints", name, "latency_s", "p95")),
+            (f"{name} p99 (s)", ("endpoints", name, "latency_s", "p99")),
+            (f"{name} erreurs", ("endpoints", name, "error_rate")),
+        ]
+    rows += [
+        ("CPU serveur moyen (%)", ("server", "cpu_percent", "mean")),
+        ("CPU serveur max (%)", ("server", "cpu_percent", "max")),
+        ("RSS serveur max (Mo)", ("server", "rss_mb", "max")),
+    ]
+    return rows
+
+
+def compare_reports(reports: Sequence[Tuple[str, dict]]) -> str:
+    """Tableau des indicateurs des rapports, écart relatif au premier entre parenthèses."""
+    names = [name for name, _ in reports]
+    data = [report for _, report in reports]
+    envs = {name: report.get("meta", {}).get("env", {}) for name, report in reports}
+    lines = [f"{'':<24}" + "".join(f"{name[-22:]:>24}" for name in names)]
+    for label, path in _rows(data):
+        values = [_metric(report, path) for report in data]
+        cells = []
+        for index, value in enumerate(values):
+            if value is None:
+                cells.append(f"{'-':>24}")
+                continue
+            cell = f"{value:g}"
+            if index and isinstance(values[0], (int, float)) and values[0]:
+                cell += f" ({(value - values[0]) / values[0]:+.0%})"
+            cells.append(f"{cell:>24}")
+        lines.append(f"{label:<24}" + "".join(cells))
+    for name, env in envs.items():
+        if env:
+            lines.append(f"{name} : " + " ".join(f"{k}={v}" for k, v in sorted(env.items())))
+    return "\n".join(lines)
+
+
+def regressions(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Endpoints dont le p95 ou le débit régresse au-delà du seuil, ou dont les erreurs augmentent."""
+    problems = []
+    for name, now in current.get("endpoints", {}).items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        p95, ref_p95 = now["latency_s"]["p95"], before["latency_s"]["p95"]
+        if p95 is not None and ref_p95 and p95 > ref_p95 * (1 + threshold) and p95 - ref_p95 > MIN_REGRESSION_S:
+            problems.append(f"{name} p95 : {ref_p95:.3f} s -> {p95:.3f} s")
+        rps, ref_rps = now["throughput_rps"], before["throughput_rps"]
+        if ref_rps and rps < ref_rps * (1 - threshold):
+            problems.append(f"{name} débit : {ref_rps:.3f} -> {rps:.3f} req/s")
+        if now["error_rate"] > before["error_rate"] + 0.01:
+            problems.append(f"{name} erreurs : {before['error_rate']:.1%} -> {now['error_rate']:.1%}")
+    return problems
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint inconnu : {name} (attendu : {', '.join(ENDPOINTS)})")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Au moins un endpoint doit avoir un poids positif.")
+    return mix
+
+
+def _parse_env(value: str) -> Tuple[str, str]:
+    name, sep, setting = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Attendu NOM=valeur : {value}")
+    return name, setting
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="API déjà démarrée (sinon lancée localement)")
+    parser.add_argument("--pid", type=int, help="Processus du serveur à mesurer avec --url")
+    parser.add_argument("--env", type=_parse_env, action="append", default=[], help="NOM=valeur pour le serveur lancé")
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--corpus", type=Path, help="Dossier de DCE (dossiers ou ZIP) ; sinon DCE PDF générés")
+    parser.add_argument("--dce", type=int, default=4, help="Nombre de DCE générés")
+    parser.add_argument("--pages", type=int, default=10, help="Pages par pièce des DCE générés")
+    parser.add_argument("--mix", type=_parse_mix, default={"analyze": 1}, help="Poids par endpoint : analyze=3,stream=1")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes en cours au plus")
+    parser.add_argument("--rate", type=float, help="Arrivées par seconde (Poisson) ; sinon boucle fermée")
+    parser.add_argument("--duration", type=float, default=60.0, help="Durée des arrivées (s)")
+    parser.add_argument("--requests", type=int, help="Nombre total de requêtes (arrête le test plus tôt)")
+    parser.add_argument("--warmup", type=int, default=0, help="Requêtes préalables, hors mesures")
+    parser.add_argument("--unique", action="store_true", help="Rend chaque envoi unique (cache des résultats évité)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Échantillonnage du serveur (s)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--baseline", type=Path, help="Rapport de référence : code de sortie 1 en cas de régression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Régression relative tolérée (0.25 = 25 %%)")
+    parser.add_argument("--compare", type=Path, nargs="+", help="Compare des rapports enregistrés, sans test")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = [(path.stem, json.loads(path.read_text(encoding="utf-8"))) for path in args.compare]
+        print(compare_reports(reports))
+        return 0
+
+    env = dict(args.env)
+    with tempfile.TemporaryDirectory(prefix="ao-load-") as tmp:
+        uploads = load_corpus(args.corpus, args.dce, args.pages, Path(tmp))
+    if not uploads:
+        print("Aucun DCE à envoyer.", file=sys.stderr)
+        return 1
+
+    process = None
+    url, pid = args.url, args.pid
+    if url is None:
+        process, url = start_server(env, args.uvicorn_workers, args.startup_timeout)
+        pid = process.pid
+    elif env:
+        print("⚠️ --env ignoré avec --url : le serveur est déjà configuré.", file=sys.stderr)
+    try:
+        if args.warmup:
+            LoadTest(url, uploads, args.mix, 1, None, False, args.timeout, None, args.sample_interval).run(
+                None, args.warmup
+            )
+        test = LoadTest(
+            url, uploads, args.mix, args.concurrency, args.rate, args.unique, args.timeout, pid,
+            args.sample_interval, args.seed,
+        )
+        print(
+            f"{len(uploads)} DCE, {args.concurrency} en parallèle"
+            + (f", {args.rate:g} req/s" if args.rate else "")
+            + f", {args.duration:g} s sur {url}",
+            file=sys.stderr,
+        )
+        elapsed = test.run(args.duration, args.requests)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    by_endpoint: Dict[str, List[Record]] = {}
+    for record in test.records:
+        by_endpoint.setdefault(record.endpoint, []).append(record)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "url": args.url or "local",
+            "uvicorn_workers": args.uvicorn_workers if args.url is None else None,
+            "env": env,
+            "corpus": str(args.corpus) if args.corpus else f"généré ({args.dce} DCE PDF, {args.pages} pages)",
+            "dce": len(uploads),
+            "bytes": sum(len(raw) for upload in uploads for _, raw in upload.files),
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "unique": args.unique,
+            "duration_s": round(elapsed, 2),
+        },
+        "summary": summarize(test.records, elapsed),
+        "endpoints": {name: summarize(records, elapsed) for name, records in sorted(by_endpoint.items())},
+        "server": server_summary(test.timeline),
+        "timeline": test.timeline,
+    }
+
+    for name, stats in report["endpoints"].items():
+        latency = stats["latency_s"]
+        print(
+            f"{name:<8} {stats['ok']}/{stats['requests']} ok, {stats['throughput_rps']:.2f} req/s, "
+            f"p50 {latency['p50'] or 0:.3f} s, p95 {latency['p95'] or 0:.3f} s, p99 {latency['p99'] or 0:.3f} s"
+            + (f", erreurs {stats['errors']}" if stats["errors"] else ""),
+            file=sys.stderr,
+        )
+    if report["server"]:
+        server = report["server"]
+        print(
+            f"serveur  CPU moyen {server['cpu_percent']['mean']:.0f} %, max {server['cpu_percent']['max']:.0f} %, "
+            f"RSS max {server['rss_mb']['max']:.0f} Mo",
+            file=sys.stderr,
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if not args.baseline:
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if any(baseline.get("meta", {}).get(key) != report["meta"][key] for key in ("corpus", "bytes", "mix", "unique")):
+        print("⚠️ Corpus ou répartition différents de la référence : comparaison indicative.", file=sys.stderr)
+    print(compare_reports([(args.baseline.stem, baseline), ("actuel", report)]), file=sys.stderr)
+    problems = regressions(report, baseline, args.threshold)
+    for line in problems:
+        print(f"RÉGRESSION {line}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Fuzz des extracteurs de métadonnées : entrées adverses et croissance linéaire.
+
+Usage :
+    python -m benchmarks.regex_fuzz                     # moteur par défaut (RE2 si installé)
+    python -m benchmarks.regex_fuzz --engine re         # force le module re
+    python -m benchmarks.regex_fuzz --sizes 5000 20000 80000 --max-ratio 3
+
+Chaque extracteur (email, adresse, acheteur, date limite) reçoit des textes
+adverses de taille croissante : longues suites de lettres et d'espaces,
+adresses sans code postal, emails sans domaine, mots-clés répétés... Le
+temps par caractère à la plus grande taille, rapporté à celui de la plus
+petite, doit rester sous `--max-ratio` (une croissance quadratique donne
+un rapport proche du rapport des tailles). Des textes aléatoires faits de
+fragments réalistes vérifient ensuite que `re` et RE2 (s'il est installé)
+donnent les mêmes résultats.
+Le code de sortie vaut 1 si un extracteur croît plus que linéairement ou si
+les deux moteurs divergent.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import patterns
+from sections import SectionTree, segment
+from utils import buyer_candidates, deadline_candidates, email_candidates, extract_postal_address
+
+# Textes adverses d'environ n caractères
+ADVERSARIAL: Dict[str, Callable[[int], str]] = {
+    "lettres": lambda n: "a" * n,
+    "mots": lambda n: "abc " * (n // 4),
+    "espaces": lambda n: "1" + " " * n + "rue",
+    "chiffres": lambda n: "1" * n,
+    "adresse_sans_cp": lambda n: "1, " + "rue a " * (n // 6),
+    "adresses_tronquees": lambda n: "12, bis rue de la Paix " * (n // 23),
+    "email_points": lambda n: "a." * (n // 2),
+    "email_domaine": lambda n: "a@" + "a." * (n // 2),
+    "email_arobases": lambda n: "a@a" * (n // 3),
+    "acheteur_espaces": lambda n: "acheteur" + " " * n + "1",
+    "acheteur_repete": lambda n: "acheteur : " * (n // 11),
+    "date_espaces": lambda n: "01/02/2025" + " " * n + "x",
+    "dates": lambda n: "01/02/2025 " * (n // 11),
+    "contact_lignes": lambda n: "contact :\n" * (n // 10),
+    "contacts_distincts": lambda n: "".join(f"contact {i}\n" for i in range(n // 12)),
+    "remise_des_plis": lambda n: "".join(f"Conditions d'envoi ou de remise des plis {i}\n" for i in range(n // 45)),
+}
+
+# Fragments réalistes pour la comparaison des moteurs
+_FRAGMENTS = [
+    "12, rue de la Paix 75002 Paris", "3 bis, avenue Jean Jaurès\n31000 Toulouse", "contact : achats@ville.fr",
+    "Acheteur : Mairie de Toulouse", "Maître d'ouvrage : Conseil Départemental", "commande : SIVOM",
+    "Date limite de remise : 12/03/2025", "dépôt avant le 01-02-25", "05/06/2024 date limite",
+    "adresse électronique", "Conditions d'envoi ou de remise des plis", "CHAPITRE 2 Suite", "x.y@z.com",
+    "éa@x.fr", " ", " ", "é", "Ÿ", " ", "\n", "rue", "place", "1", "75001", "@", ".", ":", "a", "Z", "-", "/",
+]
+
+Extractor = Callable[[str, SectionTree], object]
+EXTRACTORS: Dict[str, Extractor] = {
+    "email": lambda text, sections: email_candidates(text, sections),
+    "address": lambda text, sections: extract_postal_address(text),
+    "buyer": lambda text, sections: buyer_candidates(text),
+    "deadline": lambda text, sections: deadline_candidates(text),
+}
+
+
+def _time(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling(sizes: List[int], repeat: int) -> List[dict]:
+    """Temps par caractère de chaque extracteur sur chaque texte adverse, par taille."""
+    results = []
+    for case, generate in ADVERSARIAL.items():
+        texts = [generate(size) for size in sizes]
+        # Segmentation hors chronométrage : elle est partagée avec le reste de l'analyse
+        trees = [segment(text) for text in texts]
+        for name, extract in EXTRACTORS.items():
+            seconds = [_time(lambda: extract(text, tree), repeat) for text, tree in zip(texts, trees)]
+            per_char = [s / max(len(text), 1) for s, text in zip(seconds, texts)]
+            results.append({
+                "case": case,
+                "extractor": name,
+                "seconds": seconds,
+                "ratio": per_char[-1] / max(per_char[0], 1e-12),
+            })
+    return results
+
+
+def differential(samples: int, seed: int) -> List[Tuple[str, str]]:
+    """Textes aléatoires sur lesquels `re` et RE2 divergent (vide si RE2 est absent)."""
+    if not patterns.re2_available():
+        return []
+    rng = random.Random(seed)
+    texts = [
+        "".join(rng.choice(_FRAGMENTS) + rng.choice(("", " ", "\n")) for _ in range(rng.randint(1, 200)))
+        for _ in range(samples)
+    ]
+    texts += [generate(2000) for generate in ADVERSARIAL.values()]
+    outputs: Dict[str, List[tuple]] = {}
+    for engine in ("re", "re2"):
+        patterns.use_engine(engine)
+        outputs[engine] = [
+            tuple(extract(text, segment(text)) for extract in EXTRACTORS.values()) for text in texts
+        ]
+    patterns.use_engine(patterns.REGEX_ENGINE)
+    return [
+        (name, text)
+        for text, ref, other in zip(texts, outputs["re"], outputs["re2"])
+        for name, a, b in zip(EXTRACTORS, ref, other)
+        if a != b
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.regex_fuzz", description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", choices=patterns.ENGINES, default=patterns.REGEX_ENGINE)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 20_000, 80_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ratio", type=float, default=3.0, help="Rapport toléré des temps par caractère")
+    parser.add_argument("--samples", type=int, default=500, help="Textes aléatoires de la comparaison des moteurs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    patterns.use_engine(args.engine)
+    used = sorted(set(patterns.engines().values()))
+    print(f"Moteurs : {', '.join(used)} ; tailles : {args.sizes}", file=sys.stderr)
+
+    failures = []
+    for result in scaling(sorted(args.sizes), args.repeat):
+        label = f"{result['case']}/{result['extractor']}"
+        timings = " ".join(f"{s * 1000:8.2f}" for s in result["seconds"])
+        print(f"{label:<34} {timings} ms  x{result['ratio']:.1f}", file=sys.stderr)
+        if result["ratio"] > args.max_ratio:
+            failures.append(f"NON LINÉAIRE {label} : temps par caractère x{result['ratio']:.1f}")
+
+    mismatches = differential(args.samples, args.seed)
+    for name, text in mismatches[:10]:
+        failures.append(f"DIVERGENCE re/RE2 {name} : {text[:80]!r}")
+    if len(mismatches) > 10:
+        failures.append(f"... {len(mismatches) - 10} autre(s) divergence(s)")
+
+    for line in failures:
+        print(line, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Benchmark par étape du pipeline d'analyse et d'assemblage.
+
+Usage :
+    python -m benchmarks.run                      # compare à benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # enregistre une nouvelle référence
+    python -m benchmarks.run --pages 50 --company-files 5000 --threshold 0.3
+
+Chaque étape (extraction par moteur, lignes du BPU avec PyMuPDF et
+pdfplumber, règles, métadonnées, recherche de documents, assemblage, ZIP)
+est chronométrée sur un corpus synthétique.
+Le code de sortie vaut 1 si une étape régresse au-delà du seuil.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import generate_company_tree, generate_dce
+from document_rules import GENERIC_RULES
+from extract_required_documents import detect_sector, extract_required_documents
+from tables import clear_cache as clear_table_cache
+from tables import extract_price_table
+from utils import (
+    PDF_ENGINES,
+    ChecklistRow,
+    copy_if_found,
+    extract_email,
+    extract_postal_address,
+    find_all_matching_docs,
+    guess_buyer,
+    guess_deadline,
+    load_docx_text,
+    load_pdf_text,
+    scan_folder,
+    write_email_draft,
+    write_markdown_table,
+    zip_dir,
+)
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+# En dessous de cet écart absolu, une variation est considérée comme du bruit
+MIN_REGRESSION_S = 0.005
+
+
+def _time(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(durations), "min_s": min(durations), "runs": repeat}
+
+
+# Extraction des lignes du BPU : PyMuPDF (une tranche à la fois, puis sur le pool) et pdfplumber en référence
+TABLE_VARIANTS = (
+    ("tables.fitz", "fitz", False),
+    ("tables.fitz.parallel", "fitz", True),
+    ("tables.pdfplumber", "pdfplumber", False),
+)
+
+
+def _price_table(raw: bytes, engine: str, parallel: bool):
+    clear_table_cache()  # mesure l'extraction, pas le cache
+    return extract_price_table("BPU.pdf", raw, "BPU", engine, parallel=parallel)
+
+
+def build_stages(corpus: Path, work_dir: Path) -> List[Tuple[str, Callable[[], object]]]:
+    """Prépare les étapes à chronométrer à partir du corpus généré."""
+    dce = {fmt: sorted((corpus / "dce" / fmt).glob(f"*.{fmt}")) for fmt in ("pdf", "docx", "txt")}
+    raws = {fmt: [p.read_bytes() for p in paths] for fmt, paths in dce.items()}
+    company = corpus / "company"
+    stages: List[Tuple[str, Callable[[], object]]] = []
+
+    if raws["pdf"]:
+        for name, engine in PDF_ENGINES:
+            try:
+                engine(raws["pdf"][0])
+            except Exception:
+                continue  # moteur non installé
+            stages.append((f"extract.pdf.{name}", lambda e=engine: [e(raw) for raw in raws["pdf"]]))
+        stages.append(("extract.pdf.load_pdf_text", lambda: [load_pdf_text(raw) for raw in raws["pdf"]]))
+        bpu = next((raw for p, raw in zip(dce["pdf"], raws["pdf"]) if p.stem == "BPU"), None)
+        if bpu is not None:
+            for name, engine, parallel in TABLE_VARIANTS:
+                try:
+                    extract_price_table("BPU.pdf", bpu, "BPU", engine, parallel=False)
+                except ImportError:
+                    continue  # moteur non installé
+                stages.append((name, lambda e=engine, p=parallel: _price_table(bpu, e, p)))
+    if raws["docx"]:
+        stages.append(("extract.docx", lambda: [load_docx_text(raw) for raw in raws["docx"]]))
+    stages.append(("extract.txt", lambda: [raw.decode("utf-8", errors="ignore") for raw in raws["txt"]]))
+
+    text = "\n\n".join(raw.decode("utf-8", errors="ignore") for raw in raws["txt"])
+    files_data = [(p.name, raw) for p, raw in zip(dce["txt"], raws["txt"])]
+    stages.append(("rules", lambda: (detect_sector(text), extract_required_documents(text, files_data))))
+    stages.append((
+        "metadata",
+        lambda: (extract_email(text), extract_postal_address(text), guess_buyer(text), guess_deadline(text)),
+    ))
+
+    patterns = [[kw for kw in rule["keywords"] if len(kw) > 2] for rule in GENERIC_RULES]
+    stages.append(("search.scan", lambda: scan_folder(company)))
+    stages.append(("search.match", lambda: [find_all_matching_docs(company, p, None) for p in patterns]))
+
+    submission = work_dir / "submission"
+
+    def assemble() -> None:
+        if submission.exists():
+            shutil.rmtree(submission)
+        entries = scan_folder(company)
+        rows = []
+        for rule, rule_patterns in zip(GENERIC_RULES, patterns):
+            matches = find_all_matching_docs(company, rule_patterns, None, entries=entries)
+            target = str(copy_if_found(matches[0], submission)) if matches else ""
+            rows.append(ChecklistRow(rule["label"], rule["label"], "OK" if target else "MISSING", "", target))
+        (work_dir / "README.md").write_text(write_markdown_table(rows), encoding="utf-8")
+        write_email_draft(work_dir, guess_buyer(text), guess_deadline(text), rows, extract_email(text))
+
+    stages.append(("assembly", assemble))
+    stages.append(("zip", lambda: zip_dir(submission) if submission.exists() else b""))
+    return stages
+
+
+def run(corpus: Path, repeat: int) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory(prefix="ao-bench-") as tmp:
+        results = {}
+        for name, func in build_stages(corpus, Path(tmp)):
+            func()  # échauffement (imports, caches disque)
+            results[name] = _time(func, repeat)
+            print(f"{name:<28} {results[name]['median_s'] * 1000:>10.2f} ms", file=sys.stderr)
+        return results
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Renvoie la liste des étapes qui régressent au-delà du seuil relatif."""
+    regressions = []
+    for name, stats in current.items():
+        ref = baseline.get(name)
+        if not ref:
+            continue
+        delta = stats["median_s"] - ref["median_s"]
+        if delta > MIN_REGRESSION_S and stats["median_s"] > ref["median_s"] * (1 + threshold):
+            regressions.append(
+                f"{name}: {ref['median_s'] * 1000:.2f} ms -> {stats['median_s'] * 1000:.2f} ms "
+                f"(+{delta / ref['median_s'] * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="Corpus existant (sinon un corpus temporaire est généré)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--company-files", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Régression relative tolérée (0.25 = +25%%)")
+    parser.add_argument("--output", type=Path, help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ao-corpus-") as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = Path(tmp)
+            generate_dce(corpus / "dce", args.pages)
+            generate_company_tree(corpus / "company", args.company_files)
+        stages = run(corpus, args.repeat)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pages": args.pages,
+            "company_files": args.company_files,
+            "repeat": args.repeat,
+        },
+        "stages": stages,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Référence enregistrée dans {args.baseline}", file=sys.stderr)
+        return 0
+    if not args.baseline.exists():
+        print("Aucune référence : relancez avec --save-baseline pour en créer une.", file=sys.stderr)
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("meta", {}).get("pages") != args.pages or baseline.get("meta", {}).get("company_files") != args.company_files:
+        print("⚠️ Paramètres du corpus différents de la référence : comparaison indicative.", file=sys.stderr)
+    regressions = compare(stages, baseline.get("stages", {}), args.threshold)
+    for line in regressions:
+        print(f"RÉGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Budgets de traitement (temps, pages, octets) par document et par analyse.
+
+Un budget épuisé n'interrompt pas l'analyse : l'extraction s'arrête et le
+texte déjà obtenu est conservé, le document étant signalé comme tronqué.
+Une limite à `None` signifie « pas de limite ».
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from config import (
+    DOC_MAX_BYTES,
+    DOC_MAX_PAGES,
+    DOC_MAX_SECONDS,
+    REQUEST_MAX_BYTES,
+    REQUEST_MAX_PAGES,
+    REQUEST_MAX_SECONDS,
+)
+
+
+def _min(*values: Optional[float]) -> Optional[float]:
+    present = [v for v in values if v is not None]
+    return min(present) if present else None
+
+
+class Budget:
+    """Budget de temps (secondes), de pages et d'octets de texte extrait."""
+
+    def __init__(
+        self,
+        max_seconds: Optional[float] = None,
+        max_pages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.deadline = _min(deadline, time.monotonic() + max_seconds if max_seconds is not None else None)
+        self.pages = 0
+        self.bytes = 0
+        self.reason: Optional[str] = None
+
+    @classmethod
+    def for_request(cls) -> "Budget":
+        """Budget global d'une analyse, d'après la configuration."""
+        return cls(REQUEST_MAX_SECONDS, REQUEST_MAX_PAGES, REQUEST_MAX_BYTES)
+
+    @property
+    def truncated(self) -> bool:
+        return self.reason is not None
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def exhaust(self, reason: str) -> bool:
+        """Marque le budget comme épuisé (la première cause est conservée)."""
+        if self.reason is None:
+            self.reason = reason
+        return False
+
+    def check(self) -> bool:
+        """Renvoie False (et mémorise la cause) si le budget est épuisé."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return self.exhaust("time")
+        if self.max_pages is not None and self.pages >= self.max_pages:
+            return self.exhaust("pages")
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            return self.exhaust("bytes")
+        return True
+
+    def take_page(self) -> bool:
+        """Réserve une page : False si le budget ne permet plus d'en lire."""
+        if not self.check():
+            return False
+        self.pages += 1
+        return True
+
+    def add_text(self, text: str) -> str:
+        """Comptabilise le texte extrait et le tronque au budget d'octets restant."""
+        size = len(text.encode("utf-8"))
+        if self.max_bytes is not None and self.bytes + size > self.max_bytes:
+            keep = int(self.max_bytes - self.bytes)
+            text = text.encode("utf-8")[:keep].decode("utf-8", errors="ignore")
+            size = keep
+            self.exhaust("bytes")
+        self.bytes += size
+        return text
+
+    def restart(self) -> None:
+        """Repart de zéro page/octet (nouveau moteur d'extraction) en conservant l'échéance."""
+        self.pages = 0
+        self.bytes = 0
+        if self.reason in ("pages", "bytes"):
+            self.reason = None
+
+    def tighten(self, max_pages: Optional[int] = None, max_bytes: Optional[int] = None) -> "Budget":
+        """Réduit les limites de pages et d'octets (sans jamais les relâcher)."""
+        self.max_pages = _min(self.max_pages, max_pages)
+        self.max_bytes = _min(self.max_bytes, max_bytes)
+        return self
+
+    def for_document(self) -> "Budget":
+        """Budget d'un document : limites par document bornées par ce qu'il reste ici."""
+        return Budget(
+            DOC_MAX_SECONDS,
+            _min(DOC_MAX_PAGES, self.max_pages - self.pages if self.max_pages is not None else None),
+            _min(DOC_MAX_BYTES, self.max_bytes - self.bytes if self.max_bytes is not None else None),
+            deadline=self.deadline,
+        )
+
+    def consume(self, child: "Budget") -> None:
+        """Impute au budget courant ce qu'a consommé un budget de document."""
+        self.pages += child.pages
+        self.bytes += child.bytes
+
+    def as_dict(self) -> dict:
+        return {"pages": self.pages, "bytes": self.bytes, "reason": self.reason}
@@ -0,0 +1,165 @@
+"""Regroupement des analyses identiques concurrentes et cache de résultats de courte durée.
+
+Plusieurs personnes d'une même équipe déposent souvent le même DCE à
+quelques minutes d'intervalle : tant qu'une analyse est en cours, les
+requêtes identiques (même ensemble de fichiers) attendent le même calcul,
+puis le résultat est servi depuis un cache à durée de vie courte, avec un
+ETag correspondant.
+
+`BoundedCache` est le cache LRU borné en octets partagé par l'application
+Streamlit et les résultats partiels par pièce.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from metrics import count
+
+
+def files_key(files_data: Sequence[Tuple[str, bytes]], digests: Optional[Sequence[Optional[bytes]]] = None) -> str:
+    """Empreinte d'un ensemble de fichiers (noms, contenus et ordre).
+
+    `digests` donne, fichier par fichier, une empreinte déjà connue qui
+    remplace celle du contenu (identité d'un fichier serveur, voir server_files).
+    """
+    digest = hashlib.sha256()
+    for index, (name, raw) in enumerate(files_data):
+        known = digests[index] if digests is not None else None
+        digest.update(name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(known or hashlib.sha256(raw).digest())
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+class BoundedCache:
+    """Cache LRU thread-safe borné par la taille cumulée des valeurs (en octets)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key: Hashable, value, size: int) -> None:
+        with self._lock:
+            if key in self._items:
+                self._size -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes and self._items:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= evicted
+
+    def invalidate(self, predicate) -> int:
+        """Supprime les entrées dont la clé vérifie `predicate` et renvoie leur nombre."""
+        with self._lock:
+            keys = [k for k in self._items if predicate(k)]
+            for k in keys:
+                self._size -= self._items.pop(k)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+class Coalescer:
+    """Partage les calculs en cours par clé et garde les résultats récents."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+        name: str = "analysis",
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cacheable = cacheable
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def cached(self, key: str) -> Optional[Any]:
+        """Renvoie le résultat en cache pour `key` s'il n'a pas expiré."""
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return value
+
+    def store(self, key: str, value: Any) -> None:
+        """Garde un résultat calculé hors de `run` (analyse en flux, par exemple)."""
+        if self.ttl <= 0 or self.max_entries <= 0 or not self.cacheable(value):
+            return
+        self._results[key] = (time.monotonic() + self.ttl, value)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self.store(key, task.result())
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Renvoie `(résultat, source)` où source vaut "cache", "coalesced" ou "computed".
+
+        Le calcul est lancé dans sa propre tâche : l'abandon de la requête qui
+        l'a déclenché n'interrompt pas les autres requêtes en attente.
+        """
+        value = self.cached(key)
+        if value is not None:
+            count("coalesce_requests", cache=self.name, result="cache")
+            return value, "cache"
+
+        task = self._inflight.get(key)
+        source = "coalesced"
+        if task is None:
+            source = "computed"
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        count("coalesce_requests", cache=self.name, result=source)
+        return await asyncio.shield(task), source
+
+    def clear(self) -> None:
+        self._results.clear()
@@ -1,9 +1,120 @@
 """Configuration et constantes de l'application."""
 
+import os
 from pathlib import Path
+from typing import Optional
+
+
+def _env_limit(name: str, default: str) -> Optional[float]:
+    """Lit une limite numérique dans l'environnement ; 0 ou vide signifie « sans limite »."""
+    value = float(os.environ.get(name, default) or 0)
+    return value if value > 0 else None
+
 
 # Répertoire de sortie
 OUTPUT_ROOT = Path.cwd() / "output"
 OUTPUT_ROOT.mkdir(parents=True, exist_ok=True)
 
+# Cache de l'application Streamlit : nombre d'entrées par fonction et plafond mémoire global (Mo)
+STREAMLIT_CACHE_MAX_ENTRIES = int(os.environ.get("AO_STREAMLIT_CACHE_MAX_ENTRIES", "64"))
+STREAMLIT_CACHE_MAX_MB = int(os.environ.get("AO_STREAMLIT_CACHE_MAX_MB", "512"))
+
+# Profilage à la demande : désactivé tant qu'aucun jeton n'est configuré côté API
+PROFILE_TOKEN = os.environ.get("AO_PROFILE_TOKEN") or None
+PROFILE_DIR = Path(os.environ.get("AO_PROFILE_DIR", str(OUTPUT_ROOT / "profiles")))
+PROFILE_MODE = os.environ.get("AO_PROFILE_MODE", "sample")  # "sample" ou "cprofile"
+PROFILE_INTERVAL_S = float(os.environ.get("AO_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_STREAMLIT = os.environ.get("AO_PROFILE_STREAMLIT", "") not in ("", "0", "false")
+
+# Budgets de traitement par document et par analyse (temps en s, pages, octets de texte extrait)
+DOC_MAX_SECONDS = _env_limit("AO_DOC_MAX_SECONDS", "60")
+DOC_MAX_PAGES = _env_limit("AO_DOC_MAX_PAGES", "500")
+DOC_MAX_BYTES = _env_limit("AO_DOC_MAX_BYTES", str(20 * 1024 * 1024))
+REQUEST_MAX_SECONDS = _env_limit("AO_REQUEST_MAX_SECONDS", "180")
+REQUEST_MAX_PAGES = _env_limit("AO_REQUEST_MAX_PAGES", "2000")
+REQUEST_MAX_BYTES = _env_limit("AO_REQUEST_MAX_BYTES", str(50 * 1024 * 1024))
+
+# Triage des pièces : seules RC, AE, CCAP et pièces non identifiées sont extraites en entier
+TRIAGE_ENABLED = os.environ.get("AO_TRIAGE", "1") not in ("0", "false")
+TRIAGE_SAMPLE_PAGES = int(os.environ.get("AO_TRIAGE_SAMPLE_PAGES", "3"))
+TRIAGE_SAMPLE_BYTES = int(os.environ.get("AO_TRIAGE_SAMPLE_BYTES", str(32 * 1024)))
+
+# OCR local (Tesseract) des pages scannées, avec cache disque par empreinte d'image
+OCR_ENABLED = os.environ.get("AO_OCR", "1") not in ("0", "false")
+OCR_LANG = os.environ.get("AO_OCR_LANG", "fra")
+OCR_DPI = int(os.environ.get("AO_OCR_DPI", "300"))
+OCR_WORKERS = int(os.environ.get("AO_OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_CACHE_DIR = Path(os.environ.get("AO_OCR_CACHE_DIR", str(Path.home() / ".cache" / "ao-analyzer" / "ocr")))
+
+# Cache des résultats de /analyze (durée de vie en s, nombre d'ensembles de fichiers)
+RESULT_CACHE_TTL_S = float(os.environ.get("AO_RESULT_CACHE_TTL_S", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("AO_RESULT_CACHE_MAX_ENTRIES", "128"))
+
+# Admission des analyses : exécutions simultanées, file d'attente bornée (au-delà : 429)
+MAX_CONCURRENT_ANALYSES = int(os.environ.get("AO_MAX_CONCURRENT_ANALYSES", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_QUEUED_ANALYSES = int(os.environ.get("AO_MAX_QUEUED_ANALYSES", "8"))
+QUEUE_TIMEOUT_S = float(os.environ.get("AO_QUEUE_TIMEOUT_S", "120"))
+
+# Dossiers serveur que l'API peut lire pour l'assemblage (séparés par os.pathsep) ; vide : désactivé
+COMPANY_ROOTS = [Path(p).resolve() for p in os.environ.get("AO_COMPANY_ROOTS", "").split(os.pathsep) if p]
+
+# Partages où l'API lit les DCE directement (/analyze avec `paths`) ; vide : désactivé.
+# Fichiers projetés en mémoire (mmap), au plus AO_SERVER_FILES_MAX_OPEN gardés ouverts.
+DCE_ROOTS = [Path(p).resolve() for p in os.environ.get("AO_DCE_ROOTS", "").split(os.pathsep) if p]
+SERVER_FILES_MMAP = os.environ.get("AO_SERVER_FILES_MMAP", "1") not in ("0", "false")
+SERVER_FILES_MAX_OPEN = int(os.environ.get("AO_SERVER_FILES_MAX_OPEN", "64"))
+
+# Envois par morceaux reprenables (/uploads) : dossier de dépôt, tailles et nombre de fichiers maximaux
+UPLOAD_DIR = Path(os.environ.get("AO_UPLOAD_DIR", str(Path.cwd() / "temp_uploads" / "chunked")))
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("AO_UPLOAD_MAX_FILE_MB", "2048")) * 1024 * 1024
+UPLOAD_CHUNK_MAX_BYTES = int(os.environ.get("AO_UPLOAD_CHUNK_MAX_MB", "16")) * 1024 * 1024
+UPLOAD_MAX_FILES = int(os.environ.get("AO_UPLOAD_MAX_FILES", "200"))
+UPLOAD_MAX_TOTAL_BYTES = int(os.environ.get("AO_UPLOAD_MAX_TOTAL_MB", "4096")) * 1024 * 1024
+UPLOAD_PREFETCH_WORKERS = int(os.environ.get("AO_UPLOAD_PREFETCH_WORKERS", "1"))
+
+# Analyse par pièce : cache des résultats partiels (Mo) et workers pour les DCE à plusieurs pièces
+PARTIAL_CACHE_MAX_MB = int(os.environ.get("AO_PARTIAL_CACHE_MAX_MB", "256"))
+ANALYSIS_WORKERS = int(os.environ.get("AO_ANALYSIS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Pipeline d'analyse (analysis.py) : exécution des analyses par pièce ("inline", "threads" ou "processes")
+# et cache des textes extraits (Mo), partagés par l'API, les pages Streamlit et le batch
+PIPELINE_EXECUTOR = os.environ.get("AO_PIPELINE_EXECUTOR", "processes")
+EXTRACT_CACHE_MAX_MB = int(os.environ.get("AO_EXTRACT_CACHE_MAX_MB", "256"))
+
+# Rétention de OUTPUT_ROOT et temp_uploads : quotas (Mo), âges maximum, éviction « lru » ou « age »
+# (0 = pas de limite) ; le dernier dossier de chaque AO est toujours conservé
+TEMP_UPLOAD_DIR = Path(os.environ.get("AO_TEMP_UPLOAD_DIR", str(Path.cwd() / "temp_uploads")))
+RETENTION_OUTPUT_MAX_MB = _env_limit("AO_RETENTION_OUTPUT_MAX_MB", "5120")
+RETENTION_OUTPUT_MAX_AGE_DAYS = _env_limit("AO_RETENTION_OUTPUT_MAX_AGE_DAYS", "90")
+RETENTION_TEMP_MAX_MB = _env_limit("AO_RETENTION_TEMP_MAX_MB", "2048")
+RETENTION_TEMP_MAX_AGE_DAYS = _env_limit("AO_RETENTION_TEMP_MAX_AGE_DAYS", "7")
+RETENTION_POLICY = os.environ.get("AO_RETENTION_POLICY", "lru")
+RETENTION_GRACE_S = float(os.environ.get("AO_RETENTION_GRACE_S", "3600"))
+RETENTION_INTERVAL_S = float(os.environ.get("AO_RETENTION_INTERVAL_S", "3600"))
+
+# Budget mémoire global (Mo ; « auto » : 80 % de la limite du conteneur, 0 : sans budget). Au-delà de
+# la mémoire projetée (octets des pièces × facteur), l'analyse passe en mode économe au lieu d'échouer
+MEMORY_BUDGET_MB = os.environ.get("AO_MEMORY_BUDGET_MB", "auto")
+MEMORY_EXPANSION_FACTOR = float(os.environ.get("AO_MEMORY_EXPANSION_FACTOR", "8"))
+MEMORY_LOW_EXPANSION_FACTOR = float(os.environ.get("AO_MEMORY_LOW_EXPANSION_FACTOR", "3"))
+# Mesure : pics tracemalloc (débogage, coûteux) ou échantillonnage du RSS (production)
+MEMORY_TRACE = os.environ.get("AO_MEMORY_TRACE", "") not in ("", "0", "false")
+MEMORY_SAMPLE_INTERVAL_S = float(os.environ.get("AO_MEMORY_SAMPLE_INTERVAL_MS", "20")) / 1000
+
+# Ordre des moteurs PDF appris par producteur de document (statistiques JSON locales, voir pdf_engines.py)
+PDF_ENGINE_ADAPTIVE = os.environ.get("AO_PDF_ENGINE_ADAPTIVE", "1") not in ("0", "false")
+PDF_ENGINE_STATS_PATH = Path(
+    os.environ.get("AO_PDF_ENGINE_STATS", str(Path.home() / ".cache" / "ao-analyzer" / "pdf_engines.json"))
+)
+PDF_ENGINE_MIN_SAMPLES = int(os.environ.get("AO_PDF_ENGINE_MIN_SAMPLES", "3"))
+PDF_ENGINE_EXPLORE_EVERY = int(os.environ.get("AO_PDF_ENGINE_EXPLORE_EVERY", "20"))
+
+# Lignes des BPU/DQE (détecteur de tableaux PyMuPDF) : pages lues au plus (0 = toutes), pages par tâche,
+# processus et cache des résultats (Mo)
+TABLE_MAX_PAGES = _env_limit("AO_TABLE_MAX_PAGES", "300")
+TABLE_PAGES_PER_TASK = int(os.environ.get("AO_TABLE_PAGES_PER_TASK", "10"))
+TABLE_WORKERS = int(os.environ.get("AO_TABLE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+TABLE_CACHE_MAX_MB = int(os.environ.get("AO_TABLE_CACHE_MAX_MB", "64"))
 
+# Moteur des expressions régulières des métadonnées : "auto" (RE2 si installé), "re" ou "re2"
+REGEX_ENGINE = os.environ.get("AO_REGEX_ENGINE", "auto")
@@ -0,0 +1,257 @@
+"""Évaluation des règles de détection sur un corpus d'AO déjà extraits.
+
+Les textes (fichiers .txt, un AO par fichier) sont tokenisés une seule fois
+en une matrice creuse documents × termes (présence binaire), enregistrée
+sur disque. Un jeu de règles est ensuite évalué sur tout le corpus par
+opérations vectorisées :
+
+- un mot-clé d'un seul mot suit la sémantique de `extract_required_documents`
+  (sous-chaîne du texte en minuscules) : il touche tous les termes du
+  vocabulaire qui le contiennent ;
+- un mot-clé de plusieurs mots est d'abord filtré par la présence de tous
+  ses mots, puis vérifié dans le texte des seuls documents candidats
+  (désactivable avec `verify=False`, le résultat est alors approché).
+
+Résultats : taux de détection par règle et matrice de confusion par secteur
+(secteur attendu d'après le dossier parent ou un fichier d'étiquettes).
+
+NumPy et SciPy sont nécessaires pour ce mode uniquement.
+"""
+
+from __future__ import annotations
+
+import csv
+import importlib.util
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - dépendances optionnelles
+    np = None
+    sparse = None
+
+NO_SECTOR = "aucun"
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _require_numeric_stack() -> None:
+    if np is None or sparse is None:
+        raise RuntimeError("Le mode corpus nécessite numpy et scipy (pip install numpy scipy).")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+@dataclass
+class CorpusIndex:
+    """Matrice documents × termes (CSC) avec son vocabulaire et ses documents."""
+
+    matrix: "sparse.csc_matrix"
+    vocabulary: "np.ndarray"
+    documents: List[dict]  # {"id", "path", "sector"}
+
+    @property
+    def term_ids(self) -> Dict[str, int]:
+        if not hasattr(self, "_term_ids"):
+            self._term_ids = {term: i for i, term in enumerate(self.vocabulary.tolist())}
+        return self._term_ids
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        sparse.save_npz(directory / "matrix.npz", self.matrix.tocsr())
+        (directory / "vocabulary.json").write_text(json.dumps(self.vocabulary.tolist(), ensure_ascii=False), encoding="utf-8")
+        (directory / "documents.json").write_text(json.dumps(self.documents, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "CorpusIndex":
+        _require_numeric_stack()
+        matrix = sparse.load_npz(directory / "matrix.npz").tocsc()
+        vocabulary = np.array(json.loads((directory / "vocabulary.json").read_text(encoding="utf-8")))
+        documents = json.loads((directory / "documents.json").read_text(encoding="utf-8"))
+        return cls(matrix, vocabulary, documents)
+
+
+def _read_labels(path: Optional[Path]) -> Dict[str, str]:
+    """Fichier CSV `document,secteur` (identifiant relatif au dossier du corpus)."""
+    if path is None:
+        return {}
+    with path.open(encoding="utf-8", newline="") as f:
+        return {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+
+
+def build_index(root: Path, sectors: Sequence[str], labels: Optional[Path] = None) -> CorpusIndex:
+    """Tokenise tous les `.txt` de `root`.
+
+    Le secteur attendu d'un document vient du fichier d'étiquettes, sinon du
+    nom de son dossier parent s'il s'agit d'un secteur connu (ou « aucun »).
+    """
+    _require_numeric_stack()
+    known = set(sectors) | {NO_SECTOR}
+    explicit = _read_labels(labels)
+    term_ids: Dict[str, int] = {}
+    indices: List[int] = []
+    indptr = [0]
+    documents = []
+    for path in sorted(root.rglob("*.txt")):
+        doc_id = path.relative_to(root).as_posix()
+        sector = explicit.get(doc_id)
+        if sector is None and path.parent != root and path.parent.name in known:
+            sector = path.parent.name
+        terms = set(tokenize(path.read_text(encoding="utf-8", errors="ignore")))
+        indices.extend(term_ids.setdefault(term, len(term_ids)) for term in terms)
+        indptr.append(len(indices))
+        documents.append({"id": doc_id, "path": str(path), "sector": sector})
+
+    data = np.ones(len(indices), dtype=np.bool_)
+    matrix = sparse.csr_matrix(
+        (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(documents), len(term_ids)),
+    ).tocsc()
+    vocabulary = np.array(sorted(term_ids, key=term_ids.get)) if term_ids else np.array([], dtype=str)
+    return CorpusIndex(matrix, vocabulary, documents)
+
+
+class RuleScorer:
+    """Évalue des mots-clés sur un index, avec mise en cache par mot-clé."""
+
+    def __init__(self, index: CorpusIndex, verify: bool = True):
+        self.index = index
+        self.verify = verify
+        self._hits: Dict[str, "np.ndarray"] = {}
+        self._texts: Dict[int, str] = {}
+
+    def _any_column(self, columns: "np.ndarray") -> "np.ndarray":
+        if columns.size == 0:
+            return np.zeros(self.index.matrix.shape[0], dtype=bool)
+        return np.asarray(self.index.matrix[:, columns].sum(axis=1)).ravel() > 0
+
+    def _text(self, row: int) -> str:
+        if row not in self._texts:
+            path = Path(self.index.documents[row]["path"])
+            self._texts[row] = path.read_text(encoding="utf-8", errors="ignore").lower()
+        return self._texts[row]
+
+    def hits(self, keyword: str) -> "np.ndarray":
+        """Documents (masque booléen) où `kw in texte.lower()` serait vrai."""
+        keyword = keyword.lower()
+        if keyword in self._hits:
+            return self._hits[keyword]
+        tokens = tokenize(keyword)
+        if len(tokens) == 1 and tokens[0] == keyword:
+            # Sous-chaîne d'un seul mot : tous les termes qui la contiennent
+            columns = np.flatnonzero(np.char.find(self.index.vocabulary, keyword) >= 0)
+            result = self._any_column(columns)
+        else:
+            result = np.ones(self.index.matrix.shape[0], dtype=bool)
+            for token in tokens:
+                column = self.index.term_ids.get(token)
+                if column is None:
+                    result[:] = False
+                    break
+                result &= self._any_column(np.array([column]))
+            if self.verify:
+                for row in np.flatnonzero(result):
+                    result[row] = keyword in self._text(int(row))
+        self._hits[keyword] = result
+        return result
+
+    def score(self, keywords: Sequence[str]) -> "np.ndarray":
+        """Score de chaque document : nombre de mots-clés présents."""
+        total = np.zeros(self.index.matrix.shape[0], dtype=np.int32)
+        for keyword in keywords:
+            total += self.hits(keyword)
+        return total
+
+    def predict_sectors(self, sector_keywords: Mapping[str, Sequence[str]]) -> "np.ndarray":
+        """Secteur détecté par document, avec la priorité de `detect_sector`."""
+        predicted = np.full(self.index.matrix.shape[0], NO_SECTOR, dtype=object)
+        undecided = np.ones(self.index.matrix.shape[0], dtype=bool)
+        for sector, words in sector_keywords.items():
+            found = np.zeros_like(undecided)
+            for word in words:
+                found |= self.hits(word)
+            predicted[undecided & found] = sector
+            undecided &= ~found
+        return predicted
+
+
+def load_rules(path: Optional[Path] = None):
+    """Charge GENERIC_RULES, SECTOR_RULES et SECTOR_KEYWORDS (par défaut `document_rules`)."""
+    if path is None:
+        import document_rules as module
+    else:
+        spec = importlib.util.spec_from_file_location("candidate_rules", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    import document_rules
+
+    return (
+        module.GENERIC_RULES,
+        module.SECTOR_RULES,
+        getattr(module, "SECTOR_KEYWORDS", document_rules.SECTOR_KEYWORDS),
+    )
+
+
+def score_rules(
+    index: CorpusIndex,
+    generic_rules: Sequence[dict],
+    sector_rules: Mapping[str, Sequence[dict]],
+    sector_keywords: Mapping[str, Sequence[str]],
+    verify: bool = True,
+) -> dict:
+    """Taux de détection par règle et confusion des secteurs sur tout le corpus."""
+    _require_numeric_stack()
+    scorer = RuleScorer(index, verify=verify)
+    n_docs = index.matrix.shape[0]
+    predicted = scorer.predict_sectors(sector_keywords)
+    expected = np.array([doc["sector"] for doc in index.documents], dtype=object)
+    sectors = list(sector_keywords) + [NO_SECTOR]
+
+    def rule_report(rule: dict, sector: Optional[str]) -> dict:
+        scores = scorer.score(rule["keywords"])
+        # Règle sectorielle : n'est appliquée que si le secteur est détecté
+        emitted = scores > 0 if sector is None else (scores > 0) & (predicted == sector)
+        return {
+            "label": rule["label"],
+            "category": rule.get("category"),
+            "sector": sector,
+            "hits": int(emitted.sum()),
+            "hit_rate": round(float(emitted.mean()), 4) if n_docs else 0.0,
+            "mean_score": round(float(scores[emitted].mean()), 3) if emitted.any() else 0.0,
+            "keywords": {kw: round(float(scorer.hits(kw).mean()), 4) if n_docs else 0.0 for kw in rule["keywords"]},
+            "hit_rate_by_expected_sector": {
+                s: round(float(emitted[expected == s].mean()), 4)
+                for s in sectors if (expected == s).any()
+            },
+        }
+
+    rules = [rule_report(rule, None) for rule in generic_rules]
+    for sector, sector_specific in sector_rules.items():
+        rules.extend(rule_report(rule, sector) for rule in sector_specific)
+
+    labelled = expected != None  # noqa: E711 - comparaison élément par élément
+    confusion = {
+        s_expected: {
+            s_predicted: int(((expected == s_expected) & (predicted == s_predicted)).sum())
+            for s_predicted in sectors
+        }
+        for s_expected in sectors
+    }
+    correct = int((labelled & (expected == predicted)).sum())
+    return {
+        "documents": n_docs,
+        "terms": int(index.matrix.shape[1]),
+        "labelled": int(labelled.sum()),
+        "verified_phrases": verify,
+        "sector_accuracy": round(correct / int(labelled.sum()), 4) if labelled.any() else None,
+        "sector_confusion": confusion,
+        "predicted_sectors": {s: int((predicted == s).sum()) for s in sectors},
+        "rules": rules,
+    }
@@ -28,4 +28,9 @@ SECTOR_RULES = {
     ]
 }
 
-
+# Mots-clés de détection du secteur, par ordre de priorité (le premier secteur trouvé l'emporte)
+SECTOR_KEYWORDS = {
+    "alimentaire": ["alimentaire", "denrées", "egalim"],
+    "travaux": ["travaux", "chantier", "btp"],
+    "informatique": ["informatique", "réseau", "logiciel"],
+}
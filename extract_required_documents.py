@@ -2,40 +2,103 @@
 
 import re
 
-from document_rules import GENERIC_RULES, SECTOR_RULES
+from document_rules import GENERIC_RULES, SECTOR_KEYWORDS, SECTOR_RULES
+
+# Longueur maximale du contexte renvoyé quand la section englobante est longue
+MAX_SECTION_CONTEXT = 1500
 
 
 def detect_sector(text):
     """Détecte le secteur d'activité à partir du texte."""
     text = text.lower()
     
-    if any(w in text for w in ["alimentaire", "denrées", "egalim"]):
-        return "alimentaire"
-    if any(w in text for w in ["travaux", "chantier", "btp"]):
-        return "travaux"
-    if any(w in text for w in ["informatique", "réseau", "logiciel"]):
-        return "informatique"
+    for sector, words in SECTOR_KEYWORDS.items():
+        if any(w in text for w in words):
+            return sector
     
     return None
 
 
-def extract_context(text, keywords, window=250):
-    """Extrait le contexte autour des mots-clés trouvés."""
+def rules_for_sector(sector):
+    """Règles génériques, complétées des règles du secteur détecté."""
+    rules = GENERIC_RULES.copy()
+    if sector and sector in SECTOR_RULES:
+        rules.extend(SECTOR_RULES[sector])
+    return rules
+
+
+def rule_keywords():
+    """Tous les mots-clés des règles et des secteurs, sans doublon."""
+    keywords = [kw for rule in GENERIC_RULES for kw in rule["keywords"]]
+    keywords += [kw for rules in SECTOR_RULES.values() for rule in rules for kw in rule["keywords"]]
+    keywords += [kw for words in SECTOR_KEYWORDS.values() for kw in words]
+    return list(dict.fromkeys(keywords))
+
+
+def required_document(rule, score, context):
+    """Entrée de la liste des documents requis pour une règle détectée."""
+    return {
+        "label": rule["label"],
+        "category": rule["category"],
+        "summary": f"Détecté via {score} mot(s)-clé",
+        "key": rule["label"].lower().replace(" ", "_").replace("'", "_"),
+        "keywords": rule["keywords"],  # Ajout des keywords pour la recherche
+        **context,
+        "score": score
+    }
+
+
+def extract_context(text, keywords, window=250, sections=None):
+    """Extrait le contexte autour des mots-clés trouvés.
+
+    Avec `sections` (arbre des sections de `text`), le contexte est la section
+    qui contient le mot-clé, limitée à `MAX_SECTION_CONTEXT` caractères autour
+    de lui ; sinon, une fenêtre de `window` caractères.
+    """
+    context = _locate_context(text, keywords, window, sections)
+    return context[0] if context else ""
+
+
+def _locate_context(text, keywords, window, sections):
+    """(contexte, section englobante, position) du premier mot-clé trouvé, ou None."""
     t = text.lower()
     for kw in keywords:
         pos = t.find(kw.lower())
-        if pos != -1:
-            return text[max(0, pos - window):pos + window]
-    return ""
+        if pos == -1:
+            continue
+        section = sections.at(pos) if sections is not None else None
+        if section is None or section.kind == "document":
+            return text[max(0, pos - window):pos + window], section, pos
+        start, end = section.start, section.end
+        if end - start > MAX_SECTION_CONTEXT:
+            half = MAX_SECTION_CONTEXT // 2
+            start, end = max(start, pos - half), min(end, pos + half)
+        return text[start:end], section, pos
+    return None
+
 
+def context_fields(text, keywords, sections):
+    """Contexte de détection d'une règle et, si l'arbre est fourni, sa position dans les documents."""
+    located = _locate_context(text, keywords, 250, sections)
+    if located is None:
+        return {"source_section": "", "source_heading": None, "source_page": None, "source_document": None}
+    context, section, pos = located
+    return {
+        "source_section": context,
+        "source_heading": (" > ".join(section.path) or None) if section is not None else None,
+        "source_page": sections.page_at(pos) if sections is not None else None,
+        "source_document": section.document if section is not None else None,
+    }
 
-def extract_required_documents(text, files_data=None):
+
+def extract_required_documents(text, files_data=None, sections=None):
     """
     Extrait la liste des documents requis à partir du texte analysé.
     
     Args:
         text: Texte extrait des documents d'appel d'offre
         files_data: Liste optionnelle de tuples (nom_fichier, contenu_bytes)
+        sections: Arbre des sections de `text` (optionnel), pour situer le contexte
     
     Returns:
         Liste de dictionnaires avec les informations sur les documents requis
@@ -43,28 +106,15 @@ def extract_required_documents(text, files_data=None):
     results = []
     text_lower = text.lower()
 
-    # 1. Règles génériques
-    rules = GENERIC_RULES.copy()
-
-    # 2. Détection automatique du secteur
-    sector = detect_sector(text)
-    if sector and sector in SECTOR_RULES:
-        rules.extend(SECTOR_RULES[sector])
+    # 1. Règles génériques et 2. règles du secteur détecté automatiquement
+    rules = rules_for_sector(detect_sector(text))
 
     # 3. Analyse des règles
     for rule in rules:
         score = sum(kw in text_lower for kw in rule["keywords"])
 
         if score > 0:
-            results.append({
-                "label": rule["label"],
-                "category": rule["category"],
-                "summary": f"Détecté via {score} mot(s)-clé",
-                "key": rule["label"].lower().replace(" ", "_").replace("'", "_"),
-                "keywords": rule["keywords"],  # Ajout des keywords pour la recherche
-                "source_section": extract_context(text, rule["keywords"]),
-                "score": score
-            })
+            results.append(required_document(rule, score, context_fields(text, rule["keywords"], sections)))
 
     # Tri par pertinence
     results.sort(key=lambda x: x["score"], reverse=True)
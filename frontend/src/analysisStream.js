@@ -0,0 +1,60 @@
+// Lecture du flux NDJSON de /analyze/stream : un événement JSON par ligne,
+// transmis dès sa réception pour afficher les résultats au fur et à mesure.
+
+/**
+ * Lit `response.body` ligne par ligne et appelle `onEvent(event)` pour chaque
+ * objet JSON reçu. Se termine à la fin du flux.
+ */
+export async function readEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+      newline = buffer.indexOf("\n");
+    }
+    if (done) break;
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
+/**
+ * Résultat partiel après un événement (même forme que la réponse de /analyze,
+ * plus `files_done` : pièces déjà extraites). `summary` n'est pas traité ici :
+ * son `result` remplace le résultat partiel.
+ */
+export function applyEvent(partial, event) {
+  switch (event.event) {
+    case "triage":
+      return { ...partial, documents: event.documents };
+    case "file":
+      return {
+        ...partial,
+        files_done: [...(partial.files_done || []), event.name],
+        truncated_files: event.truncated
+          ? [...(partial.truncated_files || []), event.truncated]
+          : partial.truncated_files,
+      };
+    case "sector":
+      return { ...partial, sector: event.sector };
+    case "required_document":
+      return { ...partial, required_documents: [...(partial.required_documents || []), event.document] };
+    case "required_document_withdrawn":
+      return {
+        ...partial,
+        required_documents: (partial.required_documents || []).filter((doc) => doc.key !== event.key),
+      };
+    case "metadata":
+      return { ...partial, [event.field]: event.value };
+    case "price_table":
+      return { ...partial, price_tables: [...(partial.price_tables || []), event.table] };
+    default:
+      return partial;
+  }
+}
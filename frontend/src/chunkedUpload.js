@@ -0,0 +1,84 @@
+// Envoi par morceaux reprenable (/uploads) pour les gros DCE : une coupure
+// réseau ne fait renvoyer que le morceau en cours, pas tout le dossier.
+
+const API_BASE = "http://localhost:8000";
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+// Au-delà de cette taille totale, l'analyse passe par l'envoi par morceaux
+export const CHUNKED_THRESHOLD = 20 * 1024 * 1024;
+
+async function sha256Hex(buffer) {
+  const digest = await crypto.subtle.digest("SHA-256", buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function serverOffset(uploadId, index) {
+  const response = await fetch(`${API_BASE}/uploads/${uploadId}`);
+  const status = await response.json();
+  return status.files[index].received;
+}
+
+/**
+ * Envoie `files` par morceaux puis lance l'analyse.
+ * Renvoie la réponse `fetch` de la finalisation (même contenu que /analyze,
+ * ou flux NDJSON de /analyze/stream avec `stream: true`).
+ * `onProgress(sent, total)` est appelé après chaque morceau.
+ */
+export async function uploadAndAnalyze(files, { onProgress, stream = false } = {}) {
+  const init = await fetch(`${API_BASE}/uploads`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ files: files.map((file) => ({ name: file.name, size: file.size })) }),
+  });
+  if (!init.ok) return init;
+  const session = await init.json();
+  const uploadId = session.upload_id;
+  const chunkSize = Math.min(CHUNK_SIZE, session.chunk_max_bytes);
+  const total = files.reduce((sum, file) => sum + file.size, 0);
+  const done = files.map((file, index) => session.files[index].received);
+
+  for (let index = 0; index < files.length; index += 1) {
+    const file = files[index];
+    let offset = done[index];
+    let retries = 0;
+    while (offset < file.size) {
+      const buffer = await file.slice(offset, offset + chunkSize).arrayBuffer();
+      try {
+        const response = await fetch(`${API_BASE}/uploads/${uploadId}/files/${index}?offset=${offset}`, {
+          method: "PUT",
+          headers: { "X-Chunk-SHA256": await sha256Hex(buffer) },
+          body: buffer,
+        });
+        const data = await response.json();
+        if (!response.ok) {
+          // Décalage ou empreinte refusés : reprise à la position du serveur
+          if (typeof data.received !== "number") throw new Error(data.message);
+          offset = data.received;
+          retries += 1;
+          if (retries > MAX_RETRIES) throw new Error(data.message);
+          continue;
+        }
+        offset = data.received;
+        retries = 0;
+      } catch (error) {
+        retries += 1;
+        if (retries > MAX_RETRIES) throw error;
+        await wait(1000 * retries);
+        try {
+          offset = await serverOffset(uploadId, index);
+        } catch (statusError) {
+          // Serveur toujours injoignable : nouvel essai au même décalage
+        }
+      }
+      done[index] = offset;
+      onProgress?.(done.reduce((sum, value) => sum + value, 0), total);
+    }
+  }
+
+  return fetch(`${API_BASE}/uploads/${uploadId}/finalize${stream ? "?stream=true" : ""}`, { method: "POST" });
+}
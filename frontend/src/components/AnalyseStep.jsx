@@ -1,6 +1,9 @@
 import React, { useState, useEffect } from "react";
+import { applyEvent, readEvents } from "../analysisStream.js";
+import { CHUNKED_THRESHOLD, uploadAndAnalyze } from "../chunkedUpload.js";
 
-const API_URL = "http://localhost:8000/analyze";
+// Variante en flux de /analyze : les résultats s'affichent dès qu'ils sont connus
+const API_URL = "http://localhost:8000/analyze/stream";
 const API_HEALTH_URL = "http://localhost:8000/health";
 
 export function AnalyseStep() {
@@ -10,6 +13,8 @@ export function AnalyseStep() {
   const [error, setError] = useState(null);
   const [result, setResult] = useState(null);
   const [apiStatus, setApiStatus] = useState("checking"); // "checking", "online", "offline"
+  const [queue, setQueue] = useState(null); // { active, waiting, max_concurrent, max_queue }
+  const [uploadProgress, setUploadProgress] = useState(null); // 0..1 pendant un envoi par morceaux
 
   // Vérifier la santé de l'API au chargement du composant
   useEffect(() => {
@@ -27,6 +32,8 @@ export function AnalyseStep() {
         
         if (response.ok) {
           setApiStatus("online");
+          const data = await response.json().catch(() => ({}));
+          setQueue(data.queue || null);
         } else {
           setApiStatus("offline");
         }
@@ -49,6 +56,26 @@ export function AnalyseStep() {
     setError(null);
   };
 
+  // Résultat complet (événement `summary` du flux, ou réponse JSON)
+  const handleFinalResult = (data) => {
+    if (!data.success) {
+      setError(data.message || "Erreur lors de l'analyse des documents.");
+      setResult(null);
+      try {
+        window.localStorage.removeItem("ao-last-result");
+      } catch (storageError) {
+        // Ignorer les erreurs de stockage (mode navigation privée, etc.)
+      }
+    } else {
+      setResult(data);
+      try {
+        window.localStorage.setItem("ao-last-result", JSON.stringify(data));
+      } catch (storageError) {
+        // Ignorer les erreurs de stockage (quota dépassé, etc.)
+      }
+    }
+  };
+
   const handleAnalyze = async () => {
     if (!files.length) {
       setError("Ajoutez au moins un document avant de lancer l'analyse.");
@@ -59,30 +86,56 @@ export function AnalyseStep() {
     setError(null);
 
     try {
-      const formData = new FormData();
-      files.forEach((file) => formData.append("files", file));
+      const totalSize = files.reduce((sum, file) => sum + file.size, 0);
+      let response;
+      if (totalSize > CHUNKED_THRESHOLD) {
+        // Gros DCE : envoi par morceaux reprenable, l'extraction démarre fichier par fichier
+        setUploadProgress(0);
+        response = await uploadAndAnalyze(files, {
+          onProgress: (sent, total) => setUploadProgress(total ? sent / total : 1),
+          stream: true,
+        });
+      } else {
+        const formData = new FormData();
+        files.forEach((file) => formData.append("files", file));
+        response = await fetch(API_URL, {
+          method: "POST",
+          body: formData,
+        });
+      }
 
-      const response = await fetch(API_URL, {
-        method: "POST",
-        body: formData,
-      });
+      if (response.ok) {
+        setResult({});
+        await readEvents(response, (event) => {
+          if (event.event === "summary") {
+            handleFinalResult(event.result);
+          } else if (event.event === "error") {
+            setError(
+              event.reason === "queue_timeout"
+                ? `Serveur occupé : réessayez dans ${event.retry_after || "quelques"} s.`
+                : event.message || "Erreur lors de l'analyse des documents."
+            );
+            setResult(null);
+          } else if (event.event === "queued") {
+            setQueue(event.queue || null);
+          } else {
+            setResult((previous) => applyEvent(previous || {}, event));
+          }
+        });
+        return;
+      }
 
       const data = await response.json();
-      if (!data.success) {
-        setError(data.message || "Erreur lors de l'analyse des documents.");
-        setResult(null);
-        try {
-          window.localStorage.removeItem("ao-last-result");
-        } catch (storageError) {
-          // Ignorer les erreurs de stockage (mode navigation privée, etc.)
-        }
+      if (response.status === 429) {
+        // Serveur saturé : l'API est joignable, la file d'analyse est pleine
+        const retryAfter = response.headers.get("Retry-After");
+        setQueue(data.queue || null);
+        setError(
+          `Serveur occupé (${data.queue?.waiting ?? "?"} analyse(s) en attente). ` +
+            `Réessayez dans ${retryAfter || "quelques"} s.`
+        );
       } else {
-        setResult(data);
-        try {
-          window.localStorage.setItem("ao-last-result", JSON.stringify(data));
-        } catch (storageError) {
-          // Ignorer les erreurs de stockage (quota dépassé, etc.)
-        }
+        handleFinalResult(data);
       }
     } catch (e) {
       setError(
@@ -95,9 +148,12 @@ export function AnalyseStep() {
       }
     } finally {
       setLoading(false);
+      setUploadProgress(null);
     }
   };
 
+  const pending = <span className="hint">recherche en cours...</span>;
+
   return (
     <div className="panel">
       <h2>1. Analyse des documents</h2>
@@ -143,6 +199,12 @@ export function AnalyseStep() {
           marginBottom: "1rem"
         }}>
           <strong>✅ API FastAPI connectée</strong>
+          {queue && (queue.active > 0 || queue.waiting > 0) && (
+            <p style={{ margin: "0.5rem 0 0 0", fontSize: "0.9rem" }}>
+              {queue.active}/{queue.max_concurrent} analyse(s) en cours
+              {queue.waiting > 0 && `, ${queue.waiting} en attente`}
+            </p>
+          )}
         </div>
       )}
 
@@ -172,7 +234,11 @@ export function AnalyseStep() {
             onClick={handleAnalyze}
             disabled={loading || apiStatus !== "online"}
           >
-            {loading ? "Analyse en cours..." : "Lancer l'analyse"}
+            {loading
+              ? uploadProgress !== null && uploadProgress < 1
+                ? `Envoi en cours... ${Math.round(uploadProgress * 100)} %`
+                : "Analyse en cours..."
+              : "Lancer l'analyse"}
           </button>
           {error && <p className="hint" style={{ color: "#b91c1c" }}>{error}</p>}
         </section>
@@ -187,22 +253,38 @@ export function AnalyseStep() {
           )}
           {result && (
             <div className="analysis-result">
+              {loading && result.documents && (
+                <p className="hint">
+                  ⏳ Pièces analysées : {result.files_done?.length || 0}/{result.documents.length}
+                  {" "}— les résultats s&apos;affichent au fur et à mesure.
+                </p>
+              )}
               <p>
                 <strong>Secteur détecté :</strong>{" "}
-                {result.sector ? result.sector : "Aucun secteur spécifique"}
+                {result.sector
+                  ? result.sector
+                  : loading ? pending : "Aucun secteur spécifique"}
               </p>
               <p>
                 <strong>Email :</strong>{" "}
-                {result.email_to || "Non trouvé"}
+                {result.email_to || (loading ? pending : "Non trouvé")}
               </p>
               <p>
                 <strong>Acheteur :</strong>{" "}
-                {result.buyer || "Non trouvé"}
+                {result.buyer || (loading ? pending : "Non trouvé")}
               </p>
               <p>
                 <strong>Date limite :</strong>{" "}
-                {result.deadline ? result.deadline : "Non trouvée"}
+                {result.deadline ? result.deadline : loading ? pending : "Non trouvée"}
               </p>
+              {result.truncated_files?.length > 0 && (
+                <p className="hint" style={{ color: "#b45309" }}>
+                  ✂️ Analyse partielle (budget atteint) :{" "}
+                  {result.truncated_files
+                    .map((file) => `${file.name} (${file.pages} page(s) lue(s))`)
+                    .join(", ")}
+                </p>
+              )}
               <h4 style={{ marginTop: "0.7rem" }}>
                 Documents requis ({result.required_documents?.length || 0})
               </h4>
@@ -211,6 +293,13 @@ export function AnalyseStep() {
                   <li key={doc.key}>
                     <strong>{doc.label}</strong> — {doc.category} (score{" "}
                     {doc.score})
+                    {doc.source_heading && (
+                      <span className="hint">
+                        {" "}
+                        · {doc.source_heading}
+                        {doc.source_page ? ` (p. ${doc.source_page})` : ""}
+                      </span>
+                    )}
                   </li>
                 ))}
               </ul>
@@ -1,15 +1,9 @@
 import React, { useEffect, useMemo, useState } from "react";
+import { useFolderMatching } from "../folderMatching.js";
 
 const STORAGE_KEY = "ao-last-result";
-
-function normalize(value) {
-  return (value || "")
-    .toString()
-    .toLowerCase()
-    .normalize("NFD")
-    .replace(/[\u0300-\u036f]/g, "")
-    .replace(/[^a-z0-9]/g, "");
-}
+const DOSSIER_KEY = "ao-last-dossier";
+const API_ASSEMBLE_URL = "http://localhost:8000/assemble";
 
 export function AssemblageStep({
   onFolderSelect,
@@ -19,6 +13,10 @@ export function AssemblageStep({
   const [requiredDocs, setRequiredDocs] = useState([]);
   const [loadingFolder, setLoadingFolder] = useState(false);
   const [message, setMessage] = useState("");
+  const [analysis, setAnalysis] = useState(null);
+  const [serverRoot, setServerRoot] = useState("");
+  const [aoId, setAoId] = useState("");
+  const [serverStatus, setServerStatus] = useState({ loading: false, message: "", error: "" });
 
   useEffect(() => {
     try {
@@ -26,6 +24,7 @@ export function AssemblageStep({
       if (stored) {
         const parsed = JSON.parse(stored);
         setRequiredDocs(parsed?.required_documents || []);
+        setAnalysis(parsed);
         setMessage(
           "Liste récupérée depuis l'analyse précédente. Sélectionnez votre dossier pour vérifier la complétude."
         );
@@ -71,25 +70,62 @@ export function AssemblageStep({
   const folderFiles = companyFiles;
   const companyRoot = companyFolderInfo?.name || "";
 
-  const checklist = useMemo(() => {
-    if (!requiredDocs.length) return [];
-    const files = folderFiles.map((file) => ({
-      name: file.name,
-      normalized: normalize(file.name),
-    }));
-
-    return requiredDocs.map((doc) => {
-      const normalizedDoc = normalize(doc.key || doc.label);
-      const match = files.find((file) =>
-        normalizedDoc ? file.normalized.includes(normalizedDoc) : false
-      );
-      return {
+  // Rapprochement calculé dans un Web Worker (index par dossier, cache IndexedDB)
+  const { matches, pending: matching } = useFolderMatching(requiredDocs, folderFiles);
+
+  const checklist = useMemo(
+    () =>
+      requiredDocs.map((doc) => ({
         ...doc,
-        present: Boolean(match),
-        filename: match?.name || null,
-      };
-    });
-  }, [requiredDocs, folderFiles]);
+        present: Boolean(matches[doc.key]),
+        filename: matches[doc.key] || null,
+      })),
+    [requiredDocs, matches]
+  );
+
+  // Assemblage côté serveur : les pièces sont lues et copiées sur le serveur,
+  // sans transiter par le navigateur ; le ZIP se télécharge ensuite en flux.
+  const handleServerAssemble = async () => {
+    setServerStatus({ loading: true, message: "", error: "" });
+    try {
+      const formData = new FormData();
+      formData.append("required_documents", JSON.stringify(requiredDocs));
+      formData.append("company_root", serverRoot);
+      formData.append("ao_id", aoId);
+      if (analysis?.email_to) formData.append("email_to", analysis.email_to);
+      if (analysis?.buyer) formData.append("buyer", analysis.buyer);
+      if (analysis?.deadline) formData.append("deadline", analysis.deadline);
+      if (analysis?.sector) formData.append("sector", analysis.sector);
+
+      const response = await fetch(API_ASSEMBLE_URL, { method: "POST", body: formData });
+      const data = await response.json();
+      if (!response.ok || !data.success) {
+        setServerStatus({
+          loading: false,
+          message: "",
+          error: data.detail || data.message || "Erreur lors de l'assemblage.",
+        });
+        return;
+      }
+      const missing = data.dossier.checklist.filter((row) => row.status === "MISSING").length;
+      try {
+        window.localStorage.setItem(DOSSIER_KEY, JSON.stringify(data.dossier));
+      } catch (storageError) {
+        // Ignorer les erreurs de stockage
+      }
+      setServerStatus({
+        loading: false,
+        message: `Dossier "${data.dossier.id}" assemblé (${missing} pièce(s) manquante(s)). Téléchargez-le à l'étape 3.`,
+        error: "",
+      });
+    } catch (error) {
+      setServerStatus({
+        loading: false,
+        message: "",
+        error: "Impossible de joindre l'API. Vérifiez que le serveur Python (FastAPI) tourne.",
+      });
+    }
+  };
 
   const presentCount = checklist.filter((doc) => doc.present).length;
   const missingCount = checklist.length - presentCount;
@@ -143,10 +179,45 @@ export function AssemblageStep({
             Python. Aucun fichier n&apos;est envoyé, tout reste local dans votre
             navigateur.
           </p>
+
+          <h3 style={{ marginTop: "1rem" }}>Assemblage sur le serveur</h3>
+          <p className="hint">
+            Pour les gros dossiers : indiquez le chemin du dossier d&apos;entreprise
+            sur le serveur, le dossier de réponse y est assemblé directement.
+          </p>
+          <input
+            type="text"
+            className="text-input"
+            placeholder="Chemin du dossier d'entreprise sur le serveur"
+            value={serverRoot}
+            onChange={(event) => setServerRoot(event.target.value)}
+          />
+          <input
+            type="text"
+            className="text-input"
+            placeholder="Identifiant de l'appel d'offre (ex : AO-2024-001)"
+            value={aoId}
+            onChange={(event) => setAoId(event.target.value)}
+          />
+          <button
+            type="button"
+            className="primary-button"
+            onClick={handleServerAssemble}
+            disabled={serverStatus.loading || !serverRoot || !requiredDocs.length}
+          >
+            {serverStatus.loading ? "Assemblage en cours..." : "Assembler sur le serveur"}
+          </button>
+          {serverStatus.message && (
+            <p className="hint" style={{ color: "#047857" }}>{serverStatus.message}</p>
+          )}
+          {serverStatus.error && (
+            <p className="hint" style={{ color: "#b91c1c" }}>{serverStatus.error}</p>
+          )}
         </section>
 
         <section className="panel-card">
           <h3>Checklist dynamique</h3>
+          {matching && <p className="hint">⏳ Recherche des pièces dans le dossier...</p>}
           {!requiredDocs.length && (
             <p className="hint">
               Lancez d&apos;abord l&apos;analyse pour générer la liste des
@@ -2,6 +2,8 @@ import React, { useEffect, useMemo, useState } from "react";
 import JSZip from "jszip";
 
 const STORAGE_KEY = "ao-last-result";
+const DOSSIER_KEY = "ao-last-dossier";
+const API_EXPORT_URL = "http://localhost:8000/export";
 const DEFAULT_EMAIL_BODY =
   "Bonjour Madame, Monsieur,\n\nVeuillez trouver ci-joint notre dossier de réponse à votre appel d'offres.\n\nCordialement,";
 
@@ -17,6 +19,7 @@ export function ExportStep({ companyFiles = [], companyFolderInfo, onFolderSelec
   const [emailBody, setEmailBody] = useState(DEFAULT_EMAIL_BODY);
   const [copyStatus, setCopyStatus] = useState("");
   const [zipStatus, setZipStatus] = useState({ loading: false, message: "", error: "" });
+  const [serverDossier, setServerDossier] = useState(null);
 
   useEffect(() => {
     try {
@@ -26,10 +29,10 @@ export function ExportStep({ companyFiles = [], companyFolderInfo, onFolderSelec
         if (parsed?.email_to) {
           setEmailTo(parsed.email_to);
         }
-        if (parsed?.buyer || parsed?.detected_sector) {
+        if (parsed?.buyer || parsed?.sector) {
           setEmailBody(
             `Bonjour ${parsed?.buyer || "Madame, Monsieur"},\n\nSuite à votre appel d'offres${
-              parsed?.detected_sector ? ` (${parsed.detected_sector})` : ""
+              parsed?.sector ? ` (${parsed.sector})` : ""
             }, vous trouverez ci-joint notre dossier complet de réponse.\n\nCordialement,`
           );
         }
@@ -37,6 +40,16 @@ export function ExportStep({ companyFiles = [], companyFolderInfo, onFolderSelec
     } catch (error) {
       // Ignore
     }
+    try {
+      const dossier = window.localStorage.getItem(DOSSIER_KEY);
+      if (dossier) {
+        const parsed = JSON.parse(dossier);
+        setServerDossier(parsed);
+        if (parsed?.email_draft) setEmailBody(parsed.email_draft);
+      }
+    } catch (error) {
+      // Ignore
+    }
   }, []);
 
   const files = companyFiles;
@@ -201,6 +214,21 @@ export function ExportStep({ companyFiles = [], companyFolderInfo, onFolderSelec
 
         <section className="panel-card">
           <h3>Export du dossier</h3>
+          {serverDossier && (
+            <div style={{ marginBottom: "1rem" }}>
+              <p className="hint">
+                Dossier assemblé sur le serveur : <strong>{serverDossier.id}</strong>
+              </p>
+              {/* Téléchargement direct : le ZIP est produit en flux par l'API */}
+              <a
+                className="primary-button"
+                href={`${API_EXPORT_URL}/${encodeURIComponent(serverDossier.id)}`}
+                download
+              >
+                Télécharger le ZIP (serveur)
+              </a>
+            </div>
+          )}
           <p className="hint">{folderHint}</p>
           <label className="upload-dropzone upload-dropzone--folder">
             <input
@@ -0,0 +1,152 @@
+// Rapprochement documents requis / fichiers du dossier d'entreprise, hors du thread principal.
+//
+// L'index (noms normalisés + trigrammes) est construit une seule fois par
+// sélection de dossier ; les résultats sont mis en cache dans IndexedDB,
+// indexés par l'empreinte du dossier et la liste des documents requis.
+
+const DB_NAME = "ao-folder-match";
+const STORE = "results";
+const BATCH_SIZE = 10;
+
+let current = null; // { fingerprint, files, index }
+
+function normalize(value) {
+  return (value || "")
+    .toString()
+    .toLowerCase()
+    .normalize("NFD")
+    .replace(/[\u0300-\u036f]/g, "")
+    .replace(/[^a-z0-9]/g, "");
+}
+
+async function sha256(text) {
+  const data = new TextEncoder().encode(text);
+  const digest = await crypto.subtle.digest("SHA-256", data);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+// Empreinte du dossier : chemins, tailles et dates de modification
+function folderFingerprint(files) {
+  return sha256(
+    files.map((f) => `${f.path}\u0000${f.size}\u0000${f.lastModified}`).join("\n")
+  );
+}
+
+function buildIndex(files) {
+  const normalized = files.map((f) => normalize(f.name));
+  const trigrams = new Map();
+  normalized.forEach((name, position) => {
+    for (let i = 0; i + 3 <= name.length; i += 1) {
+      const gram = name.slice(i, i + 3);
+      let postings = trigrams.get(gram);
+      if (!postings) {
+        postings = [];
+        trigrams.set(gram, postings);
+      }
+      // Positions croissantes, sans doublon
+      if (postings[postings.length - 1] !== position) postings.push(position);
+    }
+  });
+  return { normalized, trigrams };
+}
+
+// Premier fichier (dans l'ordre du dossier) dont le nom normalisé contient `query`
+function findFirst(index, query) {
+  if (!query) return -1;
+  let candidates = null;
+  if (query.length >= 3) {
+    // Liste de positions la plus courte parmi les trigrammes de la requête
+    for (let i = 0; i + 3 <= query.length; i += 1) {
+      const postings = index.trigrams.get(query.slice(i, i + 3));
+      if (!postings) return -1;
+      if (!candidates || postings.length < candidates.length) candidates = postings;
+    }
+  }
+  if (candidates) {
+    for (const position of candidates) {
+      if (index.normalized[position].includes(query)) return position;
+    }
+    return -1;
+  }
+  return index.normalized.findIndex((name) => name.includes(query));
+}
+
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(DB_NAME, 1);
+    request.onupgradeneeded = () => request.result.createObjectStore(STORE);
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+async function cacheGet(key) {
+  try {
+    const db = await openDb();
+    return await new Promise((resolve) => {
+      const request = db.transaction(STORE, "readonly").objectStore(STORE).get(key);
+      request.onsuccess = () => resolve(request.result || null);
+      request.onerror = () => resolve(null);
+    });
+  } catch (error) {
+    return null; // IndexedDB indisponible (navigation privée, etc.)
+  }
+}
+
+async function cachePut(key, value) {
+  try {
+    const db = await openDb();
+    db.transaction(STORE, "readwrite").objectStore(STORE).put(value, key);
+  } catch (error) {
+    // Ignorer : le cache n'est qu'une optimisation
+  }
+}
+
+async function handleSelect({ files }) {
+  const fingerprint = await folderFingerprint(files);
+  current = { fingerprint, files, index: null };
+  self.postMessage({ type: "selected", fingerprint, fileCount: files.length });
+}
+
+async function handleMatch({ requestId, docs }) {
+  if (!current) {
+    self.postMessage({ type: "result", requestId, matches: {}, done: true, cached: false });
+    return;
+  }
+  const { fingerprint } = current;
+  const queries = docs.map((doc) => [doc.key, normalize(doc.key || doc.label)]);
+  const cacheKey = `${fingerprint}:${await sha256(queries.map(([, q]) => q).join("|"))}`;
+
+  const cached = await cacheGet(cacheKey);
+  if (cached) {
+    self.postMessage({ type: "result", requestId, matches: cached, done: true, cached: true });
+    return;
+  }
+
+  if (!current.index) current.index = buildIndex(current.files);
+  const matches = {};
+  for (let i = 0; i < queries.length; i += 1) {
+    const [key, query] = queries[i];
+    const position = findFirst(current.index, query);
+    matches[key] = position >= 0 ? current.files[position].name : null;
+    // Réponses au fil de l'eau, par lots
+    if ((i + 1) % BATCH_SIZE === 0 && i + 1 < queries.length) {
+      self.postMessage({ type: "result", requestId, matches: { ...matches }, done: false, cached: false });
+    }
+  }
+  self.postMessage({ type: "result", requestId, matches, done: true, cached: false });
+  cachePut(cacheKey, matches);
+}
+
+// Messages traités l'un après l'autre : une recherche attend la sélection qui la précède
+let pending = Promise.resolve();
+
+self.onmessage = (event) => {
+  const message = event.data;
+  const handler = message.type === "select" ? handleSelect : handleMatch;
+  pending = pending.then(() => handler(message)).catch((error) => {
+    self.postMessage({ type: "error", requestId: message.requestId, message: String(error) });
+  });
+};
@@ -0,0 +1,74 @@
+import { useEffect, useState } from "react";
+
+// Un seul worker pour toute l'application : l'index du dossier survit aux
+// changements d'étape tant que la sélection ne change pas.
+let worker = null;
+let selectedFiles = null;
+let lastRequestId = 0;
+
+function getWorker() {
+  if (!worker) {
+    worker = new Worker(new URL("./folderMatch.worker.js", import.meta.url), {
+      type: "module",
+    });
+  }
+  return worker;
+}
+
+function ensureSelected(files) {
+  if (selectedFiles === files) return;
+  selectedFiles = files;
+  getWorker().postMessage({
+    type: "select",
+    files: files.map((file) => ({
+      name: file.name,
+      path: file.webkitRelativePath || file.name,
+      size: file.size,
+      lastModified: file.lastModified,
+    })),
+  });
+}
+
+const EMPTY = { matches: {}, pending: false, cached: false };
+
+/**
+ * Rapproche les documents requis des fichiers du dossier d'entreprise.
+ *
+ * Renvoie `{ matches, pending, cached }` où `matches[doc.key]` est le nom du
+ * premier fichier correspondant (ou null). Les résultats arrivent par lots
+ * tant que `pending` est vrai.
+ */
+export function useFolderMatching(requiredDocs, files) {
+  const [state, setState] = useState(EMPTY);
+
+  useEffect(() => {
+    if (!requiredDocs.length || !files.length) {
+      setState(EMPTY);
+      return undefined;
+    }
+    const target = getWorker();
+    ensureSelected(files);
+    lastRequestId += 1;
+    const requestId = lastRequestId;
+    setState((previous) => ({ ...previous, pending: true }));
+
+    const onMessage = (event) => {
+      const message = event.data;
+      if (message.requestId !== requestId) return;
+      if (message.type === "error") {
+        setState(EMPTY);
+        return;
+      }
+      setState({ matches: message.matches, pending: !message.done, cached: message.cached });
+    };
+    target.addEventListener("message", onMessage);
+    target.postMessage({
+      type: "match",
+      requestId,
+      docs: requiredDocs.map((doc) => ({ key: doc.key, label: doc.label })),
+    });
+    return () => target.removeEventListener("message", onMessage);
+  }, [requiredDocs, files]);
+
+  return state;
+}
@@ -0,0 +1,242 @@
+"""Budget mémoire : mesure par requête et par étape, dégradation adaptative.
+
+Mesure : avec `AO_MEMORY_TRACE=1` (débogage), pics d'allocation Python via
+tracemalloc, exacts mais coûteux et faussés par les requêtes concurrentes ;
+sinon, échantillonnage du RSS du processus toutes les
+`AO_MEMORY_SAMPLE_INTERVAL_MS` pendant chaque étape (le RSS inclut la mémoire
+des bibliothèques C comme MuPDF, invisible de tracemalloc).
+
+Budget : avant une analyse, sa mémoire est projetée (octets des pièces ×
+`AO_MEMORY_EXPANSION_FACTOR`, car octets bruts, flux, listes de pages et
+textes joints coexistent). Si RSS actuel + réservations des analyses en
+cours + projection dépasse le budget, l'analyse passe en mode économe :
+
+- extraction sérialisée (une seule pièce à la fois pour les analyses économes) ;
+- PDF déposé sur disque et ouvert depuis le fichier, pages écrites au fil de
+  l'eau dans un fichier temporaire au lieu d'une liste jointe à la fin, sans
+  conserver le résultat d'un moteur pendant l'essai du suivant ;
+- pièces analysées dans le processus (pas de copie des textes vers un pool).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    MEMORY_BUDGET_MB,
+    MEMORY_EXPANSION_FACTOR,
+    MEMORY_LOW_EXPANSION_FACTOR,
+    MEMORY_SAMPLE_INTERVAL_S,
+    MEMORY_TRACE,
+)
+from metrics import REGISTRY, count, current_timings
+
+_CGROUP_LIMITS = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+_meter: contextvars.ContextVar[Optional["MemoryMeter"]] = contextvars.ContextVar("ao_memory_meter", default=None)
+_extraction_lock = threading.Lock()
+
+
+def rss_bytes() -> Optional[int]:
+    """Mémoire résidente du processus (Linux), ou None si indisponible."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def container_limit() -> Optional[int]:
+    """Limite mémoire du conteneur (cgroup v2 ou v1), ou None."""
+    for path in _CGROUP_LIMITS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # v1 : « pas de limite » = très grande valeur
+            return int(value)
+    return None
+
+
+def _configured_budget() -> Optional[int]:
+    if MEMORY_BUDGET_MB.strip().lower() == "auto":
+        limit = container_limit()
+        return int(limit * 0.8) if limit else None
+    value = float(MEMORY_BUDGET_MB or 0)
+    return int(value * 1024 * 1024) if value > 0 else None
+
+
+class _RssSampler:
+    """Échantillonne le RSS tant qu'au moins une mesure est en cours."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._peaks: Dict[int, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self) -> Tuple[int, int]:
+        """Démarre une mesure : (jeton, RSS initial)."""
+        rss = rss_bytes() or 0
+        with self._lock:
+            self._next += 1
+            self._peaks[self._next] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ao-rss-sampler", daemon=True)
+                self._thread.start()
+            return self._next, rss
+
+    def unwatch(self, token: int) -> int:
+        """Termine une mesure et renvoie le RSS maximum observé."""
+        rss = rss_bytes() or 0
+        with self._lock:
+            return max(self._peaks.pop(token, 0), rss)
+
+    def _run(self) -> None:
+        while True:
+            rss = rss_bytes() or 0
+            with self._lock:
+                if not self._peaks:
+                    self._thread = None
+                    return
+                for token, peak in self._peaks.items():
+                    if rss > peak:
+                        self._peaks[token] = rss
+            REGISTRY.set_gauge("memory_rss_bytes", rss)
+            time.sleep(self.interval)
+
+
+_sampler = _RssSampler(MEMORY_SAMPLE_INTERVAL_S)
+
+
+class MemoryMeter:
+    """Pics mémoire d'une requête et de ses étapes (octets au-dessus du niveau de départ)."""
+
+    def __init__(self, mode: str, projected: int, trace: bool = MEMORY_TRACE):
+        self.mode = mode
+        self.projected = projected
+        self.trace = trace
+        self.peak = 0
+        # Mode tracemalloc : pile [niveau de départ, maximum vu] des étapes imbriquées
+        self._stack: List[List[int]] = []
+        self._request_mark = None
+
+    def begin(self):
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            for entry in self._stack:
+                entry[1] = max(entry[1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+            return len(self._stack) - 1
+        return _sampler.watch()
+
+    def end(self, mark) -> int:
+        if self.trace:
+            _, peak = tracemalloc.get_traced_memory()
+            base, seen = self._stack.pop()
+            peak = max(peak, seen)
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            return max(0, peak - base)
+        token, base = mark
+        return max(0, _sampler.unwatch(token) - base)
+
+    def start(self) -> None:
+        self._request_mark = self.begin()
+
+    def stop(self) -> None:
+        if self._request_mark is not None:
+            self.peak = self.end(self._request_mark)
+            self._request_mark = None
+
+    def as_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "projected_bytes": self.projected,
+            "peak_bytes": self.peak,
+            "accounting": "tracemalloc" if self.trace else "rss",
+        }
+
+
+class MemoryGovernor:
+    """Réservations mémoire des analyses en cours, face au budget global."""
+
+    def __init__(self, budget: Optional[int]):
+        self.budget = budget
+        self.reserved = 0
+        self._lock = threading.Lock()
+        if budget is not None:
+            REGISTRY.set_gauge("memory_budget_bytes", budget)
+
+    def project(self, input_bytes: int) -> int:
+        return int(input_bytes * MEMORY_EXPANSION_FACTOR)
+
+    def acquire(self, projected: int) -> Tuple[str, int]:
+        """(mode, octets réservés) pour une analyse dont la mémoire projetée est `projected`."""
+        with self._lock:
+            mode = "normal"
+            if self.budget is not None and (rss_bytes() or 0) + self.reserved + projected > self.budget:
+                mode = "low"
+                projected = int(projected * MEMORY_LOW_EXPANSION_FACTOR / MEMORY_EXPANSION_FACTOR)
+            self.reserved += projected
+            REGISTRY.set_gauge("memory_reserved_bytes", self.reserved)
+            return mode, projected
+
+    def release(self, reserved: int) -> None:
+        with self._lock:
+            self.reserved -= reserved
+            REGISTRY.set_gauge("memory_reserved_bytes", self.reserved)
+
+
+GOVERNOR = MemoryGovernor(_configured_budget())
+
+
+@contextmanager
+def memory_budget(input_bytes: int) -> Iterator[MemoryMeter]:
+    """Réserve la mémoire d'une analyse de `input_bytes` octets de pièces, choisit son mode et mesure ses pics.
+
+    La mesure est jointe aux temps de la requête (`collect_timings`) s'ils
+    sont collectés. Une analyse déjà en cours (appel imbriqué) garde son mode.
+    """
+    active = _meter.get()
+    if active is not None:
+        yield active
+        return
+    timings = current_timings()
+    projected = GOVERNOR.project(input_bytes)
+    mode, reserved = GOVERNOR.acquire(projected)
+    if mode == "low":
+        count("memory_degraded", reason="budget")
+    meter = MemoryMeter(mode, projected)
+    token = _meter.set(meter)
+    if timings is not None:
+        timings.memory = meter
+    meter.start()
+    try:
+        yield meter
+    finally:
+        meter.stop()
+        _meter.reset(token)
+        GOVERNOR.release(reserved)
+
+
+def low_memory() -> bool:
+    """L'analyse en cours est-elle en mode économe ?"""
+    meter = _meter.get()
+    return meter is not None and meter.mode == "low"
+
+
+def extraction_slot():
+    """Contexte d'extraction d'une pièce : exclusif entre analyses économes."""
+    return _extraction_lock if low_memory() else nullcontext()
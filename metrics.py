@@ -0,0 +1,225 @@
+"""Métriques du pipeline d'analyse : chronométrage par étape, compteurs et export Prometheus.
+
+Les étapes sont mesurées avec `stage(...)` et les événements comptés avec
+`count(...)`. Chaque mesure alimente le registre global (exposé sur
+`/metrics`) et, si une collecte est active via `collect_timings()`, le
+détail de la requête en cours (bloc `timings` de `/analyze`).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_HELP = {
+    "stage_duration_seconds": "Durée de chaque étape du pipeline d'analyse",
+    "http_request_duration_seconds": "Latence des requêtes HTTP par route",
+    "pdf_pages": "Pages extraites par moteur PDF",
+    "pdf_fallbacks": "Passages au moteur PDF suivant (échec ou texte insuffisant)",
+    "pdf_engine_errors": "Erreurs levées par un moteur PDF",
+    "pdf_engine_reordered": "PDF dont le premier moteur essayé diffère de l'ordre par défaut",
+    "bytes_processed": "Octets de documents traités",
+    "price_rows": "Lignes extraites des bordereaux de prix (BPU, DQE)",
+    "price_table_errors": "Échecs d'extraction des tableaux d'un BPU ou DQE",
+    "cache_requests": "Accès aux caches (hit ou miss)",
+    "admission_active": "Analyses en cours d'exécution",
+    "admission_waiting": "Analyses en file d'attente",
+    "admission_rejected": "Analyses refusées (file pleine ou attente trop longue)",
+    "memory_rss_bytes": "Mémoire résidente du processus (dernier échantillon)",
+    "memory_reserved_bytes": "Mémoire projetée des analyses en cours",
+    "memory_budget_bytes": "Budget mémoire global",
+    "memory_degraded": "Analyses passées en mode économe en mémoire",
+    "retention_deleted": "Dossiers et fichiers supprimés par la rétention",
+    "retention_freed_bytes": "Octets libérés par la rétention",
+    "retention_errors": "Échecs de suppression ou de passage de la rétention",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Registry:
+    """Registre thread-safe de compteurs, jauges et histogrammes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    def render(self, prefix: str = "ao_") -> str:
+        """Sérialise le registre au format texte Prometheus."""
+        lines: List[str] = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            seen = set()
+            for (name, labels), value in counters:
+                metric = f"{prefix}{name}_total"
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# HELP {metric} {_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                metric = f"{prefix}{name}"
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# HELP {metric} {_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                metric = f"{prefix}{name}"
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# HELP {metric} {_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {metric} histogram")
+                for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{metric}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {bucket_count}")
+                lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class RequestTimings:
+    """Temps par étape et compteurs collectés pendant une analyse."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        # Mesure mémoire de la requête (voir `memory.MemoryMeter`), si active
+        self.memory = None
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def add_memory(self, name: str, peak_bytes: int) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak_bytes)
+
+    def add_count(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total_s": round(time.perf_counter() - self._start, 6),
+                "stages": {
+                    k: {"seconds": round(v["seconds"], 6), "calls": v["calls"], **({"peak_bytes": v["peak_bytes"]} if "peak_bytes" in v else {})}
+                    for k, v in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                **({"memory": self.memory.as_dict()} if self.memory is not None else {}),
+            }
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("ao_request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Temps de la requête en cours de collecte, ou None."""
+    return _current.get()
+
+
+@contextmanager
+def collect_timings() -> Iterator[RequestTimings]:
+    """Active la collecte détaillée des temps pour le bloc de code courant."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Chronomètre une étape du pipeline (et son pic mémoire si la requête est mesurée)."""
+    timings = _current.get()
+    meter = timings.memory if timings is not None else None
+    mark = meter.begin() if meter is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe("stage_duration_seconds", elapsed, stage=name)
+        if timings is not None:
+            timings.add_stage(name, elapsed)
+            if meter is not None:
+                timings.add_memory(name, meter.end(mark))
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Incrémente un compteur (global et requête en cours)."""
+    REGISTRY.inc(name, value, **labels)
+    timings = _current.get()
+    if timings is not None:
+        suffix = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        timings.add_count(f"{name}{{{suffix}}}" if suffix else name, value)
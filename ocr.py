@@ -0,0 +1,167 @@
+"""OCR local (Tesseract) des pages PDF sans couche texte.
+
+Seules les pages sans police ni texte mais contenant des images (pages
+scannées) sont rendues puis reconnues, sur un pool de processus. Le texte
+reconnu est mis en cache sur disque, indexé par l'empreinte de l'image de
+la page : un PDF déjà vu, ou une annexe scannée commune à plusieurs DCE,
+n'est reconnu qu'une fois.
+
+Tesseract est optionnel : `pytesseract` s'il est installé, sinon le binaire
+`tesseract` s'il est dans le PATH. Dans les deux cas le binaire doit être
+trouvé ; sans lui, les pages sont laissées vides.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+import multiprocessing
+import shutil
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import OCR_CACHE_DIR, OCR_DPI, OCR_ENABLED, OCR_LANG, OCR_WORKERS
+from metrics import count, stage
+
+if TYPE_CHECKING:
+    from budgets import Budget
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@functools.lru_cache(maxsize=None)
+def tesseract_available() -> bool:
+    """Indique si un moteur Tesseract est utilisable (vérifié une fois par processus).
+
+    `pytesseract` ne fait qu'appeler le binaire : sans lui, chaque page
+    échouerait à la reconnaissance, on préfère ne pas lancer l'OCR.
+    """
+    try:
+        import pytesseract
+    except ImportError:
+        return shutil.which("tesseract") is not None
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        return False
+    return True
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # « spawn » : l'API est multithread, un fork pourrait hériter d'un verrou tenu
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _ocr_png(png: bytes, lang: str) -> str:
+    """Reconnaît le texte d'une image PNG (exécuté dans un processus du pool)."""
+    try:
+        import pytesseract
+        from PIL import Image
+
+        return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=lang)
+    except ImportError:
+        result = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", lang],
+            input=png,
+            capture_output=True,
+            check=True,
+        )
+        return result.stdout.decode("utf-8", errors="ignore")
+
+
+def _cache_path(digest: str) -> Path:
+    return OCR_CACHE_DIR / digest[:2] / f"{digest}.txt"
+
+
+def _is_scanned(page) -> bool:
+    """Page sans police embarquée mais avec au moins une image : probablement un scan."""
+    return not page.get_fonts() and bool(page.get_images())
+
+
+def fill_missing_pages(raw: bytes, pages: List[str], budget: Optional["Budget"] = None) -> List[str]:
+    """Complète par OCR les pages vides de `pages` qui sont des scans.
+
+    `pages` contient une entrée par page lue (chaîne vide si aucun texte) ;
+    la liste renvoyée a la même longueur. Les pages sont rendues une à une,
+    le budget vérifié avant chaque rendu, et au plus `OCR_WORKERS` × 2
+    images attendent le pool à un instant donné.
+    """
+    if not OCR_ENABLED or not tesseract_available():
+        return pages
+    if budget is not None and not budget.check():
+        return pages
+    try:
+        import fitz
+    except ImportError:
+        return pages
+
+    filled = list(pages)
+    scanned: List[int] = []
+    pending: Dict[Future, Tuple[int, str]] = {}
+    max_in_flight = max(1, OCR_WORKERS) * 2
+
+    def collect(done) -> None:
+        for future in done:
+            index, digest = pending.pop(future)
+            try:
+                text = future.result()
+            except Exception:
+                count("ocr_errors")
+                continue
+            cached = _cache_path(digest)
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            cached.write_text(text, encoding="utf-8")
+            filled[index] = text
+            count("ocr_pages", source="tesseract")
+
+    def drain(limit: int) -> bool:
+        """Attend que `limit` images au plus restent en cours ; False si le temps est écoulé."""
+        while len(pending) > limit:
+            timeout = budget.remaining_seconds() if budget is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                return False
+            collect(done)
+        return True
+
+    with stage("ocr"):
+        doc = fitz.open(stream=raw, filetype="pdf")
+        try:
+            for index, text in enumerate(pages):
+                if text or index >= doc.page_count:
+                    continue
+                page = doc[index]
+                if not _is_scanned(page):
+                    continue
+                if not drain(max_in_flight - 1) or (budget is not None and not budget.check()):
+                    break
+                png = page.get_pixmap(dpi=OCR_DPI).tobytes("png")
+                digest = hashlib.sha256(png + OCR_LANG.encode("ascii")).hexdigest()
+                scanned.append(index)
+                cached = _cache_path(digest)
+                if cached.exists():
+                    filled[index] = cached.read_text(encoding="utf-8")
+                    count("ocr_pages", source="cache")
+                else:
+                    pending[_get_pool().submit(_ocr_png, png, OCR_LANG)] = (index, digest)
+                del png
+        finally:
+            doc.close()
+
+        if not drain(0):
+            for future in pending:
+                future.cancel()
+            if budget is not None:
+                budget.exhaust("time")
+
+    if budget is not None:
+        for index in scanned:
+            if filled[index]:
+                filled[index] = budget.add_text(filled[index])
+    return filled
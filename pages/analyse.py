@@ -2,15 +2,17 @@
 
 import streamlit as st
 
-from extract_required_documents import extract_required_documents, detect_sector
-from utils import (
-    extract_email,
-    extract_postal_address,
-    guess_buyer,
-    guess_deadline,
-    load_docx_text,
-    load_pdf_text,
-)
+from contextlib import nullcontext
+
+from analysis import Pipeline
+from config import PROFILE_STREAMLIT
+from memory import memory_budget
+from metrics import collect_timings
+from partials import PartialAnalysis
+from profiling import profiled
+
+# Même pipeline que l'API : étapes appelées une à une pour l'affichage, caches communs
+_PIPELINE = Pipeline()
 
 
 def _render_intro() -> None:
@@ -32,42 +34,63 @@ def _render_intro() -> None:
 
 def _extract_texts_from_uploads(uploaded_files):
     """Extrait les textes et les données brutes depuis les fichiers uploadés."""
-    all_texts = []
     files_data = []
 
     with st.spinner("📖 Extraction du texte des documents..."):
         for uploaded_file in uploaded_files:
             try:
-                raw = uploaded_file.read()
-                files_data.append((uploaded_file.name, raw))
-
-                filename = uploaded_file.name.lower()
-                if filename.endswith(".pdf"):
-                    text = load_pdf_text(raw)
-                elif filename.endswith(".docx"):
-                    text = load_docx_text(raw)
-                elif filename.endswith(".txt"):
-                    text = raw.decode("utf-8", errors="ignore")
-                else:
-                    text = ""
-
-                if text:
-                    all_texts.append(text)
-                else:
-                    st.warning(
-                        f"⚠️ Impossible d'extraire le texte de {uploaded_file.name}"
-                    )
+                files_data.append((uploaded_file.name, uploaded_file.read()))
             except Exception as e:  # pragma: no cover - affichage utilisateur
                 st.error(
                     f"❌ Erreur lors de l'extraction de {uploaded_file.name}: {e}"
                 )
 
-    return all_texts, files_data
+        # Triage des pièces : seules celles utiles aux métadonnées sont lues en entier
+        extracted = _PIPELINE.extract(files_data, _PIPELINE.ingest(files_data))
+
+    for item in extracted:
+        if not item.text:
+            st.warning(f"⚠️ Impossible d'extraire le texte de {item.name}")
+
+    sampled = [f"{item.name} ({item.triage.doc_type})" for item in extracted if item.triage.mode == "sample"]
+    if sampled:
+        st.caption(f"⚡ Pièces échantillonnées (premières pages seulement) : {', '.join(sampled)}")
+
+    truncated_files = [item.truncated for item in extracted if item.truncated]
+    st.session_state["truncated_files"] = truncated_files
+    _display_truncated_files(truncated_files)
+    return extracted, files_data
+
+
+def _extract_and_display_price_tables(files_data, extracted) -> None:
+    """Extrait et affiche les lignes des bordereaux de prix (BPU, DQE)."""
+    with st.spinner("📊 Lecture des bordereaux de prix..."):
+        tables = _PIPELINE.tables(files_data, extracted)
+    st.session_state["price_tables"] = [table.as_dict() for table in tables]
+    for table in tables:
+        if not table.rows:
+            continue
+        with st.expander(f"📊 {table.name} ({table.doc_type}) : {len(table.rows)} ligne(s)"):
+            st.dataframe([row.__dict__ for row in table.rows], use_container_width=True)
+            if table.reason == "time":
+                st.caption(f"⚠️ Budget de temps atteint : seules les {table.pages} premières pages ont été lues.")
+            elif table.truncated:
+                st.caption(f"⚠️ Seules les {table.pages} premières pages ont été lues.")
+
+
+def _display_truncated_files(truncated_files) -> None:
+    """Signale les documents dont l'extraction a été arrêtée par le budget."""
+    causes = {"time": "temps", "pages": "pages", "bytes": "volume de texte"}
+    for item in truncated_files:
+        st.warning(
+            f"✂️ {item['name']} : analyse partielle, budget {causes.get(item['reason'], item['reason'])} "
+            f"atteint ({item['pages']} page(s) lue(s))."
+        )
 
 
-def _detect_and_store_sector(combined_text: str) -> None:
+def _detect_and_store_sector(merged: PartialAnalysis) -> None:
     """Détecte le secteur et met à jour le session_state."""
-    sector = detect_sector(combined_text)
+    sector = _PIPELINE.sector(merged)
     if sector:
         st.session_state["detected_sector"] = sector
         st.success(f"🏷️ **Secteur détecté** : **{sector.capitalize()}**")
@@ -81,16 +104,17 @@ def _detect_and_store_sector(combined_text: str) -> None:
         )
 
 
-def _analyze_and_store_metadata(combined_text: str, files_data):
+def _analyze_and_store_metadata(merged: PartialAnalysis, files_data):
     """Analyse les documents et enregistre les résultats dans le session_state."""
     with st.spinner("🔍 Analyse des documents pour identifier les documents requis..."):
-        required_docs = extract_required_documents(combined_text, files_data)
+        required_docs = _PIPELINE.rules(merged)
 
         # Extraction des informations complémentaires
-        email_to = extract_email(combined_text)
-        postal_address = extract_postal_address(combined_text)
-        buyer = guess_buyer(combined_text)
-        deadline = guess_deadline(combined_text)
+        metadata = _PIPELINE.metadata(merged)
+        email_to = metadata["email_to"]
+        postal_address = metadata["postal_address"]
+        buyer = metadata["buyer"]
+        deadline = metadata["deadline"]
 
         # Sauvegarde dans session_state
         if email_to:
@@ -141,6 +165,11 @@ def _display_required_documents(required_docs):
 
             if source and source.strip():
                 with st.expander(f"📍 Contexte de détection - {label}"):
+                    location = [doc.get("source_document"), doc.get("source_heading")]
+                    if doc.get("source_page"):
+                        location.append(f"page {doc['source_page']}")
+                    if any(location):
+                        st.caption(" › ".join(part for part in location if part))
                     preview = source[:500]
                     suffix = "..." if len(source) > 500 else ""
                     st.text(preview + suffix)
@@ -204,6 +233,31 @@ def _display_summary(
         st.metric("Score moyen", f"{avg_score:.1f}")
 
 
+def _display_timings(timings: dict) -> None:
+    """Affiche le détail des temps par étape de la dernière analyse."""
+    with st.expander(f"⏱️ Temps par étape ({timings['total_s']:.2f} s au total)"):
+        rows = [
+            {
+                "Étape": name,
+                "Durée (s)": round(entry["seconds"], 3),
+                "Appels": entry["calls"],
+                "Pic mémoire (Mo)": round(entry.get("peak_bytes", 0) / 1e6, 1),
+            }
+            for name, entry in sorted(timings["stages"].items(), key=lambda item: -item[1]["seconds"])
+        ]
+        st.table(rows)
+        memory = timings.get("memory")
+        if memory:
+            mode = "économe" if memory["mode"] == "low" else "normal"
+            st.caption(
+                f"Mémoire : pic {memory['peak_bytes'] / 1e6:.1f} Mo ({memory['accounting']}), "
+                f"projection {memory['projected_bytes'] / 1e6:.1f} Mo, mode {mode}"
+            )
+        if timings["counters"]:
+            st.caption("Compteurs")
+            st.json(timings["counters"])
+
+
 def render():
     """Affiche la page d'analyse."""
     _render_intro()
@@ -225,22 +279,38 @@ def render():
     if not st.button("🔍 Analyser les documents", type="primary"):
         return
 
-    all_texts, files_data = _extract_texts_from_uploads(uploaded_files)
-    if not all_texts:
-        st.error("❌ Aucun texte n'a pu être extrait des documents.")
-        return
-
-    combined_text = "\n\n".join(all_texts)
-
-    _detect_and_store_sector(combined_text)
-
-    (
-        required_docs,
-        email_to,
-        postal_address,
-        buyer,
-        deadline,
-    ) = _analyze_and_store_metadata(combined_text, files_data)
+    # Profilage opt-in (AO_PROFILE_STREAMLIT=1), sans aucun coût lorsqu'il est désactivé
+    profile_ctx = (
+        profiled([(f.name, f.getvalue()) for f in uploaded_files], "streamlit")
+        if PROFILE_STREAMLIT
+        else nullcontext()
+    )
+    input_bytes = sum(f.size for f in uploaded_files)
+    with collect_timings() as timings, memory_budget(input_bytes), profile_ctx as profile_info:
+        extracted, files_data = _extract_texts_from_uploads(uploaded_files)
+
+        # Résultats partiels par pièce, en cache : ajouter une annexe n'analyse qu'elle
+        merged = _PIPELINE.normalize(extracted)
+        if merged is None:
+            st.error("❌ Aucun texte n'a pu être extrait des documents.")
+            _display_timings(timings.as_dict())
+            return
+
+        _detect_and_store_sector(merged)
+
+        (
+            required_docs,
+            email_to,
+            postal_address,
+            buyer,
+            deadline,
+        ) = _analyze_and_store_metadata(merged, files_data)
+        _extract_and_display_price_tables(files_data, extracted)
+
+    st.session_state["analysis_timings"] = timings.as_dict()
+    _display_timings(st.session_state["analysis_timings"])
+    if profile_info is not None:
+        st.caption(f"🔬 Profil enregistré : {profile_info['profile']}")
 
     if not required_docs:
         st.warning("⚠️ Aucun document requis trouvé dans les documents analysés.")
@@ -1,25 +1,13 @@
 """Page d'assemblage du dossier."""
 
 import datetime as dt
-import json
 from pathlib import Path
-from typing import List
 
 import streamlit as st
 
-from config import OUTPUT_ROOT
-from utils import (
-    ChecklistRow,
-    copy_if_found,
-    find_all_matching_docs,
-    find_best_doc,
-    load_pdf_text,
-    load_docx_text,
-    now_utc,
-    slugify,
-    write_email_draft,
-    write_markdown_table,
-)
+from assembly import DocumentSelection, assemble_dossier, find_candidates
+from config import TEMP_UPLOAD_DIR
+from streamlit_cache import company_files, invalidate_company_scan
 
 try:
     import pandas as pd  # type: ignore
@@ -27,22 +15,6 @@ except ImportError:
     pd = None
 
 
-def _build_search_patterns(label: str, doc: dict) -> List[str]:
-    """Construit la liste des patterns de recherche à partir du label et des mots-clés."""
-    patterns: List[str] = []
-
-    # Ajoute les mots significatifs du label
-    label_words = [w.lower() for w in label.split() if len(w) > 2]
-    patterns.extend(label_words[:3])  # Prend les 3 premiers mots significatifs
-
-    # Ajoute les mots-clés éventuels du document
-    for kw in doc.get("keywords", []):
-        if isinstance(kw, str) and len(kw) > 2:
-            patterns.append(kw.lower())
-
-    return patterns
-
-
 def render():
     """Affiche la page d'assemblage."""
     st.header("📦 Assemblage du dossier")
@@ -71,20 +43,24 @@ def render():
         st.session_state["company_docs_root"] = company_docs_root
         company_docs_path = Path(company_docs_root)
         
+        # Scan unique du dossier, réutilisé à chaque rerun jusqu'au prochain rafraîchissement
+        company_entries = []
         if not company_docs_path.exists():
             st.warning(f"⚠️ Le dossier '{company_docs_root}' n'existe pas.")
         else:
             st.success(f"✅ Dossier trouvé : {company_docs_root}")
             # Affiche le nombre de fichiers dans le dossier
             try:
-                file_count = sum(1 for _ in company_docs_path.rglob("*") if _.is_file())
-                st.caption(f"📄 {file_count} fichier(s) trouvé(s) dans le dossier et ses sous-dossiers")
+                company_entries = company_files(company_docs_root)
+                st.caption(f"📄 {len(company_entries)} fichier(s) trouvé(s) dans le dossier et ses sous-dossiers")
             except Exception:
                 pass
+        entries_by_path = {entry.path: entry for entry in company_entries}
     
     with col2:
         st.markdown("<br>", unsafe_allow_html=True)  # Espacement
         if st.button("🔄 Rechercher", help="Relance la recherche de tous les documents"):
+            invalidate_company_scan()
             st.rerun()
     
     st.divider()
@@ -96,8 +72,11 @@ def render():
     
     st.divider()
     
+    # Recherche automatique de TOUS les documents correspondants, pour chaque pièce
+    candidates = find_candidates(required_docs, company_docs_path, company_entries) if company_docs_path.exists() else {}
+
     # Liste des documents avec sélection
-    document_selections = {}
+    document_selections = []
     
     for idx, doc in enumerate(required_docs, 1):
         key = doc.get("key", f"doc_{idx}")
@@ -107,13 +86,7 @@ def render():
         st.subheader(f"{idx}. {label}")
         st.caption(f"Catégorie : {category}")
         
-        # Création de patterns à partir du label et des keywords
-        patterns = _build_search_patterns(label, doc)
-        
-        # Recherche automatique de TOUS les documents correspondants
-        matching_docs = []
-        if company_docs_path.exists():
-            matching_docs = find_all_matching_docs(company_docs_path, patterns, max_age_days=None)
+        matching_docs = candidates.get(key, [])
         
         # Document sélectionné (manuel ou automatique)
         current_selection = st.session_state["manual_doc_selections"].get(key)
@@ -169,9 +142,10 @@ def render():
                     # Affiche les autres options
                     with st.expander(f"📋 Voir les {len(matching_docs)} options trouvées"):
                         for i, doc in enumerate(matching_docs, 1):
-                            size = doc.stat().st_size
+                            entry = entries_by_path[doc]
+                            size = entry.size
                             size_str = f"{size / 1024:.1f} Ko" if size < 1024 * 1024 else f"{size / (1024*1024):.1f} Mo"
-                            mod_time = dt.datetime.fromtimestamp(doc.stat().st_mtime)
+                            mod_time = dt.datetime.fromtimestamp(entry.mtime)
                             is_selected = "✅" if str(doc) == current_selection else "  "
                             st.write(f"{is_selected} {i}. **{doc.name}** - {size_str} - Modifié le {mod_time.strftime('%d/%m/%Y %H:%M')}")
                             st.caption(f"   {doc}")
@@ -192,10 +166,11 @@ def render():
             
             if uploaded_file:
                 # Sauvegarde temporaire du fichier uploadé
-                temp_dir = Path.cwd() / "temp_uploads"
-                temp_dir.mkdir(exist_ok=True)
+                temp_dir = TEMP_UPLOAD_DIR
+                temp_dir.mkdir(parents=True, exist_ok=True)
                 temp_path = temp_dir / uploaded_file.name
                 temp_path.write_bytes(uploaded_file.getvalue())
+                invalidate_company_scan()
                 st.session_state["manual_doc_selections"][key] = str(temp_path)
                 st.success(f"✅ {uploaded_file.name} sélectionné")
                 st.rerun()
@@ -209,11 +184,7 @@ def render():
         # Utilise le document sélectionné
         final_doc = current_selection if current_selection and Path(current_selection).exists() else None
         
-        document_selections[key] = {
-            'doc': final_doc,
-            'label': label,
-            'item': doc,
-        }
+        document_selections.append(DocumentSelection(key, label, doc, final_doc))
         
         st.divider()
     
@@ -229,88 +200,22 @@ def render():
     
     # Bouton d'assemblage
     if st.button("📦 Assembler le dossier", type="primary", use_container_width=True):
-        ao_folder = OUTPUT_ROOT / f"{slugify(ao_id_value or 'ao')}_{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        ao_folder.mkdir(parents=True, exist_ok=True)
-
-        # Sauvegarde des fichiers AO source
-        (ao_folder / "source").mkdir(exist_ok=True)
-        for filename, raw in st.session_state["ao_files"]:
-            (ao_folder / "source" / filename).write_bytes(raw)
-
-        # Extraction des métadonnées
-        texts = []
-        for filename, raw in st.session_state["ao_files"]:
-            if filename.lower().endswith('.pdf'):
-                texts.append(load_pdf_text(raw))
-            elif filename.lower().endswith('.docx'):
-                texts.append(load_docx_text(raw))
-            else:
-                texts.append(raw.decode('utf-8', errors='ignore'))
-        combined_text = "\n".join(texts)
-        
-        from utils import guess_buyer, guess_deadline
-        buyer = guess_buyer(combined_text) or st.session_state.get("buyer")
-        deadline = guess_deadline(combined_text) or (
-            dt.datetime.fromisoformat(st.session_state["deadline"]) 
-            if st.session_state.get("deadline") else None
+        deadline = None
+        if st.session_state.get("deadline"):
+            deadline = dt.datetime.fromisoformat(st.session_state["deadline"])
+        dossier = assemble_dossier(
+            st.session_state["ao_files"],
+            document_selections,
+            ao_id_value,
+            buyer=st.session_state.get("buyer"),
+            deadline=deadline,
+            email_to=st.session_state.get("email_to"),
+            sector=st.session_state.get("detected_sector"),
         )
+        ao_folder, rows = dossier.folder, dossier.rows
 
-        # Copie des documents dans le dossier de soumission
-        submission_dir = ao_folder / "submission"
-        submission_dir.mkdir(exist_ok=True)
-        rows: List[ChecklistRow] = []
-
-        for sel_key, selection in document_selections.items():
-            item = selection['item']
-            label = selection['label']
-            found_doc = selection['doc']
-            # Utilise la clé de l'item si disponible, sinon utilise sel_key
-            if isinstance(item, dict):
-                key = item.get("key", sel_key)
-            else:
-                key = sel_key
-
-            if found_doc and Path(found_doc).exists():
-                submission_path = str(copy_if_found(Path(found_doc), submission_dir))
-                status = "OK"
-            else:
-                submission_path = ""
-                status = "MISSING"
-
-            rows.append(ChecklistRow(
-                key=key,
-                label=label,
-                status=status,
-                source=str(found_doc) if found_doc else "",
-                submission_path=submission_path,
-                max_age_days="",
-            ))
-
-        # Génération des fichiers
-        if pd:
-            pd.DataFrame([row.__dict__ for row in rows]).to_excel(submission_dir / "checklist.xlsx", index=False)
-        else:
-            (submission_dir / "checklist.csv").write_text(
-                "key,label,status,source,submission_path,max_age_days\n" + "\n".join(
-                    f"{row.key},{row.label},{row.status},{row.source},{row.submission_path},{row.max_age_days}"
-                    for row in rows
-                ), encoding="utf-8"
-            )
-
-        (ao_folder / "README.md").write_text(write_markdown_table(rows), encoding="utf-8")
-        (ao_folder / "meta.json").write_text(json.dumps({
-            "ao_id": ao_id_value,
-            "buyer": buyer,
-            "deadline": deadline.isoformat() if isinstance(deadline, dt.datetime) else None,
-            "created_at": now_utc().isoformat(),
-            "sector": st.session_state.get("detected_sector"),
-        }, ensure_ascii=False, indent=2), encoding="utf-8")
-
-        # Génération du brouillon d'email
-        write_email_draft(
-            ao_folder, buyer, deadline, rows,
-            st.session_state.get("email_to"), ao_id_value
-        )
+        # Le dossier de sortie peut se trouver sous le dossier d'entreprise
+        invalidate_company_scan()
 
         st.session_state["ao_folder"] = str(ao_folder)
         st.session_state["checklist_rows"] = [row.__dict__ for row in rows]
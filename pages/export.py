@@ -6,7 +6,9 @@ from urllib.parse import quote
 
 import streamlit as st
 
-from utils import zip_dir
+from retention import mark_used
+from streamlit_cache import submission_zip
+from tables import CSV_NAME as PRICE_CSV_NAME
 
 
 def render():
@@ -91,7 +93,7 @@ def render():
             st.subheader("📋 Documents intégrés dans le dossier")
             
             files = list(submission_dir.rglob("*"))
-            files = [f for f in files if f.is_file() and f.name != "checklist.xlsx" and f.name != "checklist.csv"]
+            files = [f for f in files if f.is_file() and f.name not in ("checklist.xlsx", "checklist.csv", PRICE_CSV_NAME)]
             
             if files:
                 st.info(f"**{len(files)} document(s)** prêt(s) pour l'envoi :")
@@ -156,8 +158,9 @@ def render():
                 size_str = f"{size / 1024:.1f} Ko" if size < 1024 * 1024 else f"{size / (1024*1024):.1f} Mo"
                 st.write(f"- {file.name} ({size_str})")
         
-        # Bouton de téléchargement ZIP
-        zipped = zip_dir(submission_dir)
+        # Bouton de téléchargement ZIP (recompressé seulement si le dossier a changé)
+        zipped = submission_zip(submission_dir)
+        mark_used(ao_folder)
         st.download_button(
             label="📦 Télécharger le dossier submission (ZIP)",
             data=zipped,
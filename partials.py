@@ -0,0 +1,206 @@
+"""Analyse incrémentale : un résultat partiel par pièce, puis une fusion.
+
+Chaque pièce est analysée seule : première position de chaque mot-clé des
+règles, occurrences des mots-clés de secteur, candidats pour l'email,
+l'acheteur, la date limite et l'adresse. Le résultat d'un DCE est la fusion
+de ces résultats partiels dans l'ordre des pièces ; la fusion est
+associative et `PartialAnalysis()` en est l'élément neutre.
+
+Ajouter ou retirer une pièce ne coûte donc que l'analyse de cette pièce (les
+autres sont en cache, par empreinte de leur texte) et une fusion, et les
+pièces d'un même DCE peuvent être analysées en parallèle.
+
+Seule différence avec l'analyse du texte concaténé : une correspondance ne
+peut plus chevaucher la fin d'une pièce et le début de la suivante.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import sys
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from coalesce import BoundedCache
+from config import ANALYSIS_WORKERS, PARTIAL_CACHE_MAX_MB
+from document_rules import SECTOR_KEYWORDS
+from extract_required_documents import context_fields, required_document, rule_keywords, rules_for_sector
+from metrics import count, stage
+from sections import SectionTree, segment
+from utils import (
+    buyer_candidates,
+    deadline_candidates,
+    email_candidates,
+    extract_postal_address,
+    first_candidates,
+    pick_buyer,
+    pick_deadline,
+    pick_email,
+)
+
+_RULE_KEYWORDS = rule_keywords()
+_SECTOR_WORDS = list(dict.fromkeys(w for words in SECTOR_KEYWORDS.values() for w in words))
+
+_cache = BoundedCache(PARTIAL_CACHE_MAX_MB * 1024 * 1024)
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class PartialDocument:
+    """Pièce analysée : son texte et son arbre de sections (positions locales)."""
+
+    name: str
+    text: str
+    sections: SectionTree
+
+
+@dataclass
+class PartialAnalysis:
+    """Résultat partiel d'une ou plusieurs pièces consécutives."""
+
+    documents: List[PartialDocument] = field(default_factory=list)
+    # Mot-clé -> (indice de la pièce, position) de sa première occurrence
+    keyword_hits: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    # Mot-clé de secteur -> nombre d'occurrences
+    sector_terms: Dict[str, int] = field(default_factory=dict)
+    # Emails par niveau de priorité (voir `utils.email_candidates`)
+    conditions_emails: List[str] = field(default_factory=list)
+    keyword_emails: List[str] = field(default_factory=list)
+    all_emails: List[str] = field(default_factory=list)
+    buyers: List[Optional[str]] = field(default_factory=list)
+    deadlines: List[Optional[str]] = field(default_factory=list)
+    postal_address: Optional[str] = None
+
+    def merge(self, other: "PartialAnalysis") -> "PartialAnalysis":
+        """Résultat de `self` suivi de `other` (les pièces de `self` l'emportent)."""
+        shift = len(self.documents)
+        hits = {kw: (index + shift, pos) for kw, (index, pos) in other.keyword_hits.items()}
+        hits.update(self.keyword_hits)
+        terms = Counter(self.sector_terms)
+        terms.update(other.sector_terms)
+        return PartialAnalysis(
+            self.documents + other.documents,
+            hits,
+            dict(terms),
+            # Sections de remise des plis : la dernière du dossier en tête, comme sur le texte concaténé
+            other.conditions_emails + self.conditions_emails,
+            self.keyword_emails + other.keyword_emails,
+            self.all_emails + other.all_emails,
+            first_candidates(self.buyers, other.buyers),
+            first_candidates(self.deadlines, other.deadlines),
+            self.postal_address or other.postal_address,
+        )
+
+    @property
+    def sector(self) -> Optional[str]:
+        """Même priorité que `detect_sector` sur le texte concaténé."""
+        for sector, words in SECTOR_KEYWORDS.items():
+            if any(self.sector_terms.get(w) for w in words):
+                return sector
+        return None
+
+    def required_documents(self) -> List[dict]:
+        """Documents requis, au format de `extract_required_documents`."""
+        results = []
+        for rule in rules_for_sector(self.sector):
+            found = [kw for kw in rule["keywords"] if kw in self.keyword_hits]
+            if not found:
+                continue
+            # Contexte du premier mot-clé présent, dans la première pièce qui le contient
+            document = self.documents[self.keyword_hits[found[0]][0]]
+            context = context_fields(document.text, found[:1], document.sections)
+            results.append(required_document(rule, len(found), context))
+        results.sort(key=lambda x: x["score"], reverse=True)
+        return results
+
+    def email(self) -> Optional[str]:
+        return pick_email(self.conditions_emails, self.keyword_emails, self.all_emails)
+
+    def buyer(self) -> Optional[str]:
+        return pick_buyer(self.buyers)
+
+    def deadline(self):
+        return pick_deadline(self.deadlines)
+
+    def outline(self, max_level: Optional[int] = None) -> List[dict]:
+        return [entry for document in self.documents for entry in document.sections.outline(max_level)]
+
+
+def analyze_text(name: str, text: str) -> PartialAnalysis:
+    """Résultat partiel d'une pièce (calcul pur, exécutable dans un autre processus)."""
+    text_lower = text.lower()
+    sections = segment(text, name)
+    hits = {}
+    for kw in _RULE_KEYWORDS:
+        pos = text_lower.find(kw.lower())
+        if pos != -1:
+            hits[kw] = (0, pos)
+    terms = {w: text_lower.count(w) for w in _SECTOR_WORDS if w in hits}
+    conditions_emails, keyword_emails, all_emails = email_candidates(text, sections)
+    return PartialAnalysis(
+        [PartialDocument(name, text, sections)],
+        hits,
+        terms,
+        conditions_emails,
+        keyword_emails,
+        all_emails,
+        buyer_candidates(text),
+        deadline_candidates(text),
+        extract_postal_address(text),
+    )
+
+
+def merge_partials(partials: Sequence[PartialAnalysis]) -> PartialAnalysis:
+    return reduce(PartialAnalysis.merge, partials, PartialAnalysis())
+
+
+def get_executor() -> Optional[Executor]:
+    """Pool de processus partagé pour l'analyse des pièces (None si `AO_ANALYSIS_WORKERS` <= 1)."""
+    global _executor
+    if ANALYSIS_WORKERS <= 1:
+        return None
+    if _executor is None:
+        # « spawn » : l'API est multithread, un fork pourrait hériter d'un verrou tenu
+        _executor = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _cache_key(name: str, text: str) -> Tuple[str, str]:
+    return name, hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def analyze_documents(
+    documents: Sequence[Tuple[str, str]],
+    executor: Optional[Executor] = None,
+) -> PartialAnalysis:
+    """Fusion des résultats partiels des pièces (nom, texte), calculés une seule fois par texte.
+
+    Avec `executor`, les pièces absentes du cache sont analysées en parallèle.
+    """
+    keys = [_cache_key(name, text) for name, text in documents]
+    partials: List[Optional[PartialAnalysis]] = [_cache.get(key) for key in keys]
+    missing = [i for i, partial in enumerate(partials) if partial is None]
+    count("cache_requests", len(documents) - len(missing), cache="partial", result="hit")
+    count("cache_requests", len(missing), cache="partial", result="miss")
+
+    with stage("partials"):
+        names = [documents[i][0] for i in missing]
+        texts = [documents[i][1] for i in missing]
+        if executor is not None and len(missing) > 1:
+            computed = list(executor.map(analyze_text, names, texts))
+        else:
+            computed = [analyze_text(name, text) for name, text in zip(names, texts)]
+    for i, partial in zip(missing, computed):
+        partials[i] = partial
+        _cache.put(keys[i], partial, sys.getsizeof(documents[i][1]))
+
+    with stage("merge"):
+        return merge_partials(partials)
+
+
+def clear_cache() -> None:
+    _cache.clear()
@@ -0,0 +1,197 @@
+"""Registre des expressions régulières de l'extraction des métadonnées.
+
+Chaque motif est compilé une seule fois, au chargement, par `register`. Si
+le module `re2` (paquet google-re2, optionnel) est installé, les motifs sont
+confiés au moteur RE2, dont le temps d'exécution est linéaire quelle que
+soit l'entrée ; sinon le module `re` est utilisé. Dans les deux cas les
+motifs sont écrits sous forme bornée (répétitions {m,n} plutôt que + sur
+des classes qui se chevauchent) : le retour arrière de `re` reste limité à
+chaque position, et un texte adverse ne coûte qu'un temps linéaire.
+
+Pour que les deux moteurs donnent les mêmes résultats, `\\s` et `\\w` sont
+réécrits en classes Unicode pour RE2 (qui n'y reconnaît sinon que l'ASCII).
+`\\b` n'a pas d'équivalent Unicode dans RE2 : les motifs qui l'utilisent
+(email) restent sur `re`, leur forme bornée suffisant à les garder linéaires.
+
+Les motifs appliqués ligne à ligne (`per_line`), à préfixe littéral et donc
+déjà linéaires avec `re`, y restent en mode "auto" : RE2 coûte environ dix
+fois plus cher par appel sur une ligne courte.
+
+`AO_REGEX_ENGINE` : "auto" (RE2 si disponible), "re" ou "re2".
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, Optional
+
+from config import REGEX_ENGINE
+from metrics import count
+
+ENGINES = ("auto", "re", "re2")
+
+_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s"}
+
+# Classes de `re` (sur des str) que RE2 limite à l'ASCII, réécrites à l'identique
+_RE2_CLASSES = {
+    "s": r"\s\x{0b}\x{1c}-\x{1f}\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}",
+    "w": r"\pL\pN_",
+}
+# Classes négatives (non traduisibles dans un ensemble [...]) et limites de mot : le motif reste sur `re`
+_RE2_UNTRANSLATED = "SWbB"
+
+REGISTRY: Dict[str, "Regex"] = {}
+
+
+def re2_available() -> bool:
+    """Indique si le moteur RE2 est installé."""
+    try:
+        import re2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _re2_syntax(pattern: str, flags: int) -> Optional[str]:
+    """Motif équivalent pour RE2 (drapeaux en ligne), ou None s'il n'est pas traduisible."""
+    inline = "".join(letter for flag, letter in _FLAGS.items() if flags & flag)
+    if flags & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL | re.UNICODE):
+        return None
+    out: List[str] = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            if escaped in _RE2_UNTRANSLATED:
+                return None
+            if escaped in _RE2_CLASSES:
+                members = _RE2_CLASSES[escaped]
+                out.append(members if in_class else f"[{members}]")
+            else:
+                out.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if char == "[" and not in_class:
+            in_class = True
+            # Un « ] » juste après « [ » ou « [^ » est littéral
+            end = i + 1 + (pattern[i + 1:i + 2] == "^")
+            end += pattern[end:end + 1] == "]"
+            out.append(pattern[i:end])
+            i = end
+            continue
+        if char == "]" and in_class:
+            in_class = False
+        out.append(char)
+        i += 1
+    return (f"(?{inline})" if inline else "") + "".join(out)
+
+
+class Regex:
+    """Motif compilé du registre ; `engine` indique le moteur effectivement utilisé."""
+
+    def __init__(self, name: str, pattern: str, flags: int = 0, per_line: bool = False):
+        self.name = name
+        self.pattern = pattern
+        self.flags = flags
+        self.per_line = per_line
+        self.engine = "re"
+        self._compiled = None
+        self.compile(REGEX_ENGINE)
+
+    def compile(self, engine: str) -> None:
+        """(Re)compile le motif ; retombe sur `re` si RE2 est absent ou refuse la syntaxe."""
+        wants_re2 = engine == "re2" or (engine == "auto" and not self.per_line)
+        translated = _re2_syntax(self.pattern, self.flags) if wants_re2 else None
+        if translated is not None and re2_available():
+            import re2
+
+            try:
+                self._compiled = re2.compile(translated)
+                self.engine = "re2"
+                return
+            except Exception:
+                count("regex_fallbacks", pattern=self.name)
+        self._compiled = re.compile(self.pattern, self.flags)
+        self.engine = "re"
+
+    def search(self, text: str):
+        return self._compiled.search(text)
+
+    def findall(self, text: str) -> list:
+        return self._compiled.findall(text)
+
+    def finditer(self, text: str) -> Iterator:
+        return self._compiled.finditer(text)
+
+    def __repr__(self) -> str:
+        return f"Regex({self.name!r}, engine={self.engine!r})"
+
+
+def register(name: str, pattern: str, flags: int = 0, per_line: bool = False) -> Regex:
+    """Compile et enregistre un motif sous `name` (unique)."""
+    if name in REGISTRY:
+        raise ValueError(f"Motif déjà enregistré : {name}")
+    REGISTRY[name] = regex = Regex(name, pattern, flags, per_line)
+    return regex
+
+
+def use_engine(engine: str) -> None:
+    """Recompile tout le registre avec `engine` ("auto", "re" ou "re2"), pour les benchmarks."""
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur inconnu : {engine} (attendu : {', '.join(ENGINES)})")
+    for regex in REGISTRY.values():
+        regex.compile(engine)
+
+
+def engines() -> Dict[str, str]:
+    """Moteur utilisé par chaque motif du registre."""
+    return {name: regex.engine for name, regex in REGISTRY.items()}
+
+
+# --- Motifs de l'extraction des métadonnées (utils) ---
+# Bornes : 64 caractères avant « @ », 253 pour le domaine (limites des adresses
+# email), 60 puis 120 caractères autour du type de voie d'une adresse, 150 pour
+# un nom d'acheteur, 20 pour les séparateurs.
+
+EMAIL = register("email", r"\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Za-z]{2,24}\b")
+
+# Intitulé normalisé (minuscules, sans accents) ou ligne en minuscules
+REMISE_DES_PLIS = register(
+    "remise_des_plis", r"conditions?\s+d'?envoi\s+(?:ou\s+de\s+)?remise\s+des\s+plis?", per_line=True
+)
+MAJOR_HEADING = register("major_heading", r"^(chapitre|section|partie|titre)\s+", per_line=True)
+EMAIL_KEYWORDS = register(
+    "email_keywords",
+    r"(?:adresse\s+electronique|adresse\s+email|adresse\s+mail|courrier\s+electronique|contact"
+    r"|envoyer\s+à|destinataire|depot\s+(?:electronique|numerique))[^\w]",
+    per_line=True,
+)
+
+POSTAL_ADDRESS = register(
+    "postal_address",
+    r"\d{1,6}[,\s]{1,4}[A-Za-zÀ-ÿ\s]{1,60}(?:rue|avenue|boulevard|place|chemin|route|impasse)[A-Za-zÀ-ÿ\s]{1,120}\d{5}",
+    re.IGNORECASE,
+)
+
+BUYER = [
+    register("buyer_acheteur", r"acheteur[:\s]{1,20}([A-Z][A-Za-zÀ-ÿ\s]{1,150})", re.IGNORECASE),
+    register("buyer_commande", r"commande[:\s]{1,20}([A-Z][A-Za-zÀ-ÿ\s]{1,150})", re.IGNORECASE),
+    register(
+        "buyer_maitre_ouvrage",
+        r"maître[:\s]{1,20}d'?ouvrage[:\s]{1,20}([A-Z][A-Za-zÀ-ÿ\s]{1,150})",
+        re.IGNORECASE,
+    ),
+]
+
+_DATE = r"(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})"
+DEADLINE = [
+    register(
+        "deadline_limite",
+        r"date[:\s]{1,20}limite[:\s]{1,20}(?:de[:\s]{1,20})?(?:dépôt|remise)[:\s]{1,20}" + _DATE,
+        re.IGNORECASE,
+    ),
+    register("deadline_depot", r"dépôt[:\s]{1,20}(?:avant|le|au)[:\s]{1,20}" + _DATE, re.IGNORECASE),
+    register("deadline_avant", _DATE + r"[:\s]{1,20}(?:date[:\s]{1,20}limite|dépôt)", re.IGNORECASE),
+]
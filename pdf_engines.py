@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""Ordre adaptatif des moteurs PDF, appris par producteur de document.
+
+Usage :
+    python -m pdf_engines [--json] [--reset [PRODUCTEUR]]
+
+Pour chaque PDF, le couple `Producer` / `Creator` de ses métadonnées (numéros
+de version retirés) sert de clé. Chaque essai de moteur est enregistré sous
+cette clé : durée, pages, caractères extraits, et s'il a suffi (plus de
+`MIN_TEXT_CHARS` caractères, critère de `load_pdf_text`).
+
+Les moteurs sont ensuite essayés du plus rapide (par page) au plus lent parmi
+ceux qui suffisent presque toujours pour ce producteur, puis les autres. Un
+moteur qui n'a pas encore `AO_PDF_ENGINE_MIN_SAMPLES` essais pour ce
+producteur est jugé sur les statistiques de tous les producteurs ; s'il n'en
+a pas non plus, il est essayé en premier (un seul par document). Un document
+sur `AO_PDF_ENGINE_EXPLORE_EVERY` commence par le moteur le moins essayé
+pour son producteur, afin de suivre l'évolution des générateurs.
+
+Seul l'ordre change : la chaîne de secours est conservée. Les statistiques
+sont écrites dans `AO_PDF_ENGINE_STATS` (JSON), fusionnées avec celles des
+autres processus à chaque écriture.
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import codecs
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from config import (
+    PDF_ENGINE_ADAPTIVE,
+    PDF_ENGINE_EXPLORE_EVERY,
+    PDF_ENGINE_MIN_SAMPLES,
+    PDF_ENGINE_STATS_PATH,
+)
+from metrics import count
+
+# Texte minimum pour qu'un moteur soit jugé suffisant (même seuil que `load_pdf_text`)
+MIN_TEXT_CHARS = 50
+# Taux de réussite à partir duquel un moteur est classé sur sa seule vitesse
+RELIABLE_RATE = 0.9
+UNKNOWN_PRODUCER = "inconnu"
+
+_SAVE_INTERVAL_S = 5.0
+
+_INFO_ENTRY = re.compile(rb"/(Producer|Creator)\s*(?:\(((?:[^()\\]|\\.){0,256})\)|<([0-9A-Fa-f\s]{0,1024})>)")
+_XMP_ENTRY = re.compile(rb"<(pdf:Producer|xmp:CreatorTool)>([^<]{0,256})<")
+_VERSION = re.compile(r"[\d._-]*\d[\d._-]*|\([^)]*\)")
+
+E = TypeVar("E")
+
+
+def _decode_pdf_string(literal: Optional[bytes], hexa: Optional[bytes]) -> str:
+    if hexa is not None:
+        try:
+            data = bytes.fromhex(hexa.decode("ascii").replace(" ", "").replace("\n", "").replace("\r", ""))
+        except ValueError:
+            return ""
+    else:
+        data = re.sub(rb"\\(.)", rb"\1", literal or b"")
+    if data.startswith(codecs.BOM_UTF16_BE):
+        return data[2:].decode("utf-16-be", errors="ignore")
+    return data.decode("latin-1")
+
+
+def _normalize(value: str) -> str:
+    """Famille du générateur : minuscules, sans numéro de version."""
+    value = _VERSION.sub(" ", value.lower())
+    return " ".join(value.replace(";", " ").split())[:60]
+
+
+def producer_key(raw: bytes) -> str:
+    """Clé `producer | creator` d'un PDF, lue dans le dictionnaire Info ou les métadonnées XMP.
+
+    Lecture directe des octets (pas d'ouverture du PDF) : un dictionnaire Info
+    compressé dans un flux d'objets n'est pas vu, la clé vaut alors « inconnu ».
+    """
+    found: Dict[str, str] = {}
+    for match in _INFO_ENTRY.finditer(raw):
+        # La dernière occurrence l'emporte (mises à jour incrémentales)
+        found[match.group(1).decode()] = _decode_pdf_string(match.group(2), match.group(3))
+    if not found:
+        for match in _XMP_ENTRY.finditer(raw):
+            name = "Producer" if match.group(1) == b"pdf:Producer" else "Creator"
+            found.setdefault(name, match.group(2).decode("utf-8", errors="ignore"))
+    producer = _normalize(found.get("Producer", ""))
+    creator = _normalize(found.get("Creator", ""))
+    if not producer and not creator:
+        return UNKNOWN_PRODUCER
+    return f"{producer} | {creator}"
+
+
+@dataclass
+class EngineRecord:
+    """Cumul des essais d'un moteur pour un producteur."""
+
+    runs: int = 0
+    errors: int = 0
+    sufficient: int = 0
+    seconds: float = 0.0
+    pages: int = 0
+    chars: int = 0
+
+    def add(self, other: "EngineRecord") -> None:
+        self.runs += other.runs
+        self.errors += other.errors
+        self.sufficient += other.sufficient
+        self.seconds += other.seconds
+        self.pages += other.pages
+        self.chars += other.chars
+
+    @property
+    def sufficient_rate(self) -> float:
+        return self.sufficient / self.runs if self.runs else 0.0
+
+    @property
+    def seconds_per_page(self) -> float:
+        return self.seconds / max(self.pages, self.runs, 1)
+
+    def summary(self) -> dict:
+        return {
+            **asdict(self),
+            "seconds": round(self.seconds, 6),
+            "sufficient_rate": round(self.sufficient_rate, 4),
+            "seconds_per_page": round(self.seconds_per_page, 6),
+            "mean_chars": round(self.chars / self.runs) if self.runs else 0,
+        }
+
+
+Stats = Dict[str, Dict[str, EngineRecord]]
+
+
+def _merge_into(target: Stats, source: Stats) -> None:
+    for key, engines in source.items():
+        for name, record in engines.items():
+            target.setdefault(key, {}).setdefault(name, EngineRecord()).add(record)
+
+
+def _read_stats(path: Path) -> Stats:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {
+        key: {name: EngineRecord(**record) for name, record in engines.items()}
+        for key, engines in data.get("producers", {}).items()
+    }
+
+
+def _write_stats(path: Path, stats: Stats) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "version": 1,
+        "producers": {key: {name: asdict(r) for name, r in engines.items()} for key, engines in stats.items()},
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class EngineSelector:
+    """Statistiques des moteurs PDF par producteur, et ordre d'essai qui en découle."""
+
+    def __init__(
+        self,
+        path: Path,
+        enabled: bool = True,
+        min_samples: int = PDF_ENGINE_MIN_SAMPLES,
+        explore_every: int = PDF_ENGINE_EXPLORE_EVERY,
+    ):
+        self.path = path
+        self.enabled = enabled
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self._lock = threading.Lock()
+        self._base: Optional[Stats] = None  # dernier état lu ou écrit sur disque
+        self._pending: Stats = {}  # essais pas encore écrits
+        self._documents: Dict[str, int] = {}
+        self._last_save = 0.0
+
+    def _stats(self) -> Stats:
+        if self._base is None:
+            self._base = _read_stats(self.path)
+        stats: Stats = {}
+        _merge_into(stats, self._base)
+        _merge_into(stats, self._pending)
+        return stats
+
+    def _ranked(self, key: str, names: Sequence[str], stats: Stats) -> Tuple[List[str], List[str]]:
+        """(moteurs classés, moteurs sans statistiques suffisantes)."""
+        overall: Dict[str, EngineRecord] = {}
+        for engines in stats.values():
+            for name, record in engines.items():
+                overall.setdefault(name, EngineRecord()).add(record)
+        known: Dict[str, EngineRecord] = {}
+        for name in names:
+            for source in (stats.get(key, {}), overall):
+                record = source.get(name)
+                if record is not None and record.runs >= self.min_samples:
+                    known[name] = record
+                    break
+
+        def rank(name: str):
+            record = known[name]
+            reliable = record.sufficient_rate >= RELIABLE_RATE
+            return (not reliable, 0.0 if reliable else -record.sufficient_rate, record.seconds_per_page)
+
+        return sorted(known, key=rank), [name for name in names if name not in known]
+
+    def order(self, key: str, engines: Sequence[Tuple[str, E]]) -> List[Tuple[str, E]]:
+        """Moteurs (nom, fonction) dans l'ordre où les essayer pour un PDF de ce producteur."""
+        if not self.enabled:
+            return list(engines)
+        by_name = dict(engines)
+        with self._lock:
+            stats = self._stats()
+            ranked, unknown = self._ranked(key, list(by_name), stats)
+            seen = self._documents[key] = self._documents.get(key, 0) + 1
+        names = ranked + unknown
+        if unknown:
+            # Un moteur jamais mesuré passe en tête, les autres restent après les moteurs classés
+            names = unknown[:1] + ranked + unknown[1:]
+        elif self.explore_every > 0 and seen % self.explore_every == 0:
+            runs = {name: stats.get(key, {}).get(name, EngineRecord()).runs for name in names}
+            least = min(names, key=lambda name: runs[name])
+            names = [least] + [name for name in names if name != least]
+        if names[0] != engines[0][0]:
+            count("pdf_engine_reordered", engine=names[0])
+        return [(name, by_name[name]) for name in names]
+
+    def record(
+        self,
+        key: str,
+        engine: str,
+        seconds: float,
+        pages: int = 0,
+        chars: int = 0,
+        error: bool = False,
+    ) -> None:
+        """Enregistre un essai de moteur (écrit sur disque au plus toutes les quelques secondes)."""
+        if not self.enabled:
+            return
+        entry = EngineRecord(1, int(error), int(chars > MIN_TEXT_CHARS), seconds, pages, chars)
+        with self._lock:
+            self._pending.setdefault(key, {}).setdefault(engine, EngineRecord()).add(entry)
+            if time.monotonic() - self._last_save >= _SAVE_INTERVAL_S:
+                self._save_locked()
+
+    def _save_locked(self) -> None:
+        self._last_save = time.monotonic()
+        if not self._pending:
+            return
+        # Relit le fichier pour ne pas écraser les essais d'autres processus
+        stats = _read_stats(self.path)
+        _merge_into(stats, self._pending)
+        try:
+            _write_stats(self.path, stats)
+        except OSError:
+            return
+        self._base, self._pending = stats, {}
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def inspect(self, engines: Sequence[str]) -> dict:
+        """Statistiques par producteur et ordre d'essai actuel de chaque producteur."""
+        with self._lock:
+            stats = self._stats()
+        producers = {}
+        for key in sorted(stats):
+            ranked, unknown = self._ranked(key, list(engines), stats)
+            producers[key] = {
+                "order": (unknown[:1] + ranked + unknown[1:]) if unknown else ranked,
+                "engines": {name: record.summary() for name, record in stats[key].items()},
+            }
+        return {"path": str(self.path), "enabled": self.enabled, "producers": producers}
+
+    def reset(self, key: Optional[str] = None) -> int:
+        """Efface les statistiques (d'un producteur, ou toutes) ; renvoie le nombre de producteurs effacés."""
+        with self._lock:
+            stats = _read_stats(self.path)
+            _merge_into(stats, self._pending)
+            removed = [k for k in stats if key is None or k == key]
+            for k in removed:
+                del stats[k]
+            self._pending = {}
+            self._documents.clear()
+            try:
+                if stats:
+                    _write_stats(self.path, stats)
+                else:
+                    self.path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            self._base = stats
+            return len(removed)
+
+
+SELECTOR = EngineSelector(PDF_ENGINE_STATS_PATH, enabled=PDF_ENGINE_ADAPTIVE)
+atexit.register(SELECTOR.save)
+
+
+def _print_report(report: dict) -> None:
+    lines = [f"Statistiques : {report['path']}" + ("" if report["enabled"] else " (ordre adaptatif désactivé)")]
+    if not report["producers"]:
+        lines.append("  (aucune)")
+    for key, entry in report["producers"].items():
+        lines.append(f"{key} -> {' > '.join(entry['order'])}")
+        for name, s in sorted(entry["engines"].items()):
+            lines.append(
+                f"  {name:<11} {s['runs']:>5} essai(s)  suffisant {s['sufficient_rate']:>6.1%}  "
+                f"{s['seconds_per_page'] * 1000:>8.2f} ms/page  {s['mean_chars']:>8} car.  {s['errors']} erreur(s)"
+            )
+    print("\n".join(lines), file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from utils import PDF_ENGINES
+
+    parser = argparse.ArgumentParser(prog="python -m pdf_engines", description=__doc__.splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    parser.add_argument(
+        "--reset", nargs="?", const="", default=None, metavar="PRODUCTEUR",
+        help="Efface les statistiques (toutes, ou celles d'un producteur)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.reset is not None:
+        removed = SELECTOR.reset(args.reset or None)
+        print(f"{removed} producteur(s) effacé(s)", file=sys.stderr)
+        return 0
+    report = SELECTOR.inspect([name for name, _ in PDF_ENGINES])
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Profilage à la demande du chemin d'analyse.
+
+Deux modes sont disponibles :
+- "sample" : échantillonneur statistique maison (thread qui relève la pile
+  du thread profilé à intervalle régulier) ; écrit un fichier `.folded`
+  au format « collapsed stacks », lisible par flamegraph.pl ou speedscope ;
+- "cprofile" : profilage déterministe via cProfile ; écrit un fichier
+  `.prof` (pstats) lisible par snakeviz ou flameprof.
+
+Chaque profil est accompagné d'un fichier `.json` listant les empreintes
+SHA-256 des documents analysés. Rien n'est instrumenté lorsque le mode
+n'est pas demandé.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import datetime as dt
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from config import PROFILE_DIR, PROFILE_INTERVAL_S, PROFILE_MODE, PROFILE_TOKEN
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Vérifie le jeton de profilage (toujours refusé si aucun jeton n'est configuré)."""
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Échantillonne la pile d'un thread et agrège les piles repliées."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ao-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        lines = (f"{stack} {n}" for stack, n in self.stacks.most_common())
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def files_digest(files_data: Sequence[Tuple[str, bytes]]) -> List[dict]:
+    """Empreintes SHA-256 des documents analysés."""
+    return [{"name": name, "sha256": hashlib.sha256(raw).hexdigest(), "bytes": len(raw)} for name, raw in files_data]
+
+
+@contextmanager
+def profiled(files_data: Sequence[Tuple[str, bytes]], source: str, mode: Optional[str] = None) -> Iterator[dict]:
+    """Profile le bloc de code et écrit le profil dans PROFILE_DIR.
+
+    Le dictionnaire renvoyé est complété en sortie avec le chemin du profil.
+    """
+    mode = mode or PROFILE_MODE
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Mode de profilage inconnu : {mode}")
+
+    digests = files_digest(files_data)
+    combined = hashlib.sha256("".join(d["sha256"] for d in digests).encode("ascii")).hexdigest()
+    stem = f"{dt.datetime.now().strftime('%Y%m%d_%H%M%S')}_{source}_{combined[:12]}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    info = {"mode": mode, "source": source, "files": digests}
+
+    sampler: Optional[SamplingProfiler] = None
+    profiler: Optional[cProfile.Profile] = None
+    if mode == "sample":
+        sampler = SamplingProfiler(threading.get_ident())
+        sampler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info["elapsed_s"] = round(time.perf_counter() - start, 6)
+        if sampler is not None:
+            sampler.stop()
+            path = PROFILE_DIR / f"{stem}.folded"
+            sampler.write(path)
+            info["samples"] = sampler.samples
+        else:
+            profiler.disable()
+            path = PROFILE_DIR / f"{stem}.prof"
+            profiler.dump_stats(str(path))
+        info["profile"] = str(path)
+        (PROFILE_DIR / f"{stem}.json").write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
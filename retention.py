@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Rétention des dossiers assemblés (OUTPUT_ROOT) et des fichiers temporaires.
+
+Usage :
+    python -m retention [--apply] [--json]
+
+Deux réservoirs, chacun avec un âge maximum et un quota :
+
+- `output` : les dossiers `OUTPUT_ROOT/<ao>_<AAAAMMJJ_HHMMSS>_<jeton>` ; le dernier
+  dossier de chaque AO (d'après `meta.json`) est toujours conservé ;
+- `temp` : les pièces choisies à la main dans `temp_uploads/` et les envois
+  par morceaux (`/uploads`).
+
+Tout élément utilisé depuis moins de `AO_RETENTION_GRACE_S` est conservé
+(assemblage ou envoi en cours). Au-delà de l'âge maximum, l'élément est
+supprimé ; puis, tant que le quota est dépassé, les éléments sont supprimés
+du moins récemment utilisé (« lru ») ou du plus ancien (« age »).
+
+Sans `--apply`, rien n'est supprimé : le rapport indique ce qui le serait.
+Le même nettoyage tourne en tâche de fond dans l'API et l'application
+Streamlit toutes les `AO_RETENTION_INTERVAL_S` secondes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import (
+    OUTPUT_ROOT,
+    RETENTION_GRACE_S,
+    RETENTION_INTERVAL_S,
+    RETENTION_OUTPUT_MAX_AGE_DAYS,
+    RETENTION_OUTPUT_MAX_MB,
+    RETENTION_POLICY,
+    RETENTION_TEMP_MAX_AGE_DAYS,
+    RETENTION_TEMP_MAX_MB,
+    TEMP_UPLOAD_DIR,
+    UPLOAD_DIR,
+)
+from metrics import count
+
+_DOSSIER_FOLDER = re.compile(r"^(.+)_(\d{8}_\d{6})(?:_[0-9a-f]{32})?$")
+
+_janitor: Optional[threading.Thread] = None
+
+
+@dataclass
+class RetentionItem:
+    """Dossier ou fichier soumis à la rétention, et la décision prise."""
+
+    path: Path
+    pool: str  # "output" ou "temp"
+    kind: str  # "dossier", "upload", "file" ou "dir"
+    bytes: int
+    created: float
+    last_used: float
+    ao_id: Optional[str] = None
+    action: str = "keep"  # "keep" ou "delete"
+    reason: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "path": str(self.path)}
+
+
+@dataclass
+class PoolLimits:
+    max_bytes: Optional[float]
+    max_age_s: Optional[float]
+
+
+@dataclass
+class RetentionReport:
+    """Décisions pour tous les éléments, et occupation des réservoirs avant/après."""
+
+    items: List[RetentionItem]
+    pools: Dict[str, dict] = field(default_factory=dict)
+    policy: str = RETENTION_POLICY
+    applied: bool = False
+
+    @property
+    def deleted(self) -> List[RetentionItem]:
+        return [item for item in self.items if item.action == "delete"]
+
+    def as_dict(self) -> dict:
+        return {
+            "policy": self.policy,
+            "applied": self.applied,
+            "pools": self.pools,
+            "items": [item.as_dict() for item in self.items],
+        }
+
+
+def mark_used(path: Path) -> None:
+    """Note l'utilisation d'un dossier (export, téléchargement) pour l'éviction LRU."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _disk_usage(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _last_modified(path: Path) -> float:
+    """Dernière modification d'un fichier ou du contenu d'un dossier."""
+    latest = path.stat().st_mtime
+    if path.is_dir():
+        for child in path.iterdir():
+            try:
+                latest = max(latest, child.stat().st_mtime)
+            except OSError:
+                continue
+    return latest
+
+
+def _dossier_item(entry: Path, match: re.Match) -> RetentionItem:
+    meta_path = entry / "meta.json"
+    # Sans meta.json lisible, l'AO est celui du nom du dossier : le dernier
+    # dossier de chaque AO reste protégé
+    ao_id = match.group(1)
+    created = entry.stat().st_mtime
+    if meta_path.is_file():
+        try:
+            ao_id = json.loads(meta_path.read_text(encoding="utf-8")).get("ao_id") or ao_id
+        except (OSError, ValueError):
+            pass
+        created = meta_path.stat().st_mtime
+    # Date d'utilisation : mtime du dossier, avancée par `mark_used` (l'atime
+    # d'un dossier est rafraîchie par le parcours de la rétention elle-même)
+    last_used = max(entry.stat().st_mtime, created)
+    return RetentionItem(entry, "output", "dossier", _disk_usage(entry), created, last_used, ao_id)
+
+
+def _scan_output(root: Path) -> List[RetentionItem]:
+    items = []
+    if not root.is_dir():
+        return items
+    for entry in root.iterdir():
+        match = _DOSSIER_FOLDER.match(entry.name)
+        if not match:
+            continue
+        try:
+            if entry.is_dir():
+                items.append(_dossier_item(entry, match))
+        except FileNotFoundError:
+            continue  # supprimé pendant le parcours
+    return items
+
+
+def _temp_item(entry: Path) -> RetentionItem:
+    stat = entry.stat()
+    is_file = entry.is_file()
+    # Pièce choisie à la main : son atime avance quand l'assemblage la copie
+    last_used = max(stat.st_mtime, stat.st_atime) if is_file else _last_modified(entry)
+    return RetentionItem(entry, "temp", "file" if is_file else "dir", _disk_usage(entry), stat.st_mtime, last_used)
+
+
+def _scan_temp(temp_root: Path, upload_root: Path) -> List[RetentionItem]:
+    items = []
+    if upload_root.is_dir():
+        for entry in upload_root.iterdir():
+            try:
+                if entry.is_dir():
+                    modified = _last_modified(entry)
+                    items.append(RetentionItem(entry, "temp", "upload", _disk_usage(entry), entry.stat().st_ctime, modified))
+            except FileNotFoundError:
+                continue  # envoi supprimé pendant le parcours (DELETE /uploads/{id})
+    if temp_root.is_dir():
+        for entry in temp_root.iterdir():
+            if entry == upload_root or entry in upload_root.parents:
+                continue
+            try:
+                items.append(_temp_item(entry))
+            except FileNotFoundError:
+                continue
+    return items
+
+
+def _decide(items: List[RetentionItem], limits: PoolLimits, policy: str, now: float) -> dict:
+    """Marque les éléments à supprimer dans un réservoir et renvoie son bilan."""
+    # Dernier dossier de chaque AO : jamais supprimé
+    latest: Dict[str, RetentionItem] = {}
+    for item in items:
+        if item.ao_id is not None and (item.ao_id not in latest or item.created > latest[item.ao_id].created):
+            latest[item.ao_id] = item
+    for item in latest.values():
+        item.reason = "latest_for_ao"
+    for item in items:
+        if item.reason is None and now - item.last_used < RETENTION_GRACE_S:
+            item.reason = "recent"
+
+    def age(item: RetentionItem) -> float:
+        return now - (item.created if policy == "age" else item.last_used)
+
+    evictable = [item for item in items if item.reason is None]
+    if limits.max_age_s is not None:
+        for item in evictable:
+            if age(item) > limits.max_age_s:
+                item.action, item.reason = "delete", "age"
+
+    before = sum(item.bytes for item in items)
+    remaining = sum(item.bytes for item in items if item.action == "keep")
+    if limits.max_bytes is not None and remaining > limits.max_bytes:
+        for item in sorted((i for i in evictable if i.action == "keep"), key=age, reverse=True):
+            if remaining <= limits.max_bytes:
+                break
+            item.action, item.reason = "delete", "quota"
+            remaining -= item.bytes
+    for item in items:
+        if item.action == "keep" and item.reason is None:
+            item.reason = "within_limits"
+    return {
+        "items": len(items),
+        "bytes_before": before,
+        "bytes_after": remaining,
+        "quota_bytes": limits.max_bytes,
+        "max_age_s": limits.max_age_s,
+        "over_quota": limits.max_bytes is not None and remaining > limits.max_bytes,
+    }
+
+
+def _limits(max_mb: Optional[float], max_age_days: Optional[float]) -> PoolLimits:
+    return PoolLimits(
+        max_mb * 1024 * 1024 if max_mb is not None else None,
+        max_age_days * 86400 if max_age_days is not None else None,
+    )
+
+
+def plan(
+    output_root: Path = OUTPUT_ROOT,
+    temp_root: Path = TEMP_UPLOAD_DIR,
+    upload_root: Path = UPLOAD_DIR,
+    policy: str = RETENTION_POLICY,
+    now: Optional[float] = None,
+) -> RetentionReport:
+    """Rapport de rétention (aucune suppression)."""
+    now = time.time() if now is None else now
+    pools = {
+        "output": (_scan_output(output_root), _limits(RETENTION_OUTPUT_MAX_MB, RETENTION_OUTPUT_MAX_AGE_DAYS)),
+        "temp": (_scan_temp(temp_root, upload_root), _limits(RETENTION_TEMP_MAX_MB, RETENTION_TEMP_MAX_AGE_DAYS)),
+    }
+    report = RetentionReport([], policy=policy)
+    for name, (items, limits) in pools.items():
+        report.pools[name] = _decide(items, limits, policy, now)
+        report.items.extend(sorted(items, key=lambda item: item.last_used))
+    return report
+
+
+def apply(report: RetentionReport) -> RetentionReport:
+    """Supprime les éléments marqués `delete` dans le rapport."""
+    for item in report.deleted:
+        try:
+            if item.path.is_dir():
+                shutil.rmtree(item.path)
+            else:
+                item.path.unlink(missing_ok=True)
+        except OSError:
+            count("retention_errors", pool=item.pool)
+            item.action, item.reason = "keep", "delete_failed"
+            continue
+        count("retention_deleted", pool=item.pool, reason=item.reason)
+        count("retention_freed_bytes", item.bytes, pool=item.pool)
+    report.applied = True
+    return report
+
+
+def run(dry_run: bool = True) -> RetentionReport:
+    report = plan()
+    return report if dry_run else apply(report)
+
+
+def _loop(interval: float) -> None:
+    while True:
+        try:
+            run(dry_run=False)
+        except Exception:
+            count("retention_errors", pool="all")
+        time.sleep(interval)
+
+
+def start_janitor(interval: float = RETENTION_INTERVAL_S) -> bool:
+    """Lance le nettoyage périodique en tâche de fond (une fois par processus ; 0 = désactivé)."""
+    global _janitor
+    if interval <= 0 or (_janitor is not None and _janitor.is_alive()):
+        return False
+    _janitor = threading.Thread(target=_loop, args=(interval,), name="ao-retention", daemon=True)
+    _janitor.start()
+    return True
+
+
+def _print_report(report: RetentionReport) -> None:
+    verb = "supprimé(s)" if report.applied else "à supprimer"
+    lines = []
+    for name, pool in report.pools.items():
+        lines.append(
+            f"{name:<7} : {pool['items']} élément(s), {pool['bytes_before'] / 1e6:.1f} Mo -> "
+            f"{pool['bytes_after'] / 1e6:.1f} Mo" + (" (quota toujours dépassé)" if pool["over_quota"] else "")
+        )
+    for item in report.items:
+        marker = "-" if item.action == "delete" else " "
+        lines.append(f"  {marker} [{item.reason}] {item.path} ({item.bytes / 1e6:.1f} Mo)")
+    lines.append(f"{len(report.deleted)} élément(s) {verb} (politique {report.policy})")
+    print("\n".join(lines), file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m retention", description=__doc__.splitlines()[0])
+    parser.add_argument("--apply", action="store_true", help="Supprime réellement (sinon : rapport seul)")
+    parser.add_argument("--json", action="store_true", help="Rapport JSON sur la sortie standard")
+    parser.add_argument("--policy", choices=("lru", "age"), default=RETENTION_POLICY, help="Ordre d'éviction")
+    args = parser.parse_args(argv)
+
+    report = plan(policy=args.policy)
+    if args.apply:
+        apply(report)
+    if args.json:
+        print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
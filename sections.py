@@ -0,0 +1,193 @@
+"""Découpage des documents AO en arbre de sections.
+
+Les intitulés (Partie / Titre, Chapitre, Article, numérotation 1, 1.2, 1.2.3)
+sont repérés une seule fois par document ; chaque section connaît sa page
+(sauts de page `\\f` insérés à l'extraction des PDF), son parent et ses
+sous-sections. Les extracteurs interrogent ensuite une section précise,
+par intitulé ou par position dans le texte, au lieu de relire tout le texte.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Pattern, Sequence, Tuple, Union
+
+PAGE_BREAK = "\f"
+
+# Rang des intitulés : plus petit = plus haut dans la hiérarchie
+_RANKS = {"partie": 1, "titre": 1, "chapitre": 2, "article": 3, "section": 3}
+
+_KEYWORD_HEADING = re.compile(
+    r"^(partie|titre|chapitre|article|section)\s+"
+    # Séparateur puis intitulé (pas de chiffre : « Article L. 2113-10 » est une référence),
+    # fin de ligne, ou intitulé en majuscule (« Article 5 du CCAG » n'est pas un intitulé)
+    r"(\d+(?:\.\d+)*|[ivxlc]+|premier|1er|unique)\b\s*(?:[-–—:.)]\s*(?!\d)(.*)|$|(?-i:(?=[A-ZÀ-Ý]))(.*))",
+    re.IGNORECASE,
+)
+_NUMBERED_HEADING = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})[.)]?\s+([A-ZÀ-Ý].{1,118})$")
+# Lignes de sommaire : « Article 3 – Objet ........ 4 »
+_TOC_LINE = re.compile(r"(?:\.{4,}|…{2,}|_{4,})\s*\d+\s*$")
+# « 10 Rue de la Paix 75002 Paris » : adresse, pas intitulé numéroté
+_POSTAL_CODE = re.compile(r"\b\d{5}\b")
+
+_ACCENTS = str.maketrans("àâäéèêëîïôöùûüç", "aaaeeeeiioouuuc")
+
+MAX_HEADING_LENGTH = 120
+
+
+def normalize_title(value: str) -> str:
+    return value.lower().translate(_ACCENTS)
+
+
+@dataclass
+class Section:
+    """Section d'un document : intitulé, rang, position dans le texte et page."""
+
+    title: str
+    kind: str
+    level: int
+    start: int
+    end: int
+    page: int
+    number: Optional[str] = None
+    document: Optional[str] = None
+    children: List["Section"] = field(default_factory=list)
+    parent: Optional["Section"] = field(default=None, repr=False)
+
+    @property
+    def path(self) -> List[str]:
+        """Intitulés des sections englobantes (document exclu), de la racine à celle-ci."""
+        titles = []
+        section: Optional[Section] = self
+        while section is not None and section.kind != "document":
+            titles.append(section.title)
+            section = section.parent
+        return titles[::-1]
+
+    def as_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "kind": self.kind,
+            "level": self.level,
+            "number": self.number,
+            "page": self.page,
+            "document": self.document,
+        }
+
+
+def _heading(line: str) -> Optional[Tuple[str, int, Optional[str]]]:
+    """(kind, rang, numéro) si la ligne est un intitulé de section."""
+    if not line or len(line) > MAX_HEADING_LENGTH or _TOC_LINE.search(line):
+        return None
+    match = _KEYWORD_HEADING.match(line)
+    if match:
+        kind = match.group(1).lower()
+        return kind, _RANKS[kind], match.group(2)
+    match = _NUMBERED_HEADING.match(line)
+    if match and not line.endswith((",", ";")) and not _POSTAL_CODE.search(line):
+        number = match.group(1)
+        # « 5 » a le rang d'un article, « 5.1 » celui d'une sous-section, etc.
+        return "numbered", _RANKS["article"] + number.count("."), number
+    return None
+
+
+class SectionTree:
+    """Arbre des sections d'un ou plusieurs documents concaténés."""
+
+    def __init__(self, text: str, documents: Sequence[Section]):
+        self.text = text
+        self.documents = list(documents)
+        self.sections: List[Section] = [s for doc in self.documents for s in _walk(doc)]
+        self._starts = [s.start for s in self.sections]
+        self._breaks = [m.start() for m in re.finditer(PAGE_BREAK, text)]
+
+    @classmethod
+    def build(cls, documents: Sequence[Tuple[str, str]], separator: str = "\n\n") -> "SectionTree":
+        """Segmente chaque document ; les positions sont celles de `separator.join(textes)`."""
+        roots = []
+        offset = 0
+        for name, text in documents:
+            roots.append(_segment(text, offset, name))
+            offset += len(text) + len(separator)
+        return cls(separator.join(text for _, text in documents), roots)
+
+    def __iter__(self) -> Iterator[Section]:
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def section_text(self, section: Section) -> str:
+        """Texte de la section, intitulé et sous-sections compris."""
+        return self.text[section.start:section.end]
+
+    def find(self, pattern: Union[str, Pattern]) -> List[Section]:
+        """Sections (hors racines de document) dont l'intitulé correspond à `pattern`.
+
+        Les intitulés sont comparés en minuscules et sans accents.
+        """
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        return [s for s in self.sections if s.kind != "document" and regex.search(normalize_title(s.title))]
+
+    def at(self, position: int) -> Optional[Section]:
+        """Section la plus profonde contenant la position `position` du texte."""
+        index = bisect_right(self._starts, position) - 1
+        if index < 0:
+            return None
+        section: Optional[Section] = self.sections[index]
+        while section is not None and not section.start <= position < section.end:
+            section = section.parent
+        return section
+
+    def page_at(self, position: int) -> int:
+        """Numéro de page (dans son document) de la position `position` du texte."""
+        section = self.at(position)
+        while section is not None and section.parent is not None:
+            section = section.parent
+        first = bisect_right(self._breaks, section.start) if section is not None else 0
+        return bisect_right(self._breaks, position) - first + 1
+
+    def outline(self, max_level: Optional[int] = None) -> List[dict]:
+        """Plan des intitulés (pour l'affichage), dans l'ordre des documents."""
+        return [
+            s.as_dict() for s in self.sections
+            if s.kind != "document" and (max_level is None or s.level <= max_level)
+        ]
+
+
+def _walk(section: Section) -> Iterator[Section]:
+    yield section
+    for child in section.children:
+        yield from _walk(child)
+
+
+def _segment(text: str, offset: int = 0, name: Optional[str] = None) -> Section:
+    root = Section(name or "", "document", 0, offset, offset + len(text), 1, document=name)
+    stack: List[Section] = [root]
+    page = 1
+    position = 0
+    for raw_line in text.split("\n"):
+        line_start = position
+        position += len(raw_line) + 1
+        line = raw_line.replace(PAGE_BREAK, "").strip()
+        heading = _heading(line) if line else None
+        if heading is not None:
+            kind, level, number = heading
+            while len(stack) > 1 and stack[-1].level >= level:
+                stack.pop().end = offset + line_start
+            parent = stack[-1]
+            section = Section(
+                line, kind, level, offset + line_start, root.end, page,
+                number=number, document=name, parent=parent,
+            )
+            parent.children.append(section)
+            stack.append(section)
+        page += raw_line.count(PAGE_BREAK)
+    return root
+
+
+def segment(text: str, name: Optional[str] = None) -> SectionTree:
+    """Arbre des sections d'un seul texte."""
+    return SectionTree(text, [_segment(text, 0, name)])
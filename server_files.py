@@ -0,0 +1,165 @@
+"""Lecture des DCE déjà présents sur le serveur (partage monté), sans envoi.
+
+`/analyze` accepte des chemins (fichiers ou dossiers) sous `AO_DCE_ROOTS`.
+Les fichiers sont ouverts sur place et projetés en mémoire (mmap) : les
+extracteurs de `utils` reçoivent une `memoryview` au lieu d'une copie, et
+seules les pages effectivement lues sont chargées depuis le disque.
+
+Un même fichier, quel que soit le chemin qui y mène (doublon dans la
+requête, lien symbolique ou physique), n'est ouvert et analysé qu'une fois :
+il est identifié par (périphérique, inode, date de modification, taille).
+Cette identité sert aussi d'empreinte pour le cache des résultats, sans
+lire le contenu ; un fichier modifié change d'identité.
+
+Un fichier tronqué sur place pendant sa lecture interromprait le processus
+(SIGBUS) : si le partage est réécrit en place, `AO_SERVER_FILES_MMAP=0`
+lit les fichiers en mémoire à la place.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from stat import S_ISREG
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+from analysis import SUPPORTED_EXTENSIONS
+from config import DCE_ROOTS, SERVER_FILES_MAX_OPEN, SERVER_FILES_MMAP, UPLOAD_MAX_FILE_BYTES
+from metrics import count
+
+Content = Union[bytes, memoryview]
+
+_mapped: "OrderedDict[FileIdentity, memoryview]" = OrderedDict()
+_lock = threading.Lock()
+
+
+class ServerFileError(Exception):
+    """Chemin refusé ou illisible, avec le code HTTP correspondant."""
+
+    def __init__(self, status_code: int, message: str, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+
+@dataclass(frozen=True)
+class FileIdentity:
+    """Identité d'un fichier sur disque : même fichier tant qu'elle ne change pas."""
+
+    device: int
+    inode: int
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def of(cls, st: os.stat_result) -> "FileIdentity":
+        return cls(st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def digest(self) -> bytes:
+        """Empreinte pour `coalesce.files_key`, distincte de toute empreinte de contenu."""
+        return hashlib.sha256(f"inode:{self.device}:{self.inode}:{self.mtime_ns}:{self.size}".encode()).digest()
+
+
+@dataclass
+class ServerFile:
+    name: str
+    path: Path
+    identity: FileIdentity
+    content: Content
+
+
+def is_allowed_dce_path(path: Path) -> bool:
+    """Indique si `path` (résolu) est sous l'un des partages autorisés (`AO_DCE_ROOTS`)."""
+    return any(path.is_relative_to(root) for root in DCE_ROOTS)
+
+
+def _expand(path: Path) -> List[Path]:
+    """Fichiers pris en charge d'un dossier (récursivement, triés), ou le fichier lui-même."""
+    if not path.is_dir():
+        return [path]
+    return sorted(p for p in path.rglob("*") if p.name.lower().endswith(SUPPORTED_EXTENSIONS) and p.is_file())
+
+
+def _content(f: BinaryIO, identity: FileIdentity) -> Content:
+    """Contenu du fichier ouvert : projection partagée entre requêtes, ou lecture en mémoire."""
+    if identity.size == 0:
+        return b""
+    if not SERVER_FILES_MMAP:
+        return f.read()
+    with _lock:
+        view = _mapped.get(identity)
+        if view is not None:
+            _mapped.move_to_end(identity)
+            count("server_files", result="reused")
+            return view
+    # La projection reste valide après la fermeture du fichier ; elle est libérée
+    # quand plus aucune analyse n'y fait référence.
+    view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    count("server_files", result="mapped")
+    with _lock:
+        view = _mapped.setdefault(identity, view)
+        while len(_mapped) > SERVER_FILES_MAX_OPEN:
+            _mapped.popitem(last=False)
+    return view
+
+
+def _open(path: Path, shown: str) -> Tuple[FileIdentity, BinaryIO]:
+    try:
+        f = path.open("rb")
+    except PermissionError:
+        raise ServerFileError(403, f"Fichier illisible par le serveur : {shown}") from None
+    except OSError:
+        raise ServerFileError(404, f"Fichier introuvable : {shown}") from None
+    st = os.fstat(f.fileno())
+    if not S_ISREG(st.st_mode):
+        f.close()
+        raise ServerFileError(404, f"Fichier introuvable : {shown}")
+    return FileIdentity.of(st), f
+
+
+def open_server_files(paths: Sequence[object]) -> List[ServerFile]:
+    """Ouvre les fichiers des chemins demandés, sans doublons, dans l'ordre de la requête."""
+    if not DCE_ROOTS:
+        raise ServerFileError(403, "Lecture de fichiers serveur désactivée (AO_DCE_ROOTS).")
+    files: List[ServerFile] = []
+    seen = set()
+    for requested in paths:
+        if not isinstance(requested, str) or not requested:
+            raise ServerFileError(422, "paths doit être une liste de chemins.")
+        if not is_allowed_dce_path(Path(requested).resolve()):
+            raise ServerFileError(403, f"Chemin non autorisé : {requested}")
+        for candidate in _expand(Path(requested)):
+            # Nom tel que demandé (celui d'un lien symbolique compris) ; cible vérifiée :
+            # un lien dans un dossier autorisé peut mener ailleurs
+            path = candidate.resolve()
+            if not is_allowed_dce_path(path):
+                raise ServerFileError(403, f"Chemin non autorisé : {candidate}")
+            if not candidate.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                raise ServerFileError(422, f"Type de fichier non pris en charge : {candidate.name}")
+            identity, f = _open(path, str(candidate))
+            with f:
+                if identity in seen:
+                    count("server_files", result="duplicate")
+                    continue
+                if identity.size > UPLOAD_MAX_FILE_BYTES:
+                    raise ServerFileError(413, f"Taille non autorisée : {candidate.name}")
+                seen.add(identity)
+                files.append(ServerFile(candidate.name, path, identity, _content(f, identity)))
+    return files
+
+
+def files_data_of(files: Sequence[ServerFile]) -> Tuple[List[Tuple[str, Content]], List[Optional[bytes]]]:
+    """(nom, contenu) pour l'analyse, et empreintes d'identité pour `coalesce.files_key`."""
+    return [(f.name, f.content) for f in files], [f.identity.digest() for f in files]
+
+
+def clear() -> None:
+    """Oublie les projections gardées ouvertes (elles se ferment une fois inutilisées)."""
+    with _lock:
+        _mapped.clear()
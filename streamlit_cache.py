@@ -0,0 +1,73 @@
+"""Cache des calculs coûteux de l'application Streamlit entre deux reruns.
+
+Streamlit réexécute tout le script à chaque interaction : le scan du
+dossier d'entreprise et la compression du dossier de soumission sont donc
+mis en cache ici, avec des fonctions d'invalidation explicites et un
+plafond mémoire global. Les textes extraits sont dans le cache du pipeline
+d'analyse (`analysis`), commun avec l'API.
+"""
+
+from pathlib import Path
+from typing import List, Optional
+
+import streamlit as st
+
+import analysis
+from coalesce import BoundedCache
+from config import STREAMLIT_CACHE_MAX_ENTRIES, STREAMLIT_CACHE_MAX_MB
+from metrics import count
+from utils import FileEntry, folder_fingerprint, scan_folder, zip_dir
+
+SCAN_TOKEN_KEY = "company_scan_token"
+
+
+@st.cache_resource
+def _store() -> BoundedCache:
+    """Cache partagé par toutes les sessions (archives ZIP)."""
+    return BoundedCache(STREAMLIT_CACHE_MAX_MB * 1024 * 1024)
+
+
+@st.cache_data(max_entries=STREAMLIT_CACHE_MAX_ENTRIES, show_spinner=False)
+def _scan_company_folder(root: str, refresh_token: int) -> List[FileEntry]:
+    return scan_folder(Path(root))
+
+
+def company_files(root: str) -> List[FileEntry]:
+    """Scan du dossier d'entreprise, mis en cache par racine et jeton de rafraîchissement."""
+    return _scan_company_folder(root, st.session_state.get(SCAN_TOKEN_KEY, 0))
+
+
+def submission_zip(folder: Path) -> bytes:
+    """Archive ZIP d'un dossier, mise en cache par empreinte de son contenu."""
+    key = ("zip", str(folder), folder_fingerprint(folder))
+    store = _store()
+    data = store.get(key)
+    count("cache_requests", cache="zip", result="miss" if data is None else "hit")
+    if data is None:
+        data = zip_dir(folder)
+        store.put(key, data, len(data))
+    return data
+
+
+def invalidate_company_scan() -> None:
+    """Force un nouveau scan du dossier d'entreprise au prochain rerun de la session."""
+    st.session_state[SCAN_TOKEN_KEY] = st.session_state.get(SCAN_TOKEN_KEY, 0) + 1
+
+
+def invalidate_extractions() -> None:
+    """Oublie tous les textes extraits."""
+    analysis.clear_cache()
+
+
+def invalidate_zip(folder: Optional[Path] = None) -> int:
+    """Oublie les archives ZIP d'un dossier (ou de tous les dossiers)."""
+    target = str(folder) if folder is not None else None
+    return _store().invalidate(lambda key: key[0] == "zip" and (target is None or key[1] == target))
+
+
+def clear_all() -> None:
+    """Vide l'ensemble des caches de l'application."""
+    _store().clear()
+    analysis.clear_cache()
+    _scan_company_folder.clear()
+    invalidate_company_scan()
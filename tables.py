@@ -0,0 +1,323 @@
+"""Extraction des lignes des bordereaux de prix (BPU) et détails quantitatifs (DQE).
+
+Les tableaux des pièces PDF classées BPU ou DQE par le triage sont lus avec
+le détecteur de tableaux de PyMuPDF (`Page.find_tables`), par tranches de
+pages réparties sur un pool de processus pour les longs bordereaux. Les
+colonnes sont reconnues d'après leur en-tête (numéro, désignation, unité,
+quantité) ; un tableau sans en-tête qui prolonge celui de la page
+précédente reprend ses colonnes. Sous un budget, plus aucune tranche n'est
+lancée une fois son temps écoulé : le tableau est alors tronqué (`time`).
+
+pdfplumber n'est gardé que comme référence pour les benchmarks
+(`engine="pdfplumber"`), beaucoup plus lent sur les bordereaux de 100 pages.
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import hashlib
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from budgets import Budget
+from coalesce import BoundedCache
+from config import DOC_MAX_SECONDS, TABLE_CACHE_MAX_MB, TABLE_MAX_PAGES, TABLE_PAGES_PER_TASK, TABLE_WORKERS
+from memory import low_memory
+from metrics import count
+
+PRICE_DOC_TYPES = ("BPU", "DQE")
+CSV_NAME = "bordereaux.csv"
+CSV_FIELDS = ("source", "type", "page", "item", "designation", "unit", "quantity")
+
+# Page -> tableaux -> lignes -> cellules
+PageTables = Tuple[int, List[List[List[Optional[str]]]]]
+
+_ACCENTS = str.maketrans("àâäéèêëîïôöùûüç", "aaaeeeeiioouuuc")
+
+# Colonnes reconnues dans l'en-tête, dans l'ordre où elles sont cherchées
+_HEADER_PATTERNS = [
+    ("quantity", re.compile(r"^(?:quantite|qte|qt[ée]?s?\b|quant)")),
+    ("unit", re.compile(r"^(?:u|u\.|un|unite|unites)$|^unite\b")),
+    ("designation", re.compile(r"^(?:designation|libelle|description|intitule|nature\b|prestations?$|ouvrages?$)")),
+    ("item", re.compile(r"^(?:n[°o]|num|art|ref|code|poste|item|prix\s*n)")),
+]
+_SUBTOTAL = re.compile(r"^(?:sous[- ]?total|total|montant)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"^-?\d{1,3}(?:[ \u00a0\u202f]?\d{3})*(?:[.,]\d+)?$|^-?\d+(?:[.,]\d+)?$")
+
+_cache = BoundedCache(TABLE_CACHE_MAX_MB * 1024 * 1024)
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class PriceRow:
+    """Ligne d'un bordereau : numéro de prix, désignation, unité et quantité (DQE)."""
+
+    page: int
+    item: str
+    designation: str
+    unit: str
+    quantity: Optional[float]
+
+
+@dataclass
+class PriceTable:
+    """Lignes extraites d'une pièce BPU ou DQE."""
+
+    name: str
+    doc_type: str
+    pages: int
+    rows: List[PriceRow] = field(default_factory=list)
+    truncated: bool = False
+    reason: Optional[str] = None  # "pages" (AO_TABLE_MAX_PAGES) ou "time" (budget)
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "type": self.doc_type,
+            "pages": self.pages,
+            "truncated": self.truncated,
+            "reason": self.reason,
+            "rows": [asdict(row) for row in self.rows],
+        }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # « spawn » : l'API est multithread, un fork pourrait hériter d'un verrou tenu
+        _pool = ProcessPoolExecutor(max_workers=TABLE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _clean(cell: Optional[str]) -> str:
+    return " ".join((cell or "").split())
+
+
+def _fill_cells(table, words: Sequence[tuple]) -> List[List[Optional[str]]]:
+    """Texte des cellules d'un tableau PyMuPDF, d'après les mots de la page.
+
+    Chaque mot va à la cellule qui contient son centre (ligne trouvée par
+    dichotomie) : bien moins coûteux que `Table.extract`, qui teste chaque
+    caractère contre chaque cellule.
+    """
+    rows = table.rows
+    tops = [row.bbox[1] for row in rows]
+    cells: List[List[Optional[str]]] = [[None] * len(row.cells) for row in rows]
+    for x0, y0, x1, y1, word, *_ in words:
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        r = bisect.bisect_right(tops, cy) - 1
+        if r < 0 or cy > rows[r].bbox[3]:
+            continue
+        for c, bbox in enumerate(rows[r].cells):
+            if bbox is not None and bbox[0] <= cx <= bbox[2]:
+                cells[r][c] = f"{cells[r][c]} {word}" if cells[r][c] else word
+                break
+    return cells
+
+
+def _fitz_tables(raw: bytes, start: int, stop: int) -> List[PageTables]:
+    """Tableaux des pages [start, stop) avec PyMuPDF (exécuté dans un processus du pool)."""
+    import fitz
+
+    doc = fitz.open(stream=raw, filetype="pdf")
+    try:
+        pages = []
+        for number in range(start, stop):
+            page = doc[number]
+            if not page.get_cdrawings():
+                # Aucun trait : pas de tableau quadrillé, inutile de lancer le détecteur
+                pages.append((number + 1, []))
+                continue
+            words = page.get_text("words")
+            pages.append((number + 1, [_fill_cells(table, words) for table in page.find_tables().tables]))
+        return pages
+    finally:
+        doc.close()
+
+
+def _pdfplumber_tables(raw: bytes, start: int, stop: int) -> List[PageTables]:
+    import io
+
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(raw)) as pdf:
+        return [(number + 1, pdf.pages[number].extract_tables()) for number in range(start, stop)]
+
+
+def _page_count(raw: bytes, engine: str) -> int:
+    if engine == "pdfplumber":
+        import io
+
+        import pdfplumber
+
+        with pdfplumber.open(io.BytesIO(raw)) as pdf:
+            return len(pdf.pages)
+    import fitz
+
+    with fitz.open(stream=raw, filetype="pdf") as doc:
+        return doc.page_count
+
+
+_ENGINES = {"fitz": _fitz_tables, "pdfplumber": _pdfplumber_tables}
+
+
+def _header_columns(cells: Sequence[str]) -> Optional[Dict[str, int]]:
+    """Colonnes (champ -> indice) si la ligne est un en-tête de bordereau."""
+    columns: Dict[str, int] = {}
+    for index, cell in enumerate(cells):
+        normalized = cell.lower().translate(_ACCENTS).strip(" :")
+        for name, pattern in _HEADER_PATTERNS:
+            if name not in columns and pattern.search(normalized):
+                columns[name] = index
+                break
+    return columns if "designation" in columns and len(columns) >= 2 else None
+
+
+def _cell(cells: Sequence[str], columns: Dict[str, int], name: str) -> str:
+    index = columns.get(name)
+    return cells[index] if index is not None and index < len(cells) else ""
+
+
+def parse_quantity(value: str) -> Optional[float]:
+    """Nombre au format français (« 1 234,50 ») ; None pour « PM », « ens », cellule vide..."""
+    value = value.strip()
+    if not _NUMBER.match(value):
+        return None
+    return float(re.sub(r"[ \u00a0\u202f]", "", value).replace(",", "."))
+
+
+def rows_from_tables(pages: Sequence[PageTables]) -> List[PriceRow]:
+    """Lignes de prix des tableaux bruts, page par page (en-têtes repris d'une page à l'autre)."""
+    rows: List[PriceRow] = []
+    columns: Optional[Dict[str, int]] = None
+    width = 0
+    for page, tables in pages:
+        for table in tables:
+            cleaned = [[_clean(cell) for cell in row] for row in table]
+            if not cleaned:
+                continue
+            header_at = next((i for i, row in enumerate(cleaned[:5]) if _header_columns(row)), None)
+            if header_at is not None:
+                columns, width = _header_columns(cleaned[header_at]), len(cleaned[header_at])
+                body = cleaned[header_at + 1:]
+            elif columns is not None and len(cleaned[0]) == width:
+                body = cleaned  # suite du tableau de la page précédente
+            else:
+                continue
+            for cells in body:
+                item, designation = _cell(cells, columns, "item"), _cell(cells, columns, "designation")
+                if not (item or designation) or _SUBTOTAL.match(designation or item) or _header_columns(cells):
+                    continue
+                quantity = parse_quantity(_cell(cells, columns, "quantity"))
+                rows.append(PriceRow(page, item, designation, _cell(cells, columns, "unit"), quantity))
+    return rows
+
+
+def extract_price_table(
+    name: str,
+    raw: bytes,
+    doc_type: str,
+    engine: str = "fitz",
+    parallel: bool = True,
+    budget: Optional[Budget] = None,
+) -> PriceTable:
+    """Lignes de prix d'un PDF (au plus `AO_TABLE_MAX_PAGES` pages).
+
+    Avec `parallel`, les pages sont réparties par tranches de
+    `AO_TABLE_PAGES_PER_TASK` sur le pool de processus (sauf en mode économe
+    en mémoire et pour les pièces courtes), `AO_TABLE_WORKERS` tranches au
+    plus en cours. Le budget est vérifié avant chaque tranche ; un tableau
+    tronqué faute de temps n'est pas mis en cache.
+    """
+    key = (hashlib.sha256(raw).hexdigest(), engine)
+    cached = _cache.get(key)
+    if cached is not None:
+        count("cache_requests", cache="tables", result="hit")
+        return PriceTable(name, doc_type, cached.pages, cached.rows, cached.truncated, cached.reason)
+    count("cache_requests", cache="tables", result="miss")
+
+    extract = _ENGINES[engine]
+    total = _page_count(raw, engine)
+    pages = min(total, int(TABLE_MAX_PAGES)) if TABLE_MAX_PAGES else total
+    step = max(1, TABLE_PAGES_PER_TASK)
+    ranges = [(start, min(start + step, pages)) for start in range(0, pages, step)]
+    results: List[List[PageTables]] = []
+    if parallel and TABLE_WORKERS > 1 and len(ranges) > 1 and not low_memory():
+        pool = _get_pool()
+        if not isinstance(raw, bytes):
+            raw = bytes(raw)  # fichier projeté en mémoire (server_files) : non transmissible au pool
+        futures = []
+        for index in range(len(ranges)):
+            while len(futures) < min(index + TABLE_WORKERS, len(ranges)):
+                if budget is not None and not budget.check():
+                    break
+                futures.append(pool.submit(extract, raw, *ranges[len(futures)]))
+            if index >= len(futures):
+                break
+            try:
+                results.append(futures[index].result(timeout=budget.remaining_seconds() if budget else None))
+            except FutureTimeout:
+                budget.exhaust("time")
+                break
+        for future in futures[len(results):]:
+            future.cancel()
+    else:
+        for start, stop in ranges:
+            if budget is not None and not budget.check():
+                break
+            results.append(extract(raw, start, stop))
+
+    read = ranges[len(results) - 1][1] if results else 0
+    reason = budget.reason if len(results) < len(ranges) else "pages" if pages < total else None
+    page_tables = [page for pages_read in results for page in pages_read]
+    table = PriceTable(name, doc_type, read, rows_from_tables(page_tables), reason is not None, reason)
+    count("price_rows", len(table.rows), type=doc_type)
+    if reason != "time":
+        _cache.put(key, table, sum(len(row.designation) + 100 for row in table.rows) + 200)
+    return table
+
+
+def price_tables(
+    files_data: Sequence[Tuple[str, bytes]],
+    doc_types: Sequence[str],
+    budget: Optional[Budget] = None,
+) -> List[PriceTable]:
+    """Tableaux des pièces PDF classées BPU ou DQE (les autres sont ignorées).
+
+    Chaque pièce a son budget de document, limité au temps : les pages et
+    octets du budget de la requête comptent le texte extrait, pas les tableaux.
+    """
+    tables = []
+    for (name, raw), doc_type in zip(files_data, doc_types):
+        if doc_type not in PRICE_DOC_TYPES or not name.lower().endswith(".pdf"):
+            continue
+        doc_budget = Budget(DOC_MAX_SECONDS, deadline=budget.deadline) if budget is not None else None
+        try:
+            tables.append(extract_price_table(name, raw, doc_type, budget=doc_budget))
+        except Exception:
+            count("price_table_errors", type=doc_type)
+    return tables
+
+
+def write_price_csv(tables: Sequence[PriceTable], target_dir: Path) -> Optional[Path]:
+    """Écrit toutes les lignes dans `bordereaux.csv` (rien si aucune ligne)."""
+    if not any(table.rows for table in tables):
+        return None
+    target = target_dir / CSV_NAME
+    with target.open("w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(CSV_FIELDS)
+        for table in tables:
+            for row in table.rows:
+                quantity = "" if row.quantity is None else f"{row.quantity:g}".replace(".", ",")
+                writer.writerow([table.name, table.doc_type, row.page, row.item, row.designation, row.unit, quantity])
+    return target
+
+
+def clear_cache() -> None:
+    _cache.clear()
@@ -0,0 +1,39 @@
+"""Fusion des résultats partiels : mêmes métadonnées que l'analyse du texte concaténé."""
+
+import pytest
+
+from partials import analyze_text, merge_partials
+from utils import extract_email
+
+CCTP = "CCTP\n\nARTICLE 1 - Support\ncontact : support@editeur.fr\n"
+RC = (
+    "Règlement de la consultation\n\n"
+    "ARTICLE 1 - Objet\nFourniture de matériel.\n\n"
+    "ARTICLE 2 - Conditions d'envoi ou de remise des plis\n"
+    "Les offres sont transmises à l'adresse email : marches@ville.fr\n"
+)
+RC_AVENANT = (
+    "Avenant au règlement\n\n"
+    "ARTICLE 1 - Conditions d'envoi ou de remise des plis\n"
+    "Nouvelle adresse, contact : depot@ville.fr\n"
+)
+
+
+def _merged_email(documents):
+    return merge_partials([analyze_text(name, text) for name, text in documents]).email()
+
+
+@pytest.mark.parametrize(
+    "documents, expected",
+    [
+        # La section de remise des plis l'emporte sur une ligne « contact » d'une autre pièce
+        ([("CCTP.txt", CCTP), ("RC.txt", RC)], "marches@ville.fr"),
+        ([("RC.txt", RC), ("CCTP.txt", CCTP)], "marches@ville.fr"),
+        # Deux sections de remise des plis : la dernière du dossier l'emporte
+        ([("RC.txt", RC), ("Avenant.txt", RC_AVENANT)], "depot@ville.fr"),
+        ([("Avenant.txt", RC_AVENANT), ("RC.txt", RC)], "marches@ville.fr"),
+    ],
+)
+def test_email_priority_across_files(documents, expected):
+    assert _merged_email(documents) == expected
+    assert extract_email("\n".join(text for _, text in documents)) == expected
@@ -0,0 +1,90 @@
+"""Rétention : choix des éléments supprimés (`_decide`) et parcours des dossiers."""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+import retention
+from retention import PoolLimits, RetentionItem, _decide, _scan_output, _scan_temp
+
+NOW = 1_000_000_000.0
+DAY = 86400.0
+
+
+def _item(name, created_days, used_days, size=100, ao_id=None):
+    return RetentionItem(
+        Path(name), "output", "dossier", size, NOW - created_days * DAY, NOW - used_days * DAY, ao_id,
+    )
+
+
+def _deleted(items):
+    return sorted(item.path.name for item in items if item.action == "delete")
+
+
+def test_latest_dossier_of_each_ao_is_kept():
+    items = [
+        _item("a_old", 30, 30, ao_id="A"),
+        _item("a_new", 20, 20, ao_id="A"),
+        _item("b_only", 40, 40, ao_id="B"),
+    ]
+    _decide(items, PoolLimits(max_bytes=0, max_age_s=DAY), "lru", NOW)
+    assert _deleted(items) == ["a_old"]
+    assert {item.path.name: item.reason for item in items}["a_new"] == "latest_for_ao"
+
+
+def test_recently_used_items_are_kept_past_age_and_quota():
+    items = [_item("recent", 30, 0), _item("stale", 30, 30)]
+    _decide(items, PoolLimits(max_bytes=0, max_age_s=DAY), "lru", NOW)
+    assert _deleted(items) == ["stale"]
+    assert items[0].reason == "recent"
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        # LRU : le moins récemment utilisé part d'abord, même créé après l'autre
+        ("lru", ["used_long_ago"]),
+        # Âge : le plus ancien part d'abord, même utilisé récemment
+        ("age", ["created_long_ago"]),
+    ],
+)
+def test_quota_eviction_order(policy, expected):
+    items = [_item("created_long_ago", 50, 2), _item("used_long_ago", 10, 5), _item("fresh", 3, 3)]
+    summary = _decide(items, PoolLimits(max_bytes=200, max_age_s=None), policy, NOW)
+    assert _deleted(items) == expected
+    assert summary["bytes_after"] == 200 and not summary["over_quota"]
+
+
+def test_dossier_without_meta_uses_folder_name_as_ao_id(tmp_path):
+    for days, name in ((60, "ao-1_20260101_120000"), (30, "ao-1_20260201_120000")):
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (NOW - days * DAY, NOW - days * DAY))
+    items = _scan_output(tmp_path)
+    assert {item.ao_id for item in items} == {"ao-1"}
+    _decide(items, PoolLimits(max_bytes=0, max_age_s=0), "lru", NOW)
+    assert _deleted(items) == ["ao-1_20260101_120000"]
+
+
+def test_meta_ao_id_takes_precedence(tmp_path):
+    folder = tmp_path / ("ao-1_20260101_120000_" + "0" * 32)
+    folder.mkdir()
+    (folder / "meta.json").write_text(json.dumps({"ao_id": "AO 1"}), encoding="utf-8")
+    assert [item.ao_id for item in _scan_output(tmp_path)] == ["AO 1"]
+
+
+def test_entries_vanishing_during_scan_are_skipped(tmp_path, monkeypatch):
+    uploads = tmp_path / "chunked"
+    for name in ("gone", "kept"):
+        (uploads / name).mkdir(parents=True)
+    last_modified = retention._last_modified
+
+    def vanishing(path):
+        # Envoi supprimé (DELETE /uploads/{id}) entre la liste et la lecture
+        if path.name == "gone":
+            raise FileNotFoundError(path)
+        return last_modified(path)
+
+    monkeypatch.setattr(retention, "_last_modified", vanishing)
+    assert [item.path.name for item in _scan_temp(tmp_path, uploads)] == ["kept"]
@@ -0,0 +1,99 @@
+"""Triage des pièces d'un DCE avant extraction.
+
+Chaque fichier est classé (RC, CCAP, CCTP, BPU, DQE, AE ou autre) d'après
+son nom, puis, si le nom ne suffit pas, d'après un échantillon de sa
+première page. Seules les pièces utiles aux extracteurs de métadonnées et
+aux règles sont extraites en entier ; les autres ne sont qu'échantillonnées
+(premières pages, qui contiennent en général le sommaire).
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from config import TRIAGE_ENABLED
+
+DOC_TYPES = ("RC", "CCAP", "CCTP", "BPU", "DQE", "AE", "AUTRE")
+
+# Pièces dont dépendent les métadonnées (acheteur, email, date limite) et les règles
+FULL_EXTRACTION_TYPES = {"RC", "AE", "CCAP", "AUTRE"}
+
+_SEP = r"(?:^|[^a-z0-9])"
+_END = r"(?:[^a-z0-9]|$)"
+
+_FILENAME_PATTERNS = [
+    ("RC", re.compile(_SEP + r"(?:rc|reglement[^a-z]*(?:de[^a-z]*)?(?:la[^a-z]*)?consultation)" + _END)),
+    ("CCAP", re.compile(_SEP + r"(?:ccap|clauses[^a-z]*administratives)" + _END)),
+    ("CCTP", re.compile(_SEP + r"(?:cctp|clauses[^a-z]*techniques)" + _END)),
+    ("BPU", re.compile(_SEP + r"(?:bpu|bordereau[^a-z]*(?:des[^a-z]*)?prix)" + _END)),
+    ("DQE", re.compile(_SEP + r"(?:dqe|detail[^a-z]*quantitatif)" + _END)),
+    ("AE", re.compile(_SEP + r"(?:ae|acte[^a-z]*(?:d[^a-z]*)?engagement|attri1?)" + _END)),
+]
+
+_CONTENT_PATTERNS = [
+    ("RC", re.compile(r"r[eè]glement\s+(?:de\s+(?:la\s+)?)?consultation")),
+    ("CCAP", re.compile(r"cahier\s+des\s+clauses\s+administratives")),
+    ("CCTP", re.compile(r"cahier\s+des\s+clauses\s+techniques")),
+    ("BPU", re.compile(r"bordereau\s+des\s+prix")),
+    ("DQE", re.compile(r"d[ée]tail\s+quantitatif")),
+    ("AE", re.compile(r"acte\s+d.?\s*engagement")),
+]
+
+_ACCENTS = str.maketrans("àâäéèêëîïôöùûüç", "aaaeeeeiioouuuc")
+
+
+@dataclass
+class TriageDecision:
+    """Type détecté d'une pièce et mode d'extraction retenu ("full" ou "sample")."""
+
+    name: str
+    doc_type: str
+    mode: str
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "type": self.doc_type, "extraction": self.mode}
+
+
+def classify_name(name: str) -> Optional[str]:
+    """Classe une pièce d'après son nom de fichier."""
+    normalized = name.lower().translate(_ACCENTS).rsplit(".", 1)[0]
+    for doc_type, pattern in _FILENAME_PATTERNS:
+        if pattern.search(normalized):
+            return doc_type
+    return None
+
+
+def classify_text(sample: str) -> Optional[str]:
+    """Classe une pièce d'après l'intitulé trouvé dans sa première page."""
+    head = sample[:3000].lower()
+    best: Optional[Tuple[int, str]] = None
+    for doc_type, pattern in _CONTENT_PATTERNS:
+        match = pattern.search(head)
+        if match and (best is None or match.start() < best[0]):
+            best = (match.start(), doc_type)
+    return best[1] if best else None
+
+
+def triage_files(
+    files_data: Sequence[Tuple[str, bytes]],
+    sample_reader: Callable[[str, bytes], str],
+) -> List[TriageDecision]:
+    """Décide pour chaque fichier s'il doit être extrait en entier ou échantillonné.
+
+    `sample_reader` renvoie un échantillon de la première page ; il n'est
+    appelé que lorsque le nom du fichier ne permet pas de conclure. Sans RC
+    ni AE identifié, toutes les pièces sont extraites en entier.
+    """
+    decisions = []
+    for name, raw in files_data:
+        doc_type = classify_name(name) or classify_text(sample_reader(name, raw)) or "AUTRE"
+        mode = "full" if not TRIAGE_ENABLED or doc_type in FULL_EXTRACTION_TYPES else "sample"
+        decisions.append(TriageDecision(name, doc_type, mode))
+
+    if not any(d.doc_type in ("RC", "AE") for d in decisions):
+        for decision in decisions:
+            decision.mode = "full"
+    return decisions
+
@@ -0,0 +1,304 @@
+"""Envois de fichiers par morceaux, reprenables, pour les très gros DCE.
+
+Protocole : l'ouverture déclare les fichiers (nom, taille, SHA-256
+facultatif) ; chaque morceau est envoyé avec son décalage et son empreinte
+SHA-256, puis écrit directement dans le dossier de dépôt. La position reçue
+est la taille du fichier sur disque : après une coupure, ou un redémarrage
+du serveur, le client reprend là où l'envoi s'est arrêté.
+
+Dès qu'un fichier est complet, son extraction est lancée en arrière-plan ;
+l'analyse finale réutilise ce texte quand le budget du document le permet.
+Cette extraction passe après les analyses : elle est abandonnée quand
+toutes les places d'analyse sont prises ou quand le budget mémoire impose
+le mode économe.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from analysis import SUPPORTED_EXTENSIONS, read_file_text
+from admission import AdmissionController
+from budgets import Budget
+from config import (
+    UPLOAD_CHUNK_MAX_BYTES,
+    UPLOAD_DIR,
+    UPLOAD_MAX_FILE_BYTES,
+    UPLOAD_MAX_FILES,
+    UPLOAD_MAX_TOTAL_BYTES,
+    UPLOAD_PREFETCH_WORKERS,
+)
+from memory import memory_budget
+from metrics import count, stage
+from triage import FULL_EXTRACTION_TYPES, classify_name
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class UploadError(Exception):
+    """Erreur de protocole, avec le code HTTP correspondant."""
+
+    def __init__(self, status_code: int, message: str, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, UPLOAD_PREFETCH_WORKERS), thread_name_prefix="ao-prefetch")
+    return _executor
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _prefetch(name: str, path: Path, admission: Optional[AdmissionController]) -> Optional[Tuple[str, Budget]]:
+    """Extraction complète d'un fichier reçu, sous un budget de document neuf.
+
+    Renvoie None, sans rien extraire, si les analyses occupent toutes leurs
+    places ou si la mémoire manque : l'analyse finale extraira elle-même.
+    """
+    if admission is not None and admission.active + admission.waiting >= admission.max_concurrent:
+        count("upload_prefetch", result="skipped_busy")
+        return None
+    with memory_budget(path.stat().st_size) as meter:
+        if meter.mode == "low":
+            count("upload_prefetch", result="skipped_memory")
+            return None
+        budget = Budget.for_request().for_document()
+        with stage("upload.prefetch"):
+            text = read_file_text(name, path.read_bytes(), budget)
+    return text, budget
+
+
+def _reusable(used: Budget, budget: Budget) -> bool:
+    """Le texte pré-extrait sous `used` est-il celui qu'on obtiendrait sous `budget` ?"""
+    if used.reason == "time":
+        return False
+    if used.reason is not None:
+        return (used.max_pages, used.max_bytes) == (budget.max_pages, budget.max_bytes)
+    return (budget.max_pages is None or used.pages <= budget.max_pages) and (
+        budget.max_bytes is None or used.bytes <= budget.max_bytes
+    )
+
+
+@dataclass
+class DeclaredFile:
+    """Fichier annoncé à l'ouverture de l'envoi."""
+
+    name: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class UploadSession:
+    """Envoi en cours : fichiers déclarés et morceaux reçus, dans son dossier de dépôt."""
+
+    def __init__(
+        self,
+        upload_id: str,
+        directory: Path,
+        files: List[DeclaredFile],
+        admission: Optional[AdmissionController] = None,
+    ):
+        self.id = upload_id
+        self.directory = directory
+        self.files = files
+        self.admission = admission
+        self._prefetched: Dict[int, Future] = {}
+        # Un verrou par fichier : vérification du décalage, écriture et fin
+        # de fichier forment une seule étape face aux PUT concurrents
+        self._locks = [threading.Lock() for _ in files]
+
+    @classmethod
+    def load(
+        cls, upload_id: str, directory: Path, admission: Optional[AdmissionController] = None
+    ) -> "UploadSession":
+        manifest = json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+        session = cls(upload_id, directory, [DeclaredFile(**f) for f in manifest["files"]], admission)
+        for index in range(len(session.files)):
+            if session.is_complete(index):
+                session._start_prefetch(index)
+        return session
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = {"id": self.id, "files": [asdict(f) for f in self.files]}
+        (self.directory / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+
+    def path(self, index: int) -> Path:
+        return self.directory / f"{index}.part"
+
+    def received(self, index: int) -> int:
+        path = self.path(index)
+        return path.stat().st_size if path.exists() else 0
+
+    def is_complete(self, index: int) -> bool:
+        return self.received(index) == self.files[index].size
+
+    @property
+    def complete(self) -> bool:
+        return all(self.is_complete(i) for i in range(len(self.files)))
+
+    def status(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "chunk_max_bytes": UPLOAD_CHUNK_MAX_BYTES,
+            "complete": self.complete,
+            "files": [
+                {"index": i, "name": f.name, "size": f.size, "received": self.received(i)}
+                for i, f in enumerate(self.files)
+            ],
+        }
+
+    def write_chunk(self, index: int, offset: int, data: bytes, checksum: Optional[str]) -> int:
+        """Écrit un morceau à `offset` et renvoie la nouvelle position reçue.
+
+        Le morceau doit commencer exactement à la position reçue : sinon
+        (`409`), le client reprend à la position indiquée dans l'erreur.
+        """
+        if not 0 <= index < len(self.files):
+            raise UploadError(404, "Fichier inconnu pour cet envoi.")
+        declared = self.files[index]
+        with self._locks[index]:
+            received = self.received(index)
+            if offset != received:
+                raise UploadError(409, "Décalage inattendu.", received=received)
+            if len(data) > UPLOAD_CHUNK_MAX_BYTES:
+                raise UploadError(413, "Morceau trop volumineux.", chunk_max_bytes=UPLOAD_CHUNK_MAX_BYTES)
+            if offset + len(data) > declared.size:
+                raise UploadError(422, "Le morceau dépasse la taille déclarée du fichier.")
+            if checksum is not None and hashlib.sha256(data).hexdigest() != checksum.lower():
+                count("upload_chunks", result="checksum_error")
+                raise UploadError(422, "Empreinte SHA-256 du morceau invalide.", received=received)
+
+            fd = os.open(self.path(index), os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                os.pwrite(fd, data, offset)
+            finally:
+                os.close(fd)
+            count("upload_chunks", result="ok")
+            count("upload_bytes", len(data))
+            received += len(data)
+
+            if received == declared.size:
+                if declared.sha256 and _file_sha256(self.path(index)) != declared.sha256.lower():
+                    # Fichier corrompu : il est remis à zéro pour être renvoyé
+                    self.path(index).write_bytes(b"")
+                    raise UploadError(422, "Empreinte SHA-256 du fichier invalide.", received=0)
+                self._start_prefetch(index)
+        return received
+
+    def _start_prefetch(self, index: int) -> None:
+        """Lance l'extraction d'un fichier complet, sauf pièce que le triage échantillonnera."""
+        declared = self.files[index]
+        if index in self._prefetched or not declared.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return
+        doc_type = classify_name(declared.name)
+        if doc_type is not None and doc_type not in FULL_EXTRACTION_TYPES:
+            return
+        self._prefetched[index] = _get_executor().submit(
+            _prefetch, declared.name, self.path(index), self.admission
+        )
+
+    def files_data(self) -> List[Tuple[str, bytes]]:
+        return [(f.name, self.path(i).read_bytes()) for i, f in enumerate(self.files)]
+
+    def extractor(self) -> Callable[[str, bytes, Optional[Budget]], str]:
+        """Extracteur pour `analyze_files` qui réutilise les textes pré-extraits."""
+        by_name = {f.name: i for i, f in enumerate(self.files)}
+
+        def extract(name: str, raw: bytes, budget: Optional[Budget] = None) -> str:
+            future = self._prefetched.get(by_name.get(name, -1))
+            if future is not None and budget is not None:
+                try:
+                    prefetched = future.result(timeout=budget.remaining_seconds())
+                except Exception:
+                    prefetched = None
+                text, used = prefetched or ("", None)
+                if used is not None and _reusable(used, budget):
+                    budget.consume(used)
+                    if used.reason:
+                        budget.exhaust(used.reason)
+                    count("upload_prefetch", result="hit")
+                    return text
+            count("upload_prefetch", result="miss")
+            return read_file_text(name, raw, budget)
+
+        return extract
+
+
+class UploadStore:
+    """Envois en cours, retrouvés en mémoire ou depuis leur manifeste sur disque."""
+
+    def __init__(self, root: Path = UPLOAD_DIR, admission: Optional[AdmissionController] = None):
+        self.root = root
+        # Places d'analyse de l'API : l'extraction anticipée s'efface devant elles
+        self.admission = admission
+        self._sessions: Dict[str, UploadSession] = {}
+        # Une seule session par envoi, sinon leurs verrous ne se verraient pas
+        self._lock = threading.Lock()
+
+    def create(self, files: Sequence[DeclaredFile]) -> UploadSession:
+        if not files:
+            raise UploadError(422, "Aucun fichier déclaré.")
+        if len(files) > UPLOAD_MAX_FILES:
+            raise UploadError(413, "Trop de fichiers déclarés.", max_files=UPLOAD_MAX_FILES)
+        for declared in files:
+            if declared.size < 0 or declared.size > UPLOAD_MAX_FILE_BYTES:
+                raise UploadError(413, f"Taille non autorisée : {declared.name}")
+            if Path(declared.name).name != declared.name:
+                raise UploadError(422, f"Nom de fichier invalide : {declared.name}")
+        if sum(declared.size for declared in files) > UPLOAD_MAX_TOTAL_BYTES:
+            raise UploadError(413, "Taille totale de l'envoi non autorisée.", max_total_bytes=UPLOAD_MAX_TOTAL_BYTES)
+        upload_id = uuid.uuid4().hex
+        session = UploadSession(upload_id, self.root / upload_id, list(files), self.admission)
+        session.save()
+        for index, declared in enumerate(files):
+            session.path(index).touch()
+            if declared.size == 0:
+                session._start_prefetch(index)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None and session.directory.is_dir():
+                return session
+            # Envoi supprimé par la rétention : oublié ici aussi
+            self._sessions.pop(upload_id, None)
+            directory = self.root / upload_id
+            if not _UPLOAD_ID.match(upload_id) or not (directory / "manifest.json").is_file():
+                raise UploadError(404, "Envoi inconnu ou expiré.")
+            session = self._sessions[upload_id] = UploadSession.load(upload_id, directory, self.admission)
+            return session
+
+    def delete(self, upload_id: str) -> None:
+        session = self.get(upload_id)
+        self._sessions.pop(upload_id, None)
+        for future in session._prefetched.values():
+            future.cancel()
+        for path in session.directory.iterdir():
+            path.unlink()
+        session.directory.rmdir()
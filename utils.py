@@ -1,163 +1,339 @@
 """Fonctions utilitaires pour l'analyse de documents d'appel d'offre."""
 
+import bisect
 import datetime as dt
+import hashlib
 import io
 import re
 import shutil
+import tempfile
+import time
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence
+from stat import S_ISREG
+from typing import TYPE_CHECKING, BinaryIO, Iterable, List, Optional, Sequence, Tuple
 
+from memory import low_memory
+from metrics import count, stage
+from ocr import fill_missing_pages
+from patterns import BUYER, DEADLINE, EMAIL, EMAIL_KEYWORDS, MAJOR_HEADING, POSTAL_ADDRESS, REMISE_DES_PLIS
+from pdf_engines import MIN_TEXT_CHARS, SELECTOR, producer_key
+from sections import PAGE_BREAK, SectionTree, segment
 
-def load_pdf_text(raw: bytes) -> str:
-    """Extrait le texte d'un PDF avec plusieurs méthodes de secours."""
-    if not raw:
-        return ""
-    
-    text = ""
-    
-    # Méthode 1 : pypdf (méthode principale)
+if TYPE_CHECKING:
+    from budgets import Budget
+
+
+class _BufferReader(io.RawIOBase):
+    """Fichier en lecture seule sur un tampon (fichier projeté en mémoire), sans copie.
+
+    Chaque lecteur a sa propre position : un même fichier projeté peut être
+    lu par plusieurs analyses à la fois.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        size = max(0, min(len(target), len(self._view) - self._position))
+        target[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def byte_stream(raw: bytes) -> BinaryIO:
+    """Flux binaire sur le contenu d'un fichier : `bytes` ou fichier projeté (`memoryview`, voir server_files)."""
+    if isinstance(raw, bytes):
+        return io.BytesIO(raw)
+    return io.BufferedReader(_BufferReader(raw))
+
+
+def _page_text(extract, budget: Optional["Budget"]) -> str:
+    """Extrait le texte d'une page (chaîne vide en cas d'échec) et l'impute au budget."""
     try:
-        from pypdf import PdfReader
-        reader = PdfReader(io.BytesIO(raw))
-        
-        pages = []
-        for page in reader.pages:
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    pages.append(page_text)
-            except Exception:
-                continue
-        
-        if pages:
-            text = "\n".join(pages)
-            if len(text.strip()) > 50:  # Au moins 50 caractères trouvés
-                return text
+        page_text = extract() or ""
     except Exception:
-        pass
+        return ""
+    if page_text and budget is not None:
+        page_text = budget.add_text(page_text)
+    return page_text
+
+
+def _pypdf_pages(raw: bytes, budget: Optional["Budget"] = None) -> List[str]:
+    """Extrait le texte page par page avec pypdf (une entrée par page lue, vide si sans texte)."""
+    from pypdf import PdfReader
+    reader = PdfReader(byte_stream(raw))
     
-    # Méthode 2 : PyMuPDF (fitz) - souvent meilleur pour extraire le texte
+    pages = []
+    for page in reader.pages:
+        if budget is not None and not budget.take_page():
+            break
+        pages.append(_page_text(page.extract_text, budget))
+    return pages
+
+
+def _fitz_pages(raw: bytes, budget: Optional["Budget"] = None) -> List[str]:
+    """Extrait le texte page par page avec PyMuPDF (fitz), souvent meilleur pour extraire le texte."""
+    import fitz
+    doc = fitz.open(stream=raw, filetype="pdf")
     try:
-        import fitz
-        doc = fitz.open(stream=raw, filetype="pdf")
         pages = []
         for page in doc:
-            try:
-                page_text = page.get_text()
-                if page_text:
-                    pages.append(page_text)
-            except Exception:
-                continue
+            if budget is not None and not budget.take_page():
+                break
+            pages.append(_page_text(page.get_text, budget))
+        return pages
+    finally:
         doc.close()
-        
-        if pages:
-            text = "\n".join(pages)
-            if len(text.strip()) > 50:
-                return text
-    except Exception:
-        pass
-    
-    # Méthode 3 : pdfplumber (alternative)
+
+
+def _pdfplumber_pages(raw: bytes, budget: Optional["Budget"] = None) -> List[str]:
+    """Extrait le texte page par page avec pdfplumber."""
+    import pdfplumber
+    with pdfplumber.open(byte_stream(raw)) as pdf:
+        pages = []
+        for page in pdf.pages:
+            if budget is not None and not budget.take_page():
+                break
+            pages.append(_page_text(page.extract_text, budget))
+        return pages
+
+
+# Moteurs d'extraction PDF, dans l'ordre par défaut (réordonnés par producteur, voir pdf_engines.py)
+PDF_ENGINES = [
+    ("pypdf", _pypdf_pages),
+    ("fitz", _fitz_pages),
+    ("pdfplumber", _pdfplumber_pages),
+]
+
+
+def _pypdf_page_stream(path: Path):
+    """Pages d'un PDF lu depuis le disque, une par une (mode économe)."""
+    from pypdf import PdfReader
+    for page in PdfReader(path).pages:
+        yield page.extract_text
+
+
+def _fitz_page_stream(path: Path):
+    import fitz
+    doc = fitz.open(path)
     try:
-        import pdfplumber
-        with pdfplumber.open(io.BytesIO(raw)) as pdf:
-            pages = []
-            for page in pdf.pages:
+        for page in doc:
+            yield page.get_text
+    finally:
+        doc.close()
+
+
+# Moteurs du mode économe (même ordre que PDF_ENGINES, sans pdfplumber, gourmand en mémoire)
+LOW_MEMORY_PDF_ENGINES = [
+    ("pypdf", _pypdf_page_stream),
+    ("fitz", _fitz_page_stream),
+]
+
+
+def _load_pdf_text_low_memory(raw: bytes, budget: Optional["Budget"] = None) -> str:
+    """Variante de `load_pdf_text` pour le mode économe en mémoire.
+
+    Le PDF est déposé sur disque et ouvert depuis le fichier ; le texte de
+    chaque page est écrit au fil de l'eau dans un fichier temporaire, relu
+    une seule fois à la fin. Le premier moteur qui trouve du texte est retenu,
+    sans garder en mémoire le résultat d'un moteur pendant l'essai du suivant.
+    """
+    separator = PAGE_BREAK + "\n"
+    text: Optional[str] = None
+    missing = 0
+    with tempfile.TemporaryDirectory(prefix="ao-pdf-") as tmp:
+        path = Path(tmp) / "document.pdf"
+        path.write_bytes(raw)
+        for name, engine in SELECTOR.order(producer_key(raw), LOW_MEMORY_PDF_ENGINES):
+            if budget is not None:
+                budget.restart()
+            read = found = 0
+            with tempfile.TemporaryFile("w+", encoding="utf-8", dir=tmp) as spool:
                 try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        pages.append(page_text)
+                    with stage(f"extract.pdf.{name}"):
+                        for extract in engine(path):
+                            if budget is not None and not budget.take_page():
+                                break
+                            page_text = _page_text(extract, budget)
+                            spool.write((separator if read else "") + page_text)
+                            read += 1
+                            found += bool(page_text)
                 except Exception:
+                    count("pdf_engine_errors", engine=name)
+                    count("pdf_fallbacks", engine=name)
                     continue
-            
-            if pages:
-                text = "\n".join(pages)
-                if len(text.strip()) > 50:
-                    return text
-    except Exception:
-        pass
-    
-    return text
+                count("pdf_pages", found, engine=name)
+                if found or (budget is not None and budget.truncated):
+                    spool.seek(0)
+                    text, missing = spool.read(), read - found
+                    break
+                if text is None:
+                    # Aucune couche texte : pages vides conservées pour l'OCR
+                    text, missing = separator.join([""] * read), read
+            count("pdf_fallbacks", engine=name)
+    if text is not None and missing:
+        text = separator.join(fill_missing_pages(raw, text.split(separator), budget))
+    return text or ""
+
 
+def _join_pages(pages: Sequence[str]) -> str:
+    return "\n".join(page for page in pages if page)
 
-def load_docx_text(raw: bytes) -> str:
+
+def load_pdf_text(raw: bytes, budget: Optional["Budget"] = None) -> str:
+    """Extrait le texte d'un PDF avec plusieurs méthodes de secours.
+    
+    Avec un `budget`, l'extraction s'arrête dès qu'il est épuisé et renvoie le
+    texte obtenu jusque-là (`budget.reason` indique la cause). Les pages sans
+    couche texte (scans) sont ensuite passées à l'OCR local si disponible.
+    Les moteurs sont essayés dans l'ordre appris pour le producteur du PDF
+    (`pdf_engines`). En mode économe en mémoire, voir `_load_pdf_text_low_memory`.
+    """
+    if not raw:
+        return ""
+    
+    count("bytes_processed", len(raw), kind="pdf")
+    if low_memory():
+        return _load_pdf_text_low_memory(raw, budget)
+    best: List[str] = []
+    producer = producer_key(raw)
+    for name, engine in SELECTOR.order(producer, PDF_ENGINES):
+        if budget is not None:
+            budget.restart()
+        start = time.perf_counter()
+        try:
+            with stage(f"extract.pdf.{name}"):
+                pages = engine(raw, budget)
+        except Exception:
+            SELECTOR.record(producer, name, time.perf_counter() - start, error=True)
+            count("pdf_engine_errors", engine=name)
+            count("pdf_fallbacks", engine=name)
+            continue
+        elapsed = time.perf_counter() - start
+        
+        count("pdf_pages", sum(1 for page in pages if page), engine=name)
+        if any(pages) or not best:
+            best = pages
+        chars = len(_join_pages(pages).strip())
+        if budget is None or not budget.truncated:
+            # Un essai interrompu par le budget ne dit rien du moteur
+            SELECTOR.record(producer, name, elapsed, len(pages), chars)
+        if chars > MIN_TEXT_CHARS:
+            break
+        if budget is not None and budget.truncated:
+            # Budget épuisé : inutile d'essayer les moteurs suivants
+            count("budget_exhausted", reason=budget.reason)
+            break
+        count("pdf_fallbacks", engine=name)
+    
+    if best and not all(best):
+        best = fill_missing_pages(raw, best, budget)
+    # Un saut de page par page lue : sert d'ancre de page aux sections (voir sections.py)
+    return (PAGE_BREAK + "\n").join(best)
+
+
+def load_docx_text(raw: bytes, budget: Optional["Budget"] = None) -> str:
     """Extrait le texte d'un fichier DOCX."""
+    count("bytes_processed", len(raw), kind="docx")
     try:
         from docx import Document
-        doc = Document(io.BytesIO(raw))
-        paragraphs = [p.text for p in doc.paragraphs]
+        with stage("extract.docx"):
+            doc = Document(byte_stream(raw))
+        paragraphs = []
+        for p in doc.paragraphs:
+            if budget is not None:
+                if not budget.check():
+                    count("budget_exhausted", reason=budget.reason)
+                    break
+                paragraphs.append(budget.add_text(p.text))
+            else:
+                paragraphs.append(p.text)
         return "\n".join(paragraphs)
     except Exception:
         return ""
 
 
-def extract_email(text: str) -> Optional[str]:
-    """Extrait l'adresse email de contact pour l'envoi du dossier depuis le texte."""
+def extract_email(text: str, sections: Optional[SectionTree] = None) -> Optional[str]:
+    """Extrait l'adresse email de contact pour l'envoi du dossier depuis le texte.
+
+    `sections` est l'arbre des sections de `text` s'il a déjà été calculé.
+    """
     if not text:
         return None
-    
+    return pick_email(*email_candidates(text, sections))
+
+
+def email_candidates(text: str, sections: Optional[SectionTree] = None) -> Tuple[List[str], List[str], List[str]]:
+    """Emails par niveau de priorité : sections « Conditions d'envoi ou de remise des plis »
+    (la dernière en tête), lignes à mots-clés (dans l'ordre du texte), tout le texte.
+
+    Pour plusieurs textes, chaque niveau se fusionne séparément avant
+    `pick_email` : sections des textes suivants en tête, les autres niveaux
+    dans l'ordre des textes (voir `partials.PartialAnalysis.merge`).
+    """
+    if not text:
+        return [], [], []
     lines = text.split('\n')
     
     # Priorité 1 : Cherche dans la section "Conditions d'envoi ou de remise des plis"
-    sections_conditions_envoi = []
-    for i, line in enumerate(lines):
+    if sections is None:
+        sections = segment(text)
+    sections_conditions_envoi = [sections.section_text(section) for section in sections.find(REMISE_DES_PLIS)]
+    # Document sans intitulés reconnus : repérage ligne à ligne
+    headings: Optional[List[int]] = None
+    for i, line in enumerate(lines if not sections_conditions_envoi else ()):
         line_lower = line.lower()
-        if re.search(r'conditions?\s+d\'?envoi\s+(?:ou\s+de\s+)?remise\s+des\s+plis?', line_lower):
-            # Prend toute la section (jusqu'à la prochaine section majeure ou 150 lignes)
+        if REMISE_DES_PLIS.search(line_lower):
+            # Prend toute la section (jusqu'à la prochaine section majeure, au-delà de 10 lignes, ou 150 lignes)
+            if headings is None:
+                headings = [j for j, other in enumerate(lines) if MAJOR_HEADING.search(other.lower())]
             end_idx = i + 150
-            for j in range(i + 1, min(len(lines), i + 150)):
-                if re.search(r'^(chapitre|section|partie|titre)\s+', lines[j].lower()):
-                    if j > i + 10:
-                        end_idx = j
-                        break
+            k = bisect.bisect_right(headings, i + 10)
+            if k < len(headings) and headings[k] < min(len(lines), i + 150):
+                end_idx = headings[k]
             section = '\n'.join(lines[max(0, i-1):end_idx])
             sections_conditions_envoi.append(section)
     
-    # Cherche dans les sections pertinentes
-    email_keywords = [
-        r'adresse\s+electronique[^\w]',
-        r'adresse\s+email[^\w]',
-        r'adresse\s+mail[^\w]',
-        r'courrier\s+electronique[^\w]',
-        r'contact[^\w]',
-        r'envoyer\s+à[^\w]',
-        r'destinataire[^\w]',
-        r'depot\s+(?:electronique|numerique)[^\w]',
-    ]
-    
-    relevant_sections = []
-    
-    # Cherche d'abord dans la section "Conditions d'envoi ou de remise des plis"
-    if sections_conditions_envoi:
-        for section in sections_conditions_envoi:
-            section_lower = section.lower()
-            for keyword in email_keywords:
-                if re.search(keyword, section_lower):
-                    relevant_sections.insert(0, section)
-                    break
+    # Cherche dans les sections pertinentes (mots-clés : voir `patterns.EMAIL_KEYWORDS`)
+    # Cherche d'abord dans la section "Conditions d'envoi ou de remise des plis" (la dernière en tête)
+    conditions_sections = [section for section in sections_conditions_envoi if EMAIL_KEYWORDS.search(section.lower())][::-1]
+    seen = set(conditions_sections)
     
     # Cherche ensuite dans le reste du document
+    keyword_sections = []
     for i, line in enumerate(lines):
-        line_lower = line.lower()
-        for keyword in email_keywords:
-            if re.search(keyword, line_lower):
-                section = '\n'.join(lines[max(0, i-1):min(len(lines), i+5)])
-                if section not in relevant_sections:
-                    relevant_sections.append(section)
-                break
-    
-    text_to_search = '\n'.join(relevant_sections) if relevant_sections else text
-    
-    # Pattern pour les emails
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, text_to_search, re.IGNORECASE)
-    
-    if not emails:
-        # Si pas trouvé dans les sections, cherche dans tout le texte
-        emails = re.findall(email_pattern, text, re.IGNORECASE)
+        if EMAIL_KEYWORDS.search(line.lower()):
+            section = '\n'.join(lines[max(0, i-1):min(len(lines), i+5)])
+            if section not in seen:
+                seen.add(section)
+                keyword_sections.append(section)
     
+    # Emails de chaque niveau, puis de tout le texte
+    conditions = EMAIL.findall('\n'.join(conditions_sections)) if conditions_sections else []
+    keywords = EMAIL.findall('\n'.join(keyword_sections)) if keyword_sections else []
+    return conditions, keywords, EMAIL.findall(text)
+
+
+def pick_email(conditions: Sequence[str], keywords: Sequence[str], all_emails: Sequence[str]) -> Optional[str]:
+    """Premier email retenu : sections de remise des plis, puis lignes à mots-clés, sinon tout le texte."""
+    emails = list(conditions) + list(keywords) or list(all_emails)
     if not emails:
         return None
     
@@ -168,60 +344,72 @@ def extract_email(text: str) -> Optional[str]:
         if not any(exc in email_lower for exc in excluded):
             return email
     
-    return emails[0] if emails else None
+    return emails[0]
 
 
 def extract_postal_address(text: str) -> Optional[str]:
     """Extrait une adresse postale approximative du texte."""
-    # Pattern simple pour les adresses françaises
-    address_pattern = r'\d+[,\s]+[A-Za-zÀ-ÿ\s]+(?:rue|avenue|boulevard|place|chemin|route|impasse)[A-Za-zÀ-ÿ\s]+\d{5}'
-    matches = re.findall(address_pattern, text, re.IGNORECASE)
-    if matches:
-        return matches[0]
-    return None
+    # Motif simple (et borné) pour les adresses françaises
+    match = POSTAL_ADDRESS.search(text)
+    return match.group(0) if match else None
+
+
+def first_candidates(*candidates: Sequence[Optional[str]]) -> List[Optional[str]]:
+    """Fusionne des listes de candidats par motif : le premier texte qui en a un l'emporte."""
+    merged: List[Optional[str]] = []
+    for values in candidates:
+        for i, value in enumerate(values):
+            if i == len(merged):
+                merged.append(value)
+            elif merged[i] is None:
+                merged[i] = value
+    return merged
+
+
+def buyer_candidates(text: str) -> List[Optional[str]]:
+    """Première correspondance de chaque motif d'acheteur (None si absent)."""
+    candidates = []
+    for pattern in BUYER:
+        match = pattern.search(text)
+        candidates.append(match.group(1).strip() if match else None)
+    return candidates
 
 
 def guess_buyer(text: str) -> Optional[str]:
     """Tente de deviner le nom de l'acheteur."""
-    # Recherche de patterns communs
-    patterns = [
-        r'acheteur[:\s]+([A-Z][A-Za-zÀ-ÿ\s]+)',
-        r'commande[:\s]+([A-Z][A-Za-zÀ-ÿ\s]+)',
-        r'maître[:\s]+d\'?ouvrage[:\s]+([A-Z][A-Za-zÀ-ÿ\s]+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    
-    return None
+    return pick_buyer(buyer_candidates(text))
+
+
+def pick_buyer(candidates: Sequence[Optional[str]]) -> Optional[str]:
+    """Premier acheteur trouvé, dans l'ordre des motifs."""
+    return next((buyer for buyer in candidates if buyer), None)
+
+
+def deadline_candidates(text: str) -> List[Optional[str]]:
+    """Première date trouvée par chaque motif de date limite (None si absent)."""
+    candidates = []
+    for pattern in DEADLINE:
+        match = pattern.search(text)
+        candidates.append(match.group(1) if match else None)
+    return candidates
 
 
 def guess_deadline(text: str):
     """Tente de deviner la date limite de dépôt."""
-    import datetime as dt
-    
-    # Patterns de dates
-    date_patterns = [
-        r'date[:\s]+limite[:\s]+(?:de[:\s]+)?(?:dépôt|remise)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'dépôt[:\s]+(?:avant|le|au)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})[:\s]+(?:date[:\s]+limite|dépôt)',
-    ]
-    
-    for pattern in date_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            date_str = match.group(1)
+    return pick_deadline(deadline_candidates(text))
+
+
+def pick_deadline(candidates: Sequence[Optional[str]]) -> Optional[dt.datetime]:
+    """Date limite du premier motif dont la date est lisible."""
+    for date_str in candidates:
+        if date_str is None:
+            continue
+        # Tentative de parsing de la date
+        for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']:
             try:
-                # Tentative de parsing de la date
-                for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y']:
-                    try:
-                        return dt.datetime.strptime(date_str, fmt)
-                    except ValueError:
-                        continue
-            except Exception:
-                pass
+                return dt.datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
     
     return None
 
@@ -273,35 +461,74 @@ def find_best_doc(base: Path, patterns: Sequence[str], max_age_days: Optional[in
     return best
 
 
-def find_all_matching_docs(base: Path, patterns: Sequence[str], max_age_days: Optional[int]) -> List[Path]:
+@dataclass(frozen=True)
+class FileEntry:
+    """Fichier d'un dossier scanné, avec sa taille et sa date de modification."""
+
+    path: Path
+    size: int
+    mtime: float
+
+
+def scan_folder(base: Path) -> List[FileEntry]:
+    """Liste récursivement les fichiers d'un dossier (un seul `stat()` par fichier)."""
+    if not base.exists():
+        return []
+    entries = []
+    for path in base.rglob("*"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if not S_ISREG(stat.st_mode):
+            continue
+        entries.append(FileEntry(path, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def folder_fingerprint(folder: Path) -> str:
+    """Empreinte d'un dossier basée sur les chemins, tailles et dates des fichiers."""
+    digest = hashlib.sha256()
+    for entry in sorted(scan_folder(folder), key=lambda e: str(e.path)):
+        digest.update(f"{entry.path.relative_to(folder)}|{entry.size}|{entry.mtime}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def find_all_matching_docs(
+    base: Path,
+    patterns: Sequence[str],
+    max_age_days: Optional[int],
+    entries: Optional[Sequence[FileEntry]] = None,
+) -> List[Path]:
     """Trouve tous les documents correspondant aux critères, triés par date de modification (plus récent d'abord).
     
     La recherche est flexible : si plusieurs patterns sont fournis, au moins un doit correspondre.
     Si un seul pattern est fourni, il doit correspondre.
+    `entries` permet de réutiliser un scan déjà effectué avec `scan_folder`.
     """
-    if not base.exists():
-        return []
+    if entries is None:
+        if not base.exists():
+            return []
+        entries = scan_folder(base)
     normalized = [p.lower() for p in patterns if p]
     if not normalized:
         return []
     
+    now = dt.datetime.now(dt.timezone.utc)
     matching_docs = []
-    for path in base.rglob("*"):
-        if not path.is_file():
-            continue
-        name = path.name.lower()
+    for entry in entries:
+        name = entry.path.name.lower()
         
         # Recherche flexible : au moins un terme doit correspondre
         matches_count = sum(1 for term in normalized if term in name)
         if matches_count == 0:
             continue
         
-        stat = path.stat()
         if max_age_days is not None:
-            age = dt.datetime.now(dt.timezone.utc) - dt.datetime.fromtimestamp(stat.st_mtime, dt.timezone.utc)
+            age = now - dt.datetime.fromtimestamp(entry.mtime, dt.timezone.utc)
             if age > dt.timedelta(days=max_age_days):
                 continue
-        matching_docs.append((path, stat.st_mtime, matches_count))
+        matching_docs.append((entry.path, entry.mtime, matches_count))
     
     # Trie par nombre de correspondances (plus de correspondances d'abord), puis par date (plus récent d'abord)
     matching_docs.sort(key=lambda x: (x[2], x[1]), reverse=True)